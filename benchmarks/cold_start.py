@@ -0,0 +1,163 @@
+"""Import-time and first-invocation latency for every Lambda handler in lambda/
+
+    python benchmarks/cold_start.py [--runs 5] [--eager] [--json]
+
+Every measurement runs in a fresh interpreter, so each run is a real cold
+start of the module. The import run loads nothing but the handler module and
+also reports whether pandas/pyarrow came in with it. The invocation run calls
+the handler twice against moto's in-memory S3, with canned responses in place
+of the Lambda and Bedrock clients, so the first-call figure is our own init
+work (client construction, first-use setup) rather than AWS latency.
+
+Needs boto3 and moto (plus pandas/pyarrow for the processing and compaction
+handlers). --eager sets EAGER_CLIENTS=true to compare the two startup modes.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+
+RAW_BUCKET = 'bt101-raw-data-alpha-012258635969'
+PARQUET_BUCKET = 'bt101-parquet-data-alpha-012258635969'
+PARTITION = 'year=2025/month=12/day=04'
+RAW_KEY = f'{PARTITION}/test-original-001.json'
+HEAVY_MODULES = ('pandas', 'pyarrow')
+
+SAMPLE_REQUEST = {
+    'id': 'test-original-001',
+    'timestamp': '2025-12-04T22:00:00',
+    'ingestion_source': 'api_gateway',
+    'feature_request': {
+        'title': 'Real-Time Customer Analytics Dashboard',
+        'description': 'Build a comprehensive analytics platform that provides real-time insights into '
+                       'customer behavior, purchase patterns, and engagement metrics.',
+        'priority': 'medium',
+        'category': 'analytics'
+    }
+}
+
+
+def handler_events():
+    """One representative event per handler module"""
+    return {
+        'ingestion_working': {'httpMethod': 'POST', 'body': json.dumps(SAMPLE_REQUEST['feature_request'])},
+        'enhanced_processing_frmf': {
+            'Records': [{'s3': {'bucket': {'name': RAW_BUCKET}, 'object': {'key': RAW_KEY}}}]
+        },
+        'deduplication_improved': {
+            'id': SAMPLE_REQUEST['id'],
+            'key': RAW_KEY,
+            'title': SAMPLE_REQUEST['feature_request']['title'],
+            'description': SAMPLE_REQUEST['feature_request']['description']
+        },
+        'batch_processor': {'prefixes': [f'{PARTITION}/'], 'max_invokes': 1},
+        'similarity_index': {},
+        'request_catalog': {},
+        'duplicate_clusters': {},
+        'rollups': {},
+        'compaction': {'partition': PARTITION, 'delete_sources': False},
+    }
+
+
+def child_import(module_name):
+    start = time.perf_counter()
+    __import__(module_name)
+    import_ms = (time.perf_counter() - start) * 1000
+    return {
+        'import_ms': import_ms,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules]
+    }
+
+
+def child_invoke(module_name):
+    # Imported here so the import-only run does not pre-load botocore
+    from fakes import CLASSIFICATION, FakeBedrock, FakeLambda
+    from moto import mock_aws
+
+    with mock_aws():
+        import boto3
+        s3 = boto3.client('s3')
+        for bucket in (RAW_BUCKET, PARQUET_BUCKET):
+            s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+        s3.put_object(Bucket=RAW_BUCKET, Key=RAW_KEY, Body=json.dumps(SAMPLE_REQUEST))
+
+        start = time.perf_counter()
+        module = __import__(module_name)
+        import_ms = (time.perf_counter() - start) * 1000
+
+        canned = {'statusCode': 200, 'body': json.dumps(dict(CLASSIFICATION, is_duplicate=False, confidence=0.1))}
+        if hasattr(module, 'lambda_client'):
+            module.lambda_client = FakeLambda({'': lambda event: canned})
+        if hasattr(module, 'bedrock'):
+            module.bedrock = FakeBedrock(latency_ms=0, jitter_ms=0)
+
+        event = handler_events()[module_name]
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            module.handler(json.loads(json.dumps(event)), None)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    return {'import_ms': import_ms, 'first_invoke_ms': timings[0], 'warm_invoke_ms': timings[1]}
+
+
+def run_child(mode, module_name, eager):
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+    env.setdefault('AWS_REGION', 'us-west-2')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    env['EAGER_CLIENTS'] = 'true' if eager else 'false'
+    # The persistent response cache would otherwise write through to the moto bucket
+    env.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, module_name],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--eager', action='store_true', help='build boto3 clients at import')
+    parser.add_argument('--modules', nargs='*', default=list(handler_events()))
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'MODULE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, module_name = args.child
+        result = child_import(module_name) if mode == 'import' else child_invoke(module_name)
+        print(json.dumps(result))
+        return
+
+    report = {}
+    for module_name in args.modules:
+        imports = [run_child('import', module_name, args.eager) for _ in range(args.runs)]
+        invokes = [run_child('invoke', module_name, args.eager) for _ in range(args.runs)]
+        report[module_name] = {
+            'import_ms': statistics.median(run['import_ms'] for run in imports),
+            'heavy_modules': imports[0]['heavy_modules'],
+            'first_invoke_ms': statistics.median(run['first_invoke_ms'] for run in invokes),
+            'warm_invoke_ms': statistics.median(run['warm_invoke_ms'] for run in invokes),
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'handler':<28}{'import ms':>11}{'1st call ms':>13}{'warm ms':>10}  heavy imports")
+    for module_name, row in report.items():
+        print(f"{module_name:<28}{row['import_ms']:>11.1f}{row['first_invoke_ms']:>13.1f}"
+              f"{row['warm_invoke_ms']:>10.1f}  {', '.join(row['heavy_modules']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
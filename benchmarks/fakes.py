@@ -0,0 +1,264 @@
+"""In-process stand-ins for S3, Bedrock and Lambda used by the local benchmarks
+
+They implement only the client calls the handlers in lambda/ make and raise
+botocore ClientErrors with the codes those handlers check, so the handlers
+run unmodified once the stand-ins are installed with aws_clients.override.
+"""
+import bisect
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+from botocore.exceptions import ClientError
+
+
+def client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class InMemoryS3:
+    """Dict-backed S3 with ETags, conditional GETs, paginated listing and put notifications"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.ops = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._objects = {}
+        self._sorted_keys = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def create_bucket(self, Bucket, **kwargs):
+        with self._lock:
+            self._objects.setdefault(Bucket, {})
+            self._sorted_keys.setdefault(Bucket, [])
+
+    def on_put(self, listener):
+        """Call listener(bucket, key) after every put, like an S3 event notification"""
+        self._listeners.append(listener)
+
+    def put_object(self, Bucket, Key, Body=b'', ContentType='binary/octet-stream', **kwargs):
+        self._wait()
+        data = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self._lock:
+            objects = self._bucket(Bucket, 'PutObject')
+            if Key not in objects:
+                bisect.insort(self._sorted_keys[Bucket], Key)
+            objects[Key] = (data, etag, ContentType)
+            self.ops['PutObject'] += 1
+            self.bytes_in += len(data)
+        for listener in self._listeners:
+            listener(Bucket, Key)
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self._wait()
+        with self._lock:
+            self.ops['GetObject'] += 1
+            entry = self._bucket(Bucket, 'GetObject').get(Key)
+        if entry is None:
+            raise client_error('NoSuchKey', 'The specified key does not exist.', 'GetObject')
+        data, etag, content_type = entry
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            raise client_error('304', 'Not Modified', 'GetObject')
+        with self._lock:
+            self.bytes_out += len(data)
+        return {'Body': io.BytesIO(data), 'ETag': etag, 'ContentLength': len(data), 'ContentType': content_type}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._wait()
+        with self._lock:
+            objects = self._bucket(Bucket, 'DeleteObjects')
+            keys = self._sorted_keys[Bucket]
+            for item in Delete.get('Objects', []):
+                if objects.pop(item['Key'], None) is not None:
+                    keys.pop(bisect.bisect_left(keys, item['Key']))
+            self.ops['DeleteObjects'] += 1
+        return {'Deleted': [{'Key': item['Key']} for item in Delete.get('Objects', [])]}
+
+    def get_paginator(self, operation):
+        if operation != 'list_objects_v2':
+            raise NotImplementedError(operation)
+        return self
+
+    def paginate(self, Bucket, Prefix='', PaginationConfig=None, StartAfter='', **kwargs):
+        page_size = (PaginationConfig or {}).get('PageSize', 1000)
+        start_after = StartAfter
+        while True:
+            self._wait()
+            with self._lock:
+                self.ops['ListObjectsV2'] += 1
+                keys = self._sorted_keys.get(Bucket)
+                if keys is None:
+                    raise client_error('NoSuchBucket', 'The specified bucket does not exist', 'ListObjectsV2')
+                start = bisect.bisect_right(keys, start_after) if start_after else bisect.bisect_left(keys, Prefix)
+                page = []
+                for key in keys[start:start + page_size]:
+                    if not key.startswith(Prefix):
+                        break
+                    page.append(key)
+                objects = self._objects[Bucket]
+                contents = [{'Key': key, 'Size': len(objects[key][0]), 'ETag': objects[key][1]} for key in page]
+            truncated = len(page) == page_size
+            response = {'KeyCount': len(page), 'IsTruncated': truncated}
+            if contents:
+                response['Contents'] = contents
+            yield response
+            if not truncated:
+                return
+            start_after = page[-1]
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, **kwargs):
+        return next(self.paginate(Bucket=Bucket, Prefix=Prefix, PaginationConfig={'PageSize': MaxKeys}))
+
+    def keys(self, bucket, prefix=''):
+        with self._lock:
+            return [key for key in self._sorted_keys.get(bucket, []) if key.startswith(prefix)]
+
+    def _bucket(self, bucket, operation):
+        objects = self._objects.get(bucket)
+        if objects is None:
+            raise client_error('NoSuchBucket', 'The specified bucket does not exist', operation)
+        return objects
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeBedrock:
+    """bedrock-runtime stand-in with latency, jitter, a concurrency cap and random throttling
+
+    Requests beyond max_concurrency in flight, or a throttle_rate fraction of
+    requests, fail with ThrottlingException like the real service. respond
+    maps the prompt text to the text of the model's reply.
+    """
+
+    def __init__(self, latency_ms=800.0, jitter_ms=200.0, max_concurrency=50, throttle_rate=0.0,
+                 respond=None, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.max_concurrency = max_concurrency
+        self.throttle_rate = throttle_rate
+        self.respond = respond or default_reply
+        self.stats = Counter()
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        request = json.loads(body)
+        prompt = ''.join(
+            part if isinstance(part, str) else part.get('text', '')
+            for message in request.get('messages', [])
+            for part in ([message['content']] if isinstance(message['content'], str) else message['content'])
+        )
+        with self._lock:
+            self.stats['calls'] += 1
+            throttled = self._in_flight >= self.max_concurrency or self._random.random() < self.throttle_rate
+            if throttled:
+                self.stats['throttled'] += 1
+            else:
+                self._in_flight += 1
+                delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if throttled:
+            raise client_error('ThrottlingException', 'Too many requests, please wait before trying again.',
+                               'InvokeModel')
+        try:
+            time.sleep(delay)
+            text = self.respond(prompt)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        input_tokens = max(1, len(prompt) // 4)
+        output_tokens = max(1, len(text) // 4)
+        with self._lock:
+            self.stats['input_tokens'] += input_tokens
+            self.stats['output_tokens'] += output_tokens
+        payload = {
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': 'end_turn',
+            'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens}
+        }
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8')), 'contentType': 'application/json'}
+
+
+def default_reply(prompt):
+    """A not-duplicate verdict (one per request for batch prompts); classification prompts get a canned classification, fused prompts both"""
+    verdict = {
+        'is_duplicate': False,
+        'confidence': 0.2,
+        'most_similar_request_id': '',
+        'reasoning': 'Different functionality'
+    }
+    if '"classification"' in prompt:
+        return json.dumps({'classification': CLASSIFICATION, 'duplicate': verdict})
+    if '"verdicts"' in prompt:
+        new_requests = prompt.split('NEW REQUESTS:', 1)[1].split('EXISTING REQUESTS:', 1)[0]
+        request_ids = [line[len('ID: '):] for line in new_requests.splitlines() if line.startswith('ID: ')]
+        return json.dumps({'verdicts': [dict(verdict, request_id=request_id) for request_id in request_ids]})
+    if 'is_duplicate' in prompt:
+        return json.dumps(verdict)
+    return json.dumps(CLASSIFICATION)
+
+
+CLASSIFICATION = {
+    'category': 'analytics',
+    'priority': 'medium',
+    'complexity': 'medium',
+    'estimated_effort': '2-3 months',
+    'tags': ['dashboard', 'reporting'],
+    'forecast_status': 'under_review',
+    'forecast_timeline': 'Q3 2026',
+    'forecast_confidence': 0.6,
+    'service_team': 'analytics-platform'
+}
+
+
+class FakeLambda:
+    """Lambda stand-in routing invokes by function name to in-process handlers
+
+    routes maps a substring of the function name to handler(event) -> response.
+    Invokes past max_concurrency fail with TooManyRequestsException. Event
+    invokes are queued for the caller to drain instead of running inline.
+    """
+
+    def __init__(self, routes, invoke_overhead_ms=0.0, max_concurrency=1000):
+        self.routes = routes
+        self.overhead = invoke_overhead_ms / 1000.0
+        self.max_concurrency = max_concurrency
+        self.stats = Counter()
+        self.queued = []
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b'', **kwargs):
+        event = json.loads(Payload or b'{}')
+        route = next((handler for name, handler in self.routes.items() if name in FunctionName), None)
+        if route is None:
+            raise client_error('ResourceNotFoundException', f'Function not found: {FunctionName}', 'Invoke')
+
+        with self._lock:
+            self.stats[f'{FunctionName}:{InvocationType}'] += 1
+            if InvocationType == 'Event':
+                self.queued.append((route, event))
+                return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+            if self._in_flight >= self.max_concurrency:
+                self.stats['throttled'] += 1
+                raise client_error('TooManyRequestsException', 'Rate Exceeded.', 'Invoke')
+            self._in_flight += 1
+        try:
+            if self.overhead:
+                time.sleep(self.overhead)
+            response = route(event)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(response, default=str).encode('utf-8'))}
@@ -0,0 +1,218 @@
+"""Bytes Athena would scan for the dashboard queries under each Parquet layout
+
+    python benchmarks/parquet_layout.py --rows 200000 [--row-group-size 20000] [--json]
+
+Writes the same synthetic day of flattened FRMF rows three ways and prices
+the standard dashboard queries against each:
+
+  baseline     arrival order, one file: the writer before sort keys
+  sorted       frmf_schema.sort_table + write_options (statistics, page
+               index, sorting metadata, bloom filters on id columns)
+  partitioned  sorted, plus one file per --partition-column value, the
+               layout compaction writes with PARQUET_PARTITION_COLUMN set
+
+A query's scanned bytes follow what Athena reads: every file footer, plus
+the compressed column chunks of the projected columns in each row group
+whose min/max statistics (or partition path) do not rule out the filter.
+Bloom filters are not evaluated, so id lookups are an upper bound for the
+sorted layouts. Needs pyarrow only.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+import pyarrow as pa  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+import frmf_schema  # noqa: E402
+
+TEAMS = ['analytics-platform', 'identity', 'billing', 'storage', 'networking', 'mobile', 'search',
+         'notifications', 'data-pipeline', 'developer-tools', 'security', 'compliance']
+STATUSES = ['submitted', 'under_review', 'planned', 'in_progress', 'released', 'declined']
+CATEGORIES = ['analytics', 'security', 'integration', 'ux', 'performance', 'compliance']
+WORDS = ('customers need a way to review usage trends across accounts and share results with finance '
+         'teams while keeping sensitive fields masked and exportable to spreadsheets or BI tools').split()
+
+
+def synthetic_rows(count, seed):
+    """A day of flattened rows with skewed team and status mixes, in arrival order"""
+    rng = random.Random(seed)
+    team_weights = [1 / (rank + 1) for rank in range(len(TEAMS))]
+    ids = []
+    for i in range(count):
+        request_id = f'{rng.getrandbits(64):016x}-{i:08d}'
+        is_duplicate = bool(ids) and rng.random() < 0.15
+        similar = rng.choice(ids) if is_duplicate else ''
+        ids.append(request_id)
+        yield {
+            'id': request_id,
+            'timestamp': f'2026-10-15T{i * 86400 // count // 3600:02d}:{i * 1440 // count % 60:02d}:00',
+            'ingestion_source': 'api_gateway',
+            'title': ' '.join(rng.choice(WORDS) for _ in range(6)),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))),
+            'priority': rng.choice(['low', 'medium', 'high']),
+            'category': rng.choice(CATEGORIES),
+            'ai_category': rng.choice(CATEGORIES),
+            'ai_priority': rng.choice(['low', 'medium', 'high']),
+            'forecast_status': rng.choices(STATUSES, weights=[5, 4, 2, 2, 1, 1])[0],
+            'forecast_confidence': round(rng.random(), 2),
+            'service_team': rng.choices(TEAMS, weights=team_weights)[0],
+            'is_duplicate': is_duplicate,
+            'duplicate_confidence': 0.9 if is_duplicate else 0.2,
+            'similar_request_id': similar,
+            'cluster_id': similar or request_id,
+            'cluster_size': 2 if is_duplicate else 1,
+        }
+
+
+def standard_queries(table):
+    """(name, projected columns, {column: accepted values}) for the dashboard and portal queries"""
+    probe_id = table.column('id')[table.num_rows // 2].as_py()
+    return [
+        ('team status breakdown', ['service_team', 'forecast_status'], {'service_team': {'billing'}}),
+        ('duplicate rate by category, planned', ['ai_category', 'is_duplicate'], {'forecast_status': {'planned'}}),
+        ('team duplicates list', ['id', 'title', 'similar_request_id'],
+         {'service_team': {'search'}, 'is_duplicate': {True}}),
+        ('request by id', ['id', 'title', 'description', 'forecast_status', 'service_team'], {'id': {probe_id}}),
+        ('full scan, forecast confidence', ['forecast_confidence'], {}),
+    ]
+
+
+def write_layouts(table, row_group_size, partition_column):
+    """{layout: [(path, parquet bytes)]}"""
+    layouts = {}
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size, compression=frmf_schema.COMPRESSION,
+                   use_dictionary=frmf_schema.DICTIONARY_COLUMNS)
+    layouts['baseline'] = [('day=15/compacted-0000.parquet', buffer.getvalue())]
+
+    ordered = frmf_schema.sort_table(table)
+    buffer = io.BytesIO()
+    frmf_schema.write_table(ordered, buffer, row_group_size=row_group_size)
+    layouts['sorted'] = [('day=15/compacted-0000.parquet', buffer.getvalue())]
+
+    files = []
+    for part, (segment, rows) in enumerate(frmf_schema.split_by_column(ordered, partition_column)):
+        buffer = io.BytesIO()
+        frmf_schema.write_table(rows, buffer, row_group_size=row_group_size)
+        files.append((f'day=15/{segment}/compacted-{part:04d}.parquet', buffer.getvalue()))
+    layouts['partitioned'] = files
+    return layouts
+
+
+def path_excludes(path, predicates):
+    """Partition pruning: a column=value directory that no accepted value maps to"""
+    for segment in path.split('/')[:-1]:
+        column, _, text = segment.partition('=')
+        if column in predicates and text not in {frmf_schema.partition_segment(column, value).split('=', 1)[1]
+                                                 for value in predicates[column]}:
+            return True
+    return False
+
+
+def stats_exclude(row_group, predicates):
+    """Row-group pruning: min/max statistics that no accepted value falls inside"""
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        accepted = predicates.get(column.path_in_schema)
+        statistics = column.statistics
+        if accepted is None or statistics is None or not statistics.has_min_max:
+            continue
+        if not any(statistics.min <= value <= statistics.max for value in accepted):
+            return True
+    return False
+
+
+def scanned_bytes(files, columns, predicates):
+    """(bytes read, row groups read, row groups total) for one query"""
+    total = read_groups = all_groups = 0
+    for path, body in files:
+        metadata = pq.ParquetFile(io.BytesIO(body)).metadata
+        all_groups += metadata.num_row_groups
+        if path_excludes(path, predicates):
+            continue
+        # The footer plus its length and magic bytes
+        total += metadata.serialized_size + 8
+        for g in range(metadata.num_row_groups):
+            row_group = metadata.row_group(g)
+            if stats_exclude(row_group, predicates):
+                continue
+            read_groups += 1
+            total += sum(
+                row_group.column(i).total_compressed_size
+                for i in range(row_group.num_columns)
+                if row_group.column(i).path_in_schema in columns
+            )
+    return total, read_groups, all_groups
+
+
+def bloom_filter_bytes(files):
+    total = 0
+    for _, body in files:
+        metadata = pq.ParquetFile(io.BytesIO(body)).metadata
+        for g in range(metadata.num_row_groups):
+            for i in range(metadata.num_columns):
+                total += max(0, metadata.row_group(g).column(i).bloom_filter_length or 0)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--row-group-size', type=int, default=20000,
+                        help='rows per row group (compaction uses COMPACTION_ROW_GROUP_SIZE)')
+    parser.add_argument('--partition-column', default=frmf_schema.PARTITION_COLUMN or 'service_team')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    builder = frmf_schema.RecordBatchBuilder()
+    builder.extend(synthetic_rows(args.rows, args.seed))
+    table = pa.Table.from_batches([builder.to_batch()])
+
+    start = time.perf_counter()
+    layouts = write_layouts(table, args.row_group_size, args.partition_column)
+    write_s = time.perf_counter() - start
+
+    report = {'rows': args.rows, 'row_group_size': args.row_group_size, 'write_s': round(write_s, 2), 'layouts': {}}
+    for layout, files in layouts.items():
+        queries = {}
+        for name, columns, predicates in standard_queries(table):
+            read, groups, all_groups = scanned_bytes(files, set(columns) | set(predicates), predicates)
+            queries[name] = {'bytes': read, 'row_groups': groups, 'row_groups_total': all_groups}
+        report['layouts'][layout] = {
+            'files': len(files),
+            'bytes': sum(len(body) for _, body in files),
+            'bloom_filter_bytes': bloom_filter_bytes(files),
+            'queries': queries,
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.rows} rows, {args.row_group_size} rows per row group "
+          f"(sort: {', '.join(frmf_schema.SORT_COLUMNS)}; partition: {args.partition_column})")
+    for layout, entry in report['layouts'].items():
+        print(f"{layout:12} {entry['files']:3} files {entry['bytes'] / 1e6:8.2f} MB "
+              f"(bloom filters {entry['bloom_filter_bytes'] / 1e3:.1f} KB)")
+    baseline = report['layouts']['baseline']['queries']
+    print(f"\n{'query':40} " + ' '.join(f'{layout:>22}' for layout in report['layouts']))
+    for name in baseline:
+        cells = []
+        for entry in report['layouts'].values():
+            query = entry['queries'][name]
+            ratio = query['bytes'] / baseline[name]['bytes'] if baseline[name]['bytes'] else 0
+            cells.append(f"{query['bytes'] / 1e3:9.1f} KB {ratio:5.0%} {query['row_groups']:3}rg")
+        print(f"{name:40} " + ' '.join(f'{cell:>22}' for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
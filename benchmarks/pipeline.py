@@ -0,0 +1,332 @@
+"""End-to-end local benchmark: ingestion -> processing -> dedup -> Parquet
+
+    python benchmarks/pipeline.py --synthetic 10000 --concurrency 8
+    python benchmarks/pipeline.py --replay requests.jsonl --bedrock-latency-ms 50
+
+Runs the real handlers from lambda/ in one process against fakes.InMemoryS3,
+a FakeBedrock with configurable latency, jitter, concurrency cap and
+throttling, and a FakeLambda that routes deduplication invokes to the real
+deduplication handler (and classification invokes to a Bedrock call, since the
+classification function is not part of this repository).
+
+Requests are ingested in chunks; every raw object written is handed to the
+processing handler by a pool of --concurrency workers, --records-per-invoke
+objects per invocation, the way batch_processor re-triggers them. The index,
+catalog, cluster and rollup folds that run on a schedule in AWS run every
+--fold-every requests. The report covers throughput, per-stage latency percentiles, fake
+service counters and peak memory.
+
+--replay reads JSONL whose lines carry a title plus a description (or body);
+--synthetic N generates N requests with a --dup-rate share of near-duplicates.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from fakes import CLASSIFICATION, FakeBedrock, FakeLambda, InMemoryS3  # noqa: E402
+
+RAW_BUCKET = 'bt101-raw-data-alpha-012258635969'
+PARQUET_BUCKET = 'bt101-parquet-data-alpha-012258635969'
+
+SUBJECTS = ['dashboard', 'alerting', 'export', 'audit log', 'search', 'API', 'billing report', 'SSO login',
+            'data pipeline', 'mobile app', 'notification', 'backup', 'access control', 'forecast view']
+ACTIONS = ['Add', 'Improve', 'Support', 'Automate', 'Speed up', 'Customize', 'Schedule', 'Integrate']
+QUALIFIERS = ['real-time', 'multi-region', 'per-team', 'bulk', 'self-service', 'encrypted', 'offline',
+              'role-based', 'cost-aware', 'historical']
+WORDS = ('customers need a way to review usage trends across accounts and share results with finance '
+         'teams while keeping sensitive fields masked and exportable to spreadsheets or BI tools on a '
+         'weekly schedule with retention controls latency budgets and clear ownership').split()
+
+
+class StageTimer:
+    """Collects per-stage durations (ms) from wrapped functions"""
+
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, elapsed_ms):
+        with self._lock:
+            self.durations.setdefault(stage, array('d')).append(elapsed_ms)
+
+    def wrap(self, owner, name, stage):
+        original = getattr(owner, name)
+
+        @wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, (time.perf_counter() - start) * 1000)
+
+        setattr(owner, name, timed)
+
+    def summary(self):
+        rows = {}
+        for stage, values in self.durations.items():
+            ordered = sorted(values)
+            rows[stage] = {
+                'count': len(ordered),
+                'p50_ms': percentile(ordered, 50),
+                'p90_ms': percentile(ordered, 90),
+                'p99_ms': percentile(ordered, 99),
+                'max_ms': ordered[-1],
+                'total_s': sum(ordered) / 1000
+            }
+        return rows
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def replay_corpus(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            title = entry.get('title')
+            description = entry.get('description') or entry.get('body')
+            if title and description:
+                yield {'title': title, 'description': description,
+                       'priority': entry.get('priority', 'medium'), 'category': entry.get('category', 'general')}
+
+
+def synthetic_corpus(count, dup_rate, seed):
+    """Generated requests; a dup_rate share re-words one of the last 1,000 requests"""
+    rng = random.Random(seed)
+    recent = []
+    for _ in range(count):
+        if recent and rng.random() < dup_rate:
+            base = rng.choice(recent)
+            words = base['description'].split()
+            tail = words[len(words) // 2:]
+            rng.shuffle(tail)
+            request = dict(base, description=' '.join(words[:len(words) // 2] + tail))
+        else:
+            subject = rng.choice(SUBJECTS)
+            request = {
+                'title': f"{rng.choice(ACTIONS)} {rng.choice(QUALIFIERS)} {subject}",
+                'description': f"{subject} " + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 40))),
+                'priority': rng.choice(['low', 'medium', 'high']),
+                'category': rng.choice(['analytics', 'security', 'integration', 'ux'])
+            }
+            recent.append(request)
+            if len(recent) > 1000:
+                recent.pop(0)
+        yield request
+
+
+def classification_route(bedrock):
+    """Stands in for the classification function: one Bedrock call, canned answer"""
+    def handle(event):
+        bedrock.invoke_model(
+            modelId='anthropic.claude-3-haiku-20240307-v1:0',
+            body=json.dumps({'messages': [{'role': 'user', 'content': (
+                f"Classify this feature request and forecast its delivery.\n"
+                f"Title: {event.get('title', '')}\nDescription: {event.get('description', '')}"
+            )}]})
+        )
+        return {'statusCode': 200, 'body': json.dumps(CLASSIFICATION)}
+    return handle
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    corpus_group = parser.add_mutually_exclusive_group(required=True)
+    corpus_group.add_argument('--replay', metavar='JSONL')
+    corpus_group.add_argument('--synthetic', type=int, metavar='N')
+    parser.add_argument('--dup-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--limit', type=int, default=0, help='stop after this many requests')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent processing invocations')
+    parser.add_argument('--records-per-invoke', type=int, default=1)
+    parser.add_argument('--record-workers', type=int, default=4, help='FRMF_MAX_RECORD_WORKERS')
+    parser.add_argument('--bulk-size', type=int, default=1, help='requests per ingestion call (bulk NDJSON if > 1)')
+    parser.add_argument('--chunk-size', type=int, default=500, help='requests ingested before processing them')
+    parser.add_argument('--fold-every', type=int, default=1000, help='requests between index/catalog/rollup folds')
+    parser.add_argument('--bedrock-latency-ms', type=float, default=800.0)
+    parser.add_argument('--bedrock-jitter-ms', type=float, default=200.0)
+    parser.add_argument('--bedrock-max-concurrency', type=int, default=50)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--lambda-overhead-ms', type=float, default=20.0)
+    parser.add_argument('--lambda-max-concurrency', type=int, default=1000)
+    parser.add_argument('--s3-latency-ms', type=float, default=0.0)
+    parser.add_argument('--no-response-cache', action='store_true')
+    parser.add_argument('--fused', action='store_true', help='FRMF_FUSED_ANALYSIS: one Bedrock call per request')
+    parser.add_argument('--trace-memory', action='store_true', help='tracemalloc peak (slows the run)')
+    parser.add_argument('--verbose', action='store_true', help='keep handler output')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+    os.environ['FRMF_MAX_RECORD_WORKERS'] = str(args.record_workers)
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false' if args.no_response_cache else 'true'
+    os.environ['FRMF_FUSED_ANALYSIS'] = 'true' if args.fused else 'false'
+    # Concurrent in-process invocations never leave the EMF buffer idle long enough to flush
+    os.environ.setdefault('METRICS_ENABLED', 'true' if args.verbose else 'false')
+
+    import aws_clients
+
+    s3 = InMemoryS3(latency_ms=args.s3_latency_ms)
+    for bucket in (RAW_BUCKET, PARQUET_BUCKET):
+        s3.create_bucket(Bucket=bucket)
+    bedrock = FakeBedrock(args.bedrock_latency_ms, args.bedrock_jitter_ms, args.bedrock_max_concurrency,
+                          args.throttle_rate, seed=args.seed)
+    aws_clients.override('s3', s3)
+    aws_clients.override('bedrock-runtime', bedrock)
+
+    import deduplication_improved
+    import duplicate_clusters
+    import enhanced_processing_frmf
+    import ingestion_working
+    import request_catalog
+    import rollups
+    import similarity_index
+
+    lambda_client = FakeLambda({
+        'deduplication': lambda event: deduplication_improved.handler(event, None),
+        'classification': classification_route(bedrock),
+    }, invoke_overhead_ms=args.lambda_overhead_ms, max_concurrency=args.lambda_max_concurrency)
+    aws_clients.override('lambda', lambda_client)
+
+    timer = StageTimer()
+    timer.wrap(ingestion_working, 'handler', 'ingestion')
+    timer.wrap(enhanced_processing_frmf, 'handler', 'processing')
+    timer.wrap(enhanced_processing_frmf, 'read_requests', 'read_raw')
+    timer.wrap(enhanced_processing_frmf, 'invoke_claude_classification_frmf', 'classification')
+    timer.wrap(enhanced_processing_frmf, 'invoke_claude_deduplication', 'deduplication')
+    timer.wrap(enhanced_processing_frmf, 'invoke_fused_analysis', 'fused_analysis')
+    timer.wrap(enhanced_processing_frmf, 'invoke_claude_deduplication_batch', 'dedup_batch')
+    timer.wrap(enhanced_processing_frmf, 'write_parquet_frmf', 'parquet_write')
+    timer.wrap(deduplication_improved, 'get_existing_requests_excluding_current', 'dedup_candidates')
+    timer.wrap(bedrock, 'invoke_model', 'bedrock')
+
+    raw_keys = []
+    s3.on_put(lambda bucket, key: raw_keys.append(key) if bucket == RAW_BUCKET else None)
+
+    corpus = replay_corpus(args.replay) if args.replay else synthetic_corpus(args.synthetic, args.dup_rate, args.seed)
+    if args.limit:
+        corpus = itertools.islice(corpus, args.limit)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    counters = {'requests': 0, 'invocations': 0, 'failed_invocations': 0, 'folds': 0}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    if not args.verbose:
+        # Throttling makes the handlers warn once per failed call
+        logging.disable(logging.WARNING)
+
+    def process(keys):
+        event = {'Records': [{'s3': {'bucket': {'name': RAW_BUCKET}, 'object': {'key': key}}} for key in keys]}
+        try:
+            enhanced_processing_frmf.handler(event, None)
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    since_fold = 0
+    with quiet, ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        for chunk in chunks(corpus, args.chunk_size):
+            for batch in chunks(chunk, args.bulk_size):
+                if args.bulk_size > 1:
+                    event = {'httpMethod': 'POST', 'headers': {'Content-Type': 'application/x-ndjson'},
+                             'body': '\n'.join(json.dumps(request) for request in batch)}
+                else:
+                    event = {'httpMethod': 'POST', 'body': json.dumps(batch[0])}
+                ingestion_working.handler(event, None)
+
+            keys, raw_keys[:] = list(raw_keys), []
+            outcomes = list(executor.map(process, list(chunks(keys, args.records_per_invoke))))
+            counters['invocations'] += len(outcomes)
+            counters['failed_invocations'] += outcomes.count(False)
+            counters['requests'] += len(chunk)
+
+            since_fold += len(chunk)
+            if since_fold >= args.fold_every:
+                fold_start = time.perf_counter()
+                similarity_index.fold_pending()
+                request_catalog.snapshot()
+                duplicate_clusters.fold_pending()
+                rollups.snapshot()
+                timer.record('fold', (time.perf_counter() - fold_start) * 1000)
+                counters['folds'] += 1
+                since_fold = 0
+    elapsed = time.perf_counter() - start
+    # Every finalized request should be counted once in the dashboard rollups
+    rollups.snapshot()
+    rollup_totals = rollups.load_rollup().query()
+
+    report = {
+        'requests': counters['requests'],
+        'elapsed_s': elapsed,
+        'throughput_rps': counters['requests'] / elapsed if elapsed else 0.0,
+        'invocations': counters['invocations'],
+        'failed_invocations': counters['failed_invocations'],
+        'folds': counters['folds'],
+        'stages': timer.summary(),
+        'bedrock': dict(bedrock.stats),
+        'lambda': dict(lambda_client.stats),
+        's3_ops': dict(s3.ops),
+        's3_bytes_written': s3.bytes_in,
+        'rollup_requests': rollup_totals[0]['requests'] if rollup_totals else 0,
+        'parquet_files': len([key for key in s3.keys(PARQUET_BUCKET) if key.endswith('.parquet')]),
+        # ru_maxrss is in KB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if enhanced_processing_frmf.classification_cache:
+        report['classification_cache'] = dict(enhanced_processing_frmf.classification_cache.stats)
+    if deduplication_improved.response_cache:
+        report['dedup_cache'] = dict(deduplication_improved.response_cache.stats)
+    if args.trace_memory:
+        report['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['requests']} requests in {elapsed:.1f}s - {report['throughput_rps']:.1f} req/s, "
+          f"{report['invocations']} processing invocations ({report['failed_invocations']} failed), "
+          f"{report['parquet_files']} Parquet files, {report['rollup_requests']} requests in rollups, peak RSS {report['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<18}{'count':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'total s':>10}")
+    for stage, row in report['stages'].items():
+        print(f"{stage:<18}{row['count']:>9}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}{row['total_s']:>10.1f}")
+    for name in ('bedrock', 'lambda', 's3_ops', 'classification_cache', 'dedup_cache', 'tracemalloc_peak_mb'):
+        if name in report:
+            print(f"{name}: {report[name]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 import { Duration, Stack, StackProps } from 'aws-cdk-lib';
+import { Rule, Schedule } from 'aws-cdk-lib/aws-events';
+import { LambdaFunction as LambdaFunctionTarget } from 'aws-cdk-lib/aws-events-targets';
 import { Function as LambdaFunction, Runtime, Code } from 'aws-cdk-lib/aws-lambda';
 import { PolicyStatement, Effect } from 'aws-cdk-lib/aws-iam';
 import { Construct } from 'constructs';
 import { DeploymentEnvironment } from '@amzn/pipelines';
+import { rawKeyLayoutEnvironment } from './rawKeyLayout';
 
 export interface ClaudeIntegrationStackProps {
   readonly env: DeploymentEnvironment;
@@ -14,6 +17,8 @@ import { DeploymentStack, SoftwareType } from '@amzn/pipelines';
 export class ClaudeIntegrationStack extends DeploymentStack {
   public readonly classificationFunction: LambdaFunction;
   public readonly deduplicationFunction: LambdaFunction;
+  public readonly similarityIndexFunction: LambdaFunction;
+  public readonly duplicateClustersFunction: LambdaFunction;
 
   constructor(scope: Construct, id: string, props: ClaudeIntegrationStackProps) {
     super(scope, id, {
@@ -36,11 +41,114 @@ export class ClaudeIntegrationStack extends DeploymentStack {
       functionName: `bt101-claude-deduplication-${props.stage}`,
       runtime: Runtime.PYTHON_3_11,
       handler: 'deduplication.handler',
+      environment: rawKeyLayoutEnvironment(),
       code: Code.fromAsset('../lambda'),
       timeout: Duration.minutes(5),
       memorySize: 1024,
     });
 
+    // Similarity index maintenance: folds pending dedup entries into the base index
+    this.similarityIndexFunction = new LambdaFunction(this, 'SimilarityIndexFunction', {
+      functionName: `bt101-similarity-index-${props.stage}`,
+      runtime: Runtime.PYTHON_3_11,
+      handler: 'similarity_index.handler',
+      code: Code.fromAsset('../lambda'),
+      timeout: Duration.minutes(15),
+      memorySize: 1024,
+    });
+
+    new Rule(this, 'SimilarityIndexSchedule', {
+      schedule: Schedule.rate(Duration.minutes(5)),
+      targets: [new LambdaFunctionTarget(this.similarityIndexFunction)],
+    });
+
+    // Duplicate cluster maintenance: folds pending duplicate links into the union-find store
+    this.duplicateClustersFunction = new LambdaFunction(this, 'DuplicateClustersFunction', {
+      functionName: `bt101-duplicate-clusters-${props.stage}`,
+      runtime: Runtime.PYTHON_3_11,
+      handler: 'duplicate_clusters.handler',
+      code: Code.fromAsset('../lambda'),
+      timeout: Duration.minutes(5),
+      memorySize: 1024,
+    });
+
+    new Rule(this, 'DuplicateClustersSchedule', {
+      schedule: Schedule.rate(Duration.minutes(5)),
+      targets: [new LambdaFunctionTarget(this.duplicateClustersFunction)],
+    });
+
+    const rawBucketArn = `arn:aws:s3:::bt101-raw-data-${props.stage}-${this.account}`;
+    const parquetBucketArn = `arn:aws:s3:::bt101-parquet-data-${props.stage}-${this.account}`;
+
+    // Deduplication reads candidates and registers new requests in the index
+    this.deduplicationFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:ListBucket'],
+        resources: [rawBucketArn, parquetBucketArn],
+      }),
+    );
+    this.deduplicationFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:GetObject'],
+        resources: [
+          `${rawBucketArn}/*`,
+          `${parquetBucketArn}/_index/*`,
+          `${parquetBucketArn}/_cache/*`,
+          `${parquetBucketArn}/_catalog/*`,
+        ],
+      }),
+    );
+    this.deduplicationFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:PutObject'],
+        resources: [
+          `${parquetBucketArn}/_index/dedup/pending/*`,
+          `${parquetBucketArn}/_index/clusters/pending/*`,
+          `${parquetBucketArn}/_cache/claude/deduplication/*`,
+        ],
+      }),
+    );
+
+    this.duplicateClustersFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:ListBucket'],
+        resources: [parquetBucketArn],
+      }),
+    );
+    this.duplicateClustersFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:GetObject', 's3:PutObject', 's3:DeleteObject'],
+        resources: [`${parquetBucketArn}/_index/clusters/*`],
+      }),
+    );
+
+    this.similarityIndexFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:ListBucket'],
+        resources: [rawBucketArn, parquetBucketArn],
+      }),
+    );
+    this.similarityIndexFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:GetObject'],
+        resources: [`${rawBucketArn}/*`],
+      }),
+    );
+    this.similarityIndexFunction.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ['s3:GetObject', 's3:PutObject', 's3:DeleteObject'],
+        resources: [`${parquetBucketArn}/_index/*`],
+      }),
+    );
+
     // Bedrock permissions
     const bedrockPolicy = new PolicyStatement({
       effect: Effect.ALLOW,
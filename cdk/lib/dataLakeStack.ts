@@ -11,6 +11,9 @@ import * as glue from 'aws-cdk-lib/aws-glue';
 import * as logs from 'aws-cdk-lib/aws-logs';
 import * as s3n from 'aws-cdk-lib/aws-s3-notifications';
 import * as elasticsearch from 'aws-cdk-lib/aws-elasticsearch';
+import * as events from 'aws-cdk-lib/aws-events';
+import * as targets from 'aws-cdk-lib/aws-events-targets';
+import { partitionProjectionParameters, rawKeyLayoutEnvironment, rawKeyPartitionKeys } from './rawKeyLayout';
 
 interface DataLakeStackProps {
   readonly env: DeploymentEnvironment;
@@ -51,6 +54,12 @@ export class DataLakeStack extends DeploymentStack {
       bucketName: `bt101-parquet-data-${props.stage}-${this.account}`,
       versioned: true,
       lifecycleRules: [
+        {
+          id: 'ExpireResponseCache',
+          prefix: '_cache/',
+          expiration: Duration.days(30),
+          noncurrentVersionExpiration: Duration.days(1),
+        },
         {
           id: 'TransitionToIA',
           transitions: [
@@ -65,14 +74,107 @@ export class DataLakeStack extends DeploymentStack {
     });
 
     // Glue Database for Lake Formation
-    new glue.CfnDatabase(this, 'DataLakeDatabase', {
+    const databaseName = `bt101_datalake_${props.stage}`;
+    const database = new glue.CfnDatabase(this, 'DataLakeDatabase', {
       catalogId: this.account,
       databaseInput: {
-        name: `bt101_datalake_${props.stage}`,
+        name: databaseName,
         description: 'Data Lake database for BT101 project',
       },
     });
 
+    // Athena tables with partition projection: no crawler runs, and queries
+    // filtering on year/month/day only read the matching prefixes
+    const featureRequestColumns = [
+      { name: 'title', type: 'string' },
+      { name: 'description', type: 'string' },
+      { name: 'priority', type: 'string' },
+      { name: 'category', type: 'string' },
+    ];
+    const featureRequestType = `struct<${featureRequestColumns.map((c) => `${c.name}:${c.type}`).join(',')}>`;
+    const rawTable = new glue.CfnTable(this, 'RawFeatureRequestsTable', {
+      catalogId: this.account,
+      databaseName,
+      tableInput: {
+        name: 'feature_requests_raw',
+        tableType: 'EXTERNAL_TABLE',
+        partitionKeys: rawKeyPartitionKeys(),
+        parameters: {
+          classification: 'json',
+          ...partitionProjectionParameters(this.rawBucket.bucketName),
+        },
+        storageDescriptor: {
+          location: `s3://${this.rawBucket.bucketName}/`,
+          inputFormat: 'org.apache.hadoop.mapred.TextInputFormat',
+          outputFormat: 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
+          serdeInfo: { serializationLibrary: 'org.openx.data.jsonserde.JsonSerDe' },
+          columns: [
+            { name: 'id', type: 'string' },
+            { name: 'timestamp', type: 'string' },
+            { name: 'ingestion_source', type: 'string' },
+            { name: 'feature_request', type: featureRequestType },
+            // Bulk objects carry their requests in records
+            { name: 'batch_id', type: 'string' },
+            {
+              name: 'records',
+              type: `array<struct<id:string,timestamp:string,ingestion_source:string,feature_request:${featureRequestType}>>`,
+            },
+          ],
+        },
+      },
+    });
+    rawTable.addDependency(database);
+
+    // Processed columns follow lambda/frmf_schema.py; Parquet partitions are not sharded
+    const processedTable = new glue.CfnTable(this, 'ProcessedFeatureRequestsTable', {
+      catalogId: this.account,
+      databaseName,
+      tableInput: {
+        name: 'feature_requests',
+        tableType: 'EXTERNAL_TABLE',
+        partitionKeys: rawKeyPartitionKeys(false),
+        parameters: {
+          classification: 'parquet',
+          ...partitionProjectionParameters(this.parquetBucket.bucketName, false),
+        },
+        storageDescriptor: {
+          location: `s3://${this.parquetBucket.bucketName}/`,
+          inputFormat: 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+          outputFormat: 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+          serdeInfo: { serializationLibrary: 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe' },
+          columns: [
+            { name: 'schema_version', type: 'int' },
+            { name: 'id', type: 'string' },
+            { name: 'timestamp', type: 'string' },
+            { name: 'ingestion_source', type: 'string' },
+            { name: 'feature_request_raw', type: 'string' },
+            ...featureRequestColumns,
+            { name: 'ai_category', type: 'string' },
+            { name: 'ai_priority', type: 'string' },
+            { name: 'ai_complexity', type: 'string' },
+            { name: 'ai_effort', type: 'string' },
+            { name: 'ai_tags', type: 'string' },
+            { name: 'forecast_status', type: 'string' },
+            { name: 'forecast_timeline', type: 'string' },
+            { name: 'forecast_confidence', type: 'double' },
+            { name: 'service_team', type: 'string' },
+            { name: 'customer_visible', type: 'boolean' },
+            { name: 'legal_disclaimer_accepted', type: 'boolean' },
+            { name: 'is_duplicate', type: 'boolean' },
+            { name: 'duplicate_confidence', type: 'double' },
+            { name: 'similar_request_id', type: 'string' },
+            { name: 'duplicate_check_degraded', type: 'boolean' },
+            { name: 'cluster_id', type: 'string' },
+            { name: 'cluster_size', type: 'int' },
+            { name: 'workaround_available', type: 'boolean' },
+            { name: 'workaround_text', type: 'string' },
+            { name: 'workaround_confidence', type: 'double' },
+          ],
+        },
+      },
+    });
+    processedTable.addDependency(database);
+
     // Lake Formation Data Lake Settings
     new lakeformation.CfnDataLakeSettings(this, 'DataLakeSettings', {
       admins: [
@@ -86,48 +188,10 @@ export class DataLakeStack extends DeploymentStack {
     const ingestionLambda = new lambda.Function(this, 'IngestionLambda', {
       functionName: `bt101-ingestion-${props.stage}`,
       runtime: lambda.Runtime.PYTHON_3_11,
-      handler: 'index.handler',
-      code: lambda.Code.fromInline(`
-import json
-import boto3
-import uuid
-from datetime import datetime
-
-s3 = boto3.client('s3')
-
-def handler(event, context):
-    try:
-        # Parse incoming data
-        body = json.loads(event.get('body', '{}'))
-        
-        # Add metadata for feature request
-        record = {
-            'id': str(uuid.uuid4()),
-            'timestamp': datetime.utcnow().isoformat(),
-            'ingestion_source': 'api_gateway',
-            'feature_request': body
-        }
-        
-        # Store in raw bucket
-        key = f"year={datetime.now().year}/month={datetime.now().month:02d}/day={datetime.now().day:02d}/{record['id']}.json"
-        
-        s3.put_object(
-            Bucket='${this.rawBucket.bucketName}',
-            Key=key,
-            Body=json.dumps(record),
-            ContentType='application/json'
-        )
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'message': 'Data ingested successfully', 'id': record['id']})
-        }
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
-        }
-      `),
+      // Single UTC timestamp per request, hash-sharded keys (lambda/raw_layout.py)
+      handler: 'ingestion_working.handler',
+      code: lambda.Code.fromAsset('../lambda'),
+      environment: rawKeyLayoutEnvironment(),
       timeout: Duration.seconds(30),
       memorySize: 256,
       logGroup: new logs.LogGroup(this, 'IngestionLambdaLogs', {
@@ -144,6 +208,7 @@ def handler(event, context):
       functionName: `bt101-processing-${props.stage}`,
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'enhanced_processing.handler',
+      environment: rawKeyLayoutEnvironment(),
       layers: [
         lambda.LayerVersion.fromLayerVersionArn(
           this,
@@ -163,6 +228,90 @@ def handler(event, context):
     // Grant permissions to processing lambda
     this.rawBucket.grantRead(processingLambda);
     this.parquetBucket.grantWrite(processingLambda);
+    // Persistent tier of the Claude response cache
+    this.parquetBucket.grantRead(processingLambda, '_cache/*');
+
+    // Compaction Lambda: merges a day's single-row Parquet files into large row-group files
+    const compactionLambda = new lambda.Function(this, 'CompactionLambda', {
+      functionName: `bt101-compaction-${props.stage}`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'compaction.handler',
+      environment: rawKeyLayoutEnvironment(),
+      layers: [
+        lambda.LayerVersion.fromLayerVersionArn(
+          this,
+          'PandasLayerForCompaction',
+          `arn:aws:lambda:${this.region}:336392948345:layer:AWSSDKPandas-Python311:7`,
+        ),
+      ],
+      code: lambda.Code.fromAsset('../lambda'),
+      timeout: Duration.minutes(15),
+      memorySize: 3008,
+      logGroup: new logs.LogGroup(this, 'CompactionLambdaLogs', {
+        retention: logs.RetentionDays.ONE_WEEK,
+        removalPolicy: RemovalPolicy.DESTROY,
+      }),
+    });
+
+    this.parquetBucket.grantReadWrite(compactionLambda);
+    this.parquetBucket.grantDelete(compactionLambda);
+
+    // Compact yesterday's partition once it is complete
+    new events.Rule(this, 'CompactionSchedule', {
+      schedule: events.Schedule.cron({ minute: '30', hour: '1' }),
+      targets: [new targets.LambdaFunction(compactionLambda)],
+    });
+
+    // Request catalog snapshot Lambda: folds catalog deltas into the rolling-window snapshot
+    const catalogSnapshotLambda = new lambda.Function(this, 'CatalogSnapshotLambda', {
+      functionName: `bt101-catalog-snapshot-${props.stage}`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'request_catalog.handler',
+      code: lambda.Code.fromAsset('../lambda'),
+      environment: {
+        CATALOG_WINDOW_DAYS: '90',
+      },
+      timeout: Duration.minutes(5),
+      memorySize: 1024,
+      logGroup: new logs.LogGroup(this, 'CatalogSnapshotLambdaLogs', {
+        retention: logs.RetentionDays.ONE_WEEK,
+        removalPolicy: RemovalPolicy.DESTROY,
+      }),
+    });
+
+    this.parquetBucket.grantReadWrite(catalogSnapshotLambda, '_catalog/*');
+    this.parquetBucket.grantDelete(catalogSnapshotLambda, '_catalog/*');
+
+    new events.Rule(this, 'CatalogSnapshotSchedule', {
+      schedule: events.Schedule.rate(Duration.minutes(5)),
+      targets: [new targets.LambdaFunction(catalogSnapshotLambda)],
+    });
+
+    // Rollups Lambda: folds per-invocation aggregate deltas into the dashboard
+    // snapshot, and answers GET /summary from that one object
+    const rollupsLambda = new lambda.Function(this, 'RollupsLambda', {
+      functionName: `bt101-rollups-${props.stage}`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'rollups.handler',
+      code: lambda.Code.fromAsset('../lambda'),
+      environment: {
+        ROLLUP_WINDOW_DAYS: '400',
+      },
+      timeout: Duration.minutes(5),
+      memorySize: 512,
+      logGroup: new logs.LogGroup(this, 'RollupsLambdaLogs', {
+        retention: logs.RetentionDays.ONE_WEEK,
+        removalPolicy: RemovalPolicy.DESTROY,
+      }),
+    });
+
+    this.parquetBucket.grantReadWrite(rollupsLambda, '_rollups/*');
+    this.parquetBucket.grantDelete(rollupsLambda, '_rollups/*');
+
+    new events.Rule(this, 'RollupsSnapshotSchedule', {
+      schedule: events.Schedule.rate(Duration.minutes(5)),
+      targets: [new targets.LambdaFunction(rollupsLambda)],
+    });
 
     // Grant processing lambda permission to invoke Claude functions
     processingLambda.addToRolePolicy(
@@ -224,13 +373,15 @@ def handler(event, context):
       ],
       environment: {
         ELASTICSEARCH_ENDPOINT: this.opensearchDomain.domainEndpoint,
+        BULK_MAX_BYTES: String(5 * 1024 * 1024),
       },
       code: lambda.Code.fromInline(`
 import json
 import boto3
-import pandas as pd
 import io
 import os
+import time
+import pyarrow.parquet as pq
 from urllib.parse import unquote_plus
 from datetime import datetime
 from botocore.auth import SigV4Auth
@@ -242,6 +393,19 @@ session = boto3.Session()
 credentials = session.get_credentials()
 http = urllib3.PoolManager()
 
+INDEX_NAME = 'bt101-feature-requests'
+# Only the columns the search index uses are read from the Parquet file
+INDEXED_COLUMNS = [
+    'id', 'timestamp', 'ingestion_source', 'title', 'description', 'priority', 'category', 'feature_request_raw',
+    'ai_category', 'ai_priority', 'ai_complexity', 'ai_effort', 'ai_tags',
+    'forecast_status', 'forecast_timeline', 'forecast_confidence', 'service_team',
+    'is_duplicate', 'duplicate_confidence', 'similar_request_id', 'cluster_id', 'cluster_size',
+    'workaround_available', 'workaround_confidence',
+]
+BULK_MAX_BYTES = int(os.environ.get('BULK_MAX_BYTES', str(5 * 1024 * 1024)))
+BULK_MAX_RETRIES = int(os.environ.get('BULK_MAX_RETRIES', '3'))
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
 def handler(event, context):
     try:
         elasticsearch_endpoint = f"https://{os.environ['ELASTICSEARCH_ENDPOINT']}"
@@ -251,57 +415,29 @@ def handler(event, context):
             bucket = record['s3']['bucket']['name']
             key = unquote_plus(record['s3']['object']['key'])
             
+            # Compacted files only re-package rows that are already indexed
+            if key.rsplit('/', 1)[-1].startswith('compacted-'):
+                print(f"Skipping compacted file: {key}")
+                continue
+            
             print(f"Processing Parquet file: {key} from bucket: {bucket}")
             
-            # Read Parquet file from S3
+            # Read only the indexed columns from the Parquet file
             response = s3.get_object(Bucket=bucket, Key=key)
-            parquet_data = response['Body'].read()
-            
-            # Convert Parquet to DataFrame
-            parquet_buffer = io.BytesIO(parquet_data)
-            df = pd.read_parquet(parquet_buffer)
-            
-            print(f"Read {len(df)} records from Parquet file")
+            parquet_file = pq.ParquetFile(io.BytesIO(response['Body'].read()))
+            columns = [c for c in INDEXED_COLUMNS if c in parquet_file.schema_arrow.names]
+            docs = parquet_file.read(columns=columns).to_pylist()
             
-            # Index each record to Elasticsearch
-            index_name = "bt101-feature-requests"
+            print(f"Read {len(docs)} records from Parquet file")
             
-            for _, row in df.iterrows():
-                # Prepare document for Elasticsearch
-                doc = {
-                    "id": row.get('id', ''),
-                    "timestamp": row.get('timestamp', ''),
-                    "ingestion_source": row.get('ingestion_source', ''),
-                    "title": row.get('title', ''),
-                    "description": row.get('description', ''),
-                    "priority": row.get('priority', ''),
-                    "category": row.get('category', ''),
-                    "feature_request_raw": row.get('feature_request_raw', ''),
-                    "indexed_at": datetime.utcnow().isoformat()
-                }
-                
-                # Index document to Elasticsearch with AWS Signature V4
-                doc_id = row.get('id', 'unknown')
-                index_url = f"{elasticsearch_endpoint}/{index_name}/_doc/{doc_id}"
-                
-                # Create AWS request with SigV4 authentication
-                request = AWSRequest(method='PUT', url=index_url, data=json.dumps(doc), headers={'Content-Type': 'application/json'})
-                SigV4Auth(credentials, 'es', os.environ['AWS_REGION']).add_auth(request)
-                
-                # Make the request
-                response = http.request(
-                    request.method,
-                    request.url,
-                    body=request.body,
-                    headers=dict(request.headers)
-                )
-                
-                if response.status in [200, 201]:
-                    print(f"Successfully indexed document {doc_id}")
-                else:
-                    print(f"Failed to index document {doc_id}: {response.status} - {response.data.decode()}")
+            indexed_at = datetime.utcnow().isoformat()
+            for doc in docs:
+                doc['indexed_at'] = indexed_at
             
-            print(f"Completed indexing for file: {key}")
+            indexed, failed = bulk_index(elasticsearch_endpoint, docs)
+            print(f"Completed indexing for file: {key} ({indexed} indexed, {len(failed)} failed)")
+            for doc_id, error in failed:
+                print(f"Failed to index document {doc_id}: {error}")
             
         return {'statusCode': 200, 'body': 'Indexing completed successfully'}
         
@@ -310,6 +446,57 @@ def handler(event, context):
         import traceback
         traceback.print_exc()
         return {'statusCode': 500, 'body': str(e)}
+
+def bulk_index(endpoint, docs):
+    """Index docs with _bulk requests up to BULK_MAX_BYTES, retrying only the failed items"""
+    pending = [(doc.get('id') or 'unknown', doc) for doc in docs]
+    indexed = 0
+    failed = []
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        retry = []
+        for chunk in bulk_chunks(pending):
+            for (doc_id, doc), item in zip(chunk, send_bulk(endpoint, chunk)):
+                status = item.get('status', 500)
+                if status in (200, 201):
+                    indexed += 1
+                elif status in RETRYABLE_STATUSES and attempt < BULK_MAX_RETRIES:
+                    retry.append((doc_id, doc))
+                else:
+                    failed.append((doc_id, item.get('error', status)))
+        if not retry:
+            break
+        pending = retry
+        time.sleep(min(2 ** attempt, 10))
+    return indexed, failed
+
+def bulk_chunks(items):
+    """Split (doc_id, doc) pairs into chunks whose NDJSON body fits in BULK_MAX_BYTES"""
+    chunk, size = [], 0
+    for doc_id, doc in items:
+        item_size = len(bulk_lines(doc_id, doc).encode('utf-8'))
+        if chunk and size + item_size > BULK_MAX_BYTES:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append((doc_id, doc))
+        size += item_size
+    if chunk:
+        yield chunk
+
+def bulk_lines(doc_id, doc):
+    return json.dumps({'index': {'_index': INDEX_NAME, '_id': doc_id}}) + '\\n' + json.dumps(doc, default=str) + '\\n'
+
+def send_bulk(endpoint, chunk):
+    """Send one signed _bulk request; returns one result per item"""
+    body = ''.join(bulk_lines(doc_id, doc) for doc_id, doc in chunk)
+    request = AWSRequest(method='POST', url=f"{endpoint}/_bulk", data=body, headers={'Content-Type': 'application/x-ndjson'})
+    SigV4Auth(credentials, 'es', os.environ['AWS_REGION']).add_auth(request)
+    response = http.request(request.method, request.url, body=request.body, headers=dict(request.headers))
+    
+    if response.status != 200:
+        # The whole request failed; report every item with the HTTP status so retryable ones are retried
+        return [{'status': response.status, 'error': response.data.decode()[:200]}] * len(chunk)
+    
+    return [next(iter(item.values())) for item in json.loads(response.data.decode()).get('items', [])]
       `),
       timeout: Duration.minutes(10),
       memorySize: 1024,
@@ -363,28 +550,56 @@ def handler(event, context):
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'index.handler',
       code: lambda.Code.fromInline(`
-import json,boto3,os
+import base64,json,os,re,time
+from collections import OrderedDict
+import boto3
 from botocore.auth import SigV4Auth
 from botocore.awsrequest import AWSRequest
 import urllib3
+
+# Shared across invocations of a warm container; the credentials object refreshes itself
+cr=boto3.Session().get_credentials()
+http=urllib3.PoolManager(maxsize=10,timeout=urllib3.Timeout(connect=2,read=10),retries=False)
+ep=f"https://{os.environ['ELASTICSEARCH_ENDPOINT']}"
+TTL=int(os.environ.get('SEARCH_CACHE_TTL_SECONDS','30'))
+MAX_ENTRIES=int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES','256'))
+MAX_SIZE=100
+cache=OrderedDict()
+FIELDS=['id','title','description','priority','category','timestamp','cluster_id','cluster_size']
+
 def handler(e,c):
  try:
-  s=boto3.Session();cr=s.get_credentials();http=urllib3.PoolManager()
-  ep=f"https://{os.environ['ELASTICSEARCH_ENDPOINT']}"
   q=e.get('queryStringParameters') or {}
-  t,sz=q.get('q',''),int(q.get('size','10'))
-  eq={"size":sz,"query":{"match_all":{}}} if not t else {"size":sz,"query":{"multi_match":{"query":t,"fields":["title","description"]}}}
-  r=AWSRequest('POST',f"{ep}/bt101-feature-requests/_search",json.dumps(eq),{'Content-Type':'application/json'})
+  t=re.sub(r'\\s+',' ',q.get('q','')).strip().lower()
+  sz=max(1,min(int(q.get('size','10')),MAX_SIZE))
+  cur=q.get('cursor') or ''
+  k=(t,sz,cur)
+  hit=cache.get(k)
+  if hit and hit[0]>time.time():
+   cache.move_to_end(k);return ok(hit[1])
+  eq={"size":sz,"query":{"multi_match":{"query":t,"fields":["title","description"]}} if t else {"match_all":{}},
+      # Tie-break on id so search_after cursors page deterministically
+      "sort":[{"_score":"desc"},{"id.keyword":"asc"}],"track_scores":True}
+  if cur:eq["search_after"]=json.loads(base64.urlsafe_b64decode(cur.encode()))
+  r=AWSRequest(method='POST',url=f"{ep}/bt101-feature-requests/_search",data=json.dumps(eq),headers={'Content-Type':'application/json'})
   SigV4Auth(cr,'es',os.environ['AWS_REGION']).add_auth(r)
   res=http.request(r.method,r.url,body=r.body,headers=dict(r.headers))
-  if res.status==200:
-   d=json.loads(res.data.decode());hits=d.get('hits',{}).get('hits',[])
-   return {'statusCode':200,'headers':{'Content-Type':'application/json','Access-Control-Allow-Origin':'*'},'body':json.dumps({'total':d.get('hits',{}).get('total',{}).get('value',0),'results':[{'id':hit['_source'].get('id'),'title':hit['_source'].get('title'),'description':hit['_source'].get('description'),'priority':hit['_source'].get('priority'),'category':hit['_source'].get('category'),'timestamp':hit['_source'].get('timestamp'),'score':hit['_score']} for hit in hits]})
-  return {'statusCode':500,'body':json.dumps({'error':f'Failed: {res.status}'})}
+  if res.status!=200:return {'statusCode':500,'body':json.dumps({'error':f'Failed: {res.status}'})}
+  d=json.loads(res.data.decode());hits=d.get('hits',{}).get('hits',[])
+  body=json.dumps({'total':d.get('hits',{}).get('total',{}).get('value',0),
+   'results':[dict({f:hit['_source'].get(f) for f in FIELDS},score=hit['_score']) for hit in hits],
+   'next_cursor':base64.urlsafe_b64encode(json.dumps(hits[-1]['sort']).encode()).decode() if len(hits)==sz else None})
+  cache[k]=(time.time()+TTL,body);cache.move_to_end(k)
+  while len(cache)>MAX_ENTRIES:cache.popitem(last=False)
+  return ok(body)
  except Exception as ex:return {'statusCode':500,'body':json.dumps({'error':str(ex)})}
+
+def ok(body):return {'statusCode':200,'headers':{'Content-Type':'application/json','Access-Control-Allow-Origin':'*'},'body':body}
       `),
       environment: {
         ELASTICSEARCH_ENDPOINT: this.opensearchDomain.domainEndpoint,
+        SEARCH_CACHE_TTL_SECONDS: '30',
+        SEARCH_CACHE_MAX_ENTRIES: '256',
       },
       timeout: Duration.seconds(30),
       memorySize: 256,
@@ -413,6 +628,7 @@ def handler(e,c):
     // API Gateway Integration
     const ingestionIntegration = new apigateway.LambdaIntegration(ingestionLambda);
     const searchIntegration = new apigateway.LambdaIntegration(searchLambda);
+    const summaryIntegration = new apigateway.LambdaIntegration(rollupsLambda);
 
     const dataResource = this.ingestionApi.root.addResource('data');
     dataResource.addMethod('POST', ingestionIntegration);
@@ -420,6 +636,9 @@ def handler(e,c):
     const searchResource = this.ingestionApi.root.addResource('search');
     searchResource.addMethod('GET', searchIntegration);
 
+    const summaryResource = this.ingestionApi.root.addResource('summary');
+    summaryResource.addMethod('GET', summaryIntegration);
+
     // Athena for querying
     const athenaRole = new iam.Role(this, 'AthenaRole', {
       assumedBy: new iam.ServicePrincipal('athena.amazonaws.com'),
@@ -8,6 +8,7 @@ import {
   Dashboard,
   GraphWidget,
   MathExpression,
+  Metric,
   PeriodOverride,
   Statistic,
   TextWidget,
@@ -15,6 +16,20 @@ import {
 } from 'aws-cdk-lib/aws-cloudwatch';
 import { IFunction } from 'aws-cdk-lib/aws-lambda';
 
+/** Namespace of the per-stage spans the Lambda functions emit in Embedded Metric Format (lambda/metrics.py) */
+const PIPELINE_METRICS_NAMESPACE = 'FRMF/Pipeline';
+
+/** Stages with a p99 latency alarm; thresholds in milliseconds */
+const PIPELINE_STAGE_ALARMS = [
+  { service: 'ingestion', stage: 's3_write', thresholdMs: 1000 },
+  { service: 'processing', stage: 's3_read', thresholdMs: 1000 },
+  { service: 'processing', stage: 'classification', thresholdMs: 30000 },
+  { service: 'processing', stage: 'deduplication', thresholdMs: 30000 },
+  { service: 'processing', stage: 'parquet_write', thresholdMs: 5000 },
+  { service: 'deduplication', stage: 'candidate_retrieval', thresholdMs: 3000 },
+  { service: 'deduplication', stage: 'bedrock_invoke', thresholdMs: 20000 },
+];
+
 interface MonitoringStackProps {
   readonly env: DeploymentEnvironment;
   readonly lambdaFunction: IFunction;
@@ -28,6 +43,17 @@ export class MonitoringStack extends DeploymentStack {
     });
     this.createSummaryDashboard();
     this.createServiceDashboard();
+    this.createPipelineStageDashboard();
+  }
+
+  private pipelineMetric(service: string, stage: string, metricName: string, statistic: string) {
+    return new Metric({
+      namespace: PIPELINE_METRICS_NAMESPACE,
+      metricName,
+      dimensionsMap: { Service: service, Stage: stage },
+      statistic,
+      period: Duration.minutes(5),
+    });
   }
 
   /**
@@ -276,4 +302,84 @@ export class MonitoringStack extends DeploymentStack {
       }),
     );
   }
+
+  /**
+   * Create a dashboard with a p99 latency alarm per pipeline stage, plus Bedrock token usage and
+   * response cache hit rates, from the EMF spans the Lambda functions emit. The overall Lambda
+   * duration alarm only shows that a request got slower; these show which stage did.
+   */
+  private createPipelineStageDashboard() {
+    const stageDashboard = new Dashboard(this, 'FRLMPipelineStageDashboard', {
+      dashboardName: 'FRLM-Pipeline-Stages',
+      start: '-' + Duration.hours(8).toIsoString(),
+      periodOverride: PeriodOverride.INHERIT,
+    });
+
+    stageDashboard.addWidgets(
+      new TextWidget({
+        width: 24,
+        height: 1,
+        markdown: '# Pipeline stage dashboard',
+      }),
+      ...PIPELINE_STAGE_ALARMS.map(
+        ({ service, stage, thresholdMs }) =>
+          new AlarmWidget({
+            width: 8,
+            height: 6,
+            title: `${service} / ${stage} P99`,
+            alarm: new Alarm(this, `FRLMStageLatencyAlarm-${service}-${stage}`, {
+              metric: this.pipelineMetric(service, stage, 'Duration', 'p99'),
+              threshold: thresholdMs,
+              evaluationPeriods: 3,
+              treatMissingData: TreatMissingData.NOT_BREACHING,
+            }),
+            leftYAxis: {
+              min: 0,
+              label: 'ms',
+              showUnits: false,
+            },
+          }),
+      ),
+      new GraphWidget({
+        width: 12,
+        height: 6,
+        title: 'Bedrock tokens (deduplication)',
+        left: [
+          this.pipelineMetric('deduplication', 'bedrock_invoke', 'InputTokens', Statistic.SUM),
+          this.pipelineMetric('deduplication', 'bedrock_invoke', 'OutputTokens', Statistic.SUM),
+        ],
+        leftYAxis: {
+          min: 0,
+          showUnits: false,
+        },
+      }),
+      new GraphWidget({
+        width: 12,
+        height: 6,
+        title: 'Response cache hit rate',
+        left: [
+          new MathExpression({
+            expression: 'hits*100',
+            usingMetrics: {
+              hits: this.pipelineMetric('processing', 'classification_cache', 'CacheHit', Statistic.AVERAGE),
+            },
+            label: 'Classification',
+          }),
+          new MathExpression({
+            expression: 'hits*100',
+            usingMetrics: {
+              hits: this.pipelineMetric('deduplication', 'verdict_cache', 'CacheHit', Statistic.AVERAGE),
+            },
+            label: 'Deduplication',
+          }),
+        ],
+        leftYAxis: {
+          min: 0,
+          max: 100,
+          label: '%',
+          showUnits: false,
+        },
+      }),
+    );
+  }
 }
@@ -0,0 +1,52 @@
+import * as glue from 'aws-cdk-lib/aws-glue';
+
+// Object key layout; must match lambda/raw_layout.py:
+//   raw:     shard=<hex>/year=YYYY/month=MM/day=DD[/hour=HH]/<name>.json
+//   Parquet: year=YYYY/month=MM/day=DD[/hour=HH]/<name>.parquet (unsharded)
+// Every function that writes or enumerates raw keys gets these as environment
+// variables, and the Athena tables project their partitions from them.
+export const RAW_KEY_SHARD_DIGITS = 1;
+export const RAW_KEY_HOURLY = false;
+
+export function rawKeyLayoutEnvironment(): { [key: string]: string } {
+  return {
+    RAW_KEY_SHARD_DIGITS: String(RAW_KEY_SHARD_DIGITS),
+    RAW_KEY_HOURLY: String(RAW_KEY_HOURLY),
+  };
+}
+
+export function rawKeyPartitionKeys(sharded = true): glue.CfnTable.ColumnProperty[] {
+  const names = [...(sharded && RAW_KEY_SHARD_DIGITS > 0 ? ['shard'] : []), 'year', 'month', 'day', ...(RAW_KEY_HOURLY ? ['hour'] : [])];
+  return names.map((name) => ({ name, type: 'string' }));
+}
+
+// Athena partition projection: partitions are computed from the key layout
+// instead of being registered by a crawler or MSCK REPAIR
+export function partitionProjectionParameters(bucketName: string, sharded = true): { [key: string]: string } {
+  const shards = Array.from({ length: 16 ** RAW_KEY_SHARD_DIGITS }, (_, value) =>
+    value.toString(16).padStart(RAW_KEY_SHARD_DIGITS, '0'),
+  );
+  const path = rawKeyPartitionKeys(sharded).map((column) => column.name + '=${' + column.name + '}');
+  const parameters: { [key: string]: string } = {
+    'projection.enabled': 'true',
+    'projection.year.type': 'integer',
+    'projection.year.range': '2024,2100',
+    'projection.month.type': 'integer',
+    'projection.month.range': '1,12',
+    'projection.month.digits': '2',
+    'projection.day.type': 'integer',
+    'projection.day.range': '1,31',
+    'projection.day.digits': '2',
+    'storage.location.template': 's3://' + bucketName + '/' + path.join('/') + '/',
+  };
+  if (sharded && RAW_KEY_SHARD_DIGITS > 0) {
+    parameters['projection.shard.type'] = 'enum';
+    parameters['projection.shard.values'] = shards.join(',');
+  }
+  if (RAW_KEY_HOURLY) {
+    parameters['projection.hour.type'] = 'integer';
+    parameters['projection.hour.range'] = '0,23';
+    parameters['projection.hour.digits'] = '2';
+  }
+  return parameters;
+}
@@ -0,0 +1,65 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+# Build every client at import instead of on first use; worth it when init
+# runs ahead of traffic (SnapStart, provisioned concurrency)
+EAGER_CLIENTS = os.environ.get('EAGER_CLIENTS', 'false').lower() == 'true'
+# botocore's default of 10 pooled connections per client would queue the
+# thread pools that share a client
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+
+_clients = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def get_client(service, **kwargs):
+    """One shared boto3 client per service and arguments for the whole process"""
+    if service in _overrides:
+        return _overrides[service]
+    key = (service, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is None:
+        # Client construction on the default session is not thread-safe
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                config = Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+                if kwargs.get('config') is not None:
+                    config = config.merge(kwargs['config'])
+                client = boto3.client(service, **dict(kwargs, config=config))
+                _clients[key] = client
+    return client
+
+
+class LazyClient:
+    """Stands in for a boto3 client and builds the shared one on first attribute access"""
+
+    def __init__(self, service, **kwargs):
+        self._service = service
+        self._kwargs = kwargs
+        if EAGER_CLIENTS:
+            get_client(service, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(get_client(self._service, **self._kwargs), name)
+
+
+def lazy_client(service, **kwargs):
+    return LazyClient(service, **kwargs)
+
+
+def override(service, client):
+    """Serve a stand-in for a service to every lazy client (used by local benchmarks)"""
+    with _lock:
+        _overrides[service] = client
+
+
+def reset():
+    """Drop every shared client and override"""
+    with _lock:
+        _clients.clear()
+        _overrides.clear()
@@ -1,80 +1,180 @@
 import json
-import boto3
-from datetime import datetime, timedelta
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-s3 = boto3.client('s3')
-lambda_client = boto3.client('lambda')
+import raw_layout
+import s3_store
+from aws_clients import lazy_client
+
+s3 = lazy_client('s3')
+lambda_client = lazy_client('lambda')
+
+LOOKBACK_DAYS = int(os.environ.get('BATCH_LOOKBACK_DAYS', '2'))
+LIST_WORKERS = int(os.environ.get('BATCH_LIST_WORKERS', '8'))
+# Split each day into 16 listings by the first hex character of the file name
+SHARD_BY_ID = os.environ.get('BATCH_SHARD_BY_ID', 'false').lower() == 'true'
+
+# Re-trigger payload packing; async invoke payloads are limited to 256 KB.
+# The records budget counts requests, not keys: a bulk object counts as
+# raw_layout.BULK_RECORDS_PER_OBJECT, so with the defaults it goes alone.
+RECORDS_PER_INVOKE = int(os.environ.get('BATCH_RECORDS_PER_INVOKE', '25'))
+MAX_PAYLOAD_BYTES = int(os.environ.get('BATCH_MAX_PAYLOAD_BYTES', '240000'))
+MAX_CONCURRENT_INVOKES = int(os.environ.get('BATCH_MAX_CONCURRENT_INVOKES', '4'))
+# Remaining payloads wait for the next run, keeping catch-up within concurrency limits
+MAX_INVOKES_PER_RUN = int(os.environ.get('BATCH_MAX_INVOKES_PER_RUN', '200'))
+MANIFEST_PREFIXES = ('_manifests/batches/', '_manifests/compaction/')
 
 def handler(event, context):
     """Batch process unprocessed JSON files every 5 minutes"""
     
     raw_bucket = 'bt101-raw-data-alpha-012258635969'
     processed_bucket = 'bt101-parquet-data-alpha-012258635969'
+    event = event or {}
     
     try:
-        # Get all JSON files from today
-        today = datetime.now()
-        prefix = f'year={today.year}/month={today.month:02d}/day={today.day:02d}/'
+        # Diff full listings of both buckets for every partition in the lookback window
+        lookback_days = int(event.get('lookback_days', LOOKBACK_DAYS))
+        prefixes = event.get('prefixes') or raw_layout.partition_prefixes(datetime.utcnow(), lookback_days)
+        shard_by_id = event.get('shard_by_id', SHARD_BY_ID)
+        shards = [
+            (prefix, prefix + shard)
+            for prefix in prefixes
+            for shard in ('0123456789abcdef' if shard_by_id else [''])
+        ]
+        
+        # Parquet partitions are unsharded: every shard of a day shares one listing
+        processed_prefixes = list(dict.fromkeys(raw_layout.unsharded(prefix) for prefix in prefixes))
         
-        response = s3.list_objects_v2(
-            Bucket=raw_bucket,
-            Prefix=prefix
+        with ThreadPoolExecutor(max_workers=max(1, min(LIST_WORKERS, len(shards)))) as executor:
+            processed_by_prefix = dict(zip(processed_prefixes, executor.map(
+                lambda prefix: get_processed(processed_bucket, prefix),
+                processed_prefixes
+            )))
+            shard_results = executor.map(
+                lambda shard: scan_partition(raw_bucket, shard[1], processed_by_prefix[raw_layout.unsharded(shard[0])]),
+                shards
+            )
+            unprocessed_by_prefix = {prefix: [] for prefix in prefixes}
+            for (prefix, _), unprocessed in zip(shards, shard_results):
+                unprocessed_by_prefix[prefix].extend(unprocessed)
+        
+        # Without shards, the hourly layout's day prefix also lists its hours
+        unprocessed = list(dict.fromkeys(key for keys in unprocessed_by_prefix.values() for key in keys))
+        for prefix, keys in unprocessed_by_prefix.items():
+            print(f"{prefix}: {len(keys)} unprocessed files")
+        
+        # Pack keys into multi-record payloads and dispatch them with bounded concurrency
+        payloads = pack_payloads(
+            raw_bucket,
+            unprocessed,
+            int(event.get('records_per_invoke', RECORDS_PER_INVOKE)),
+            int(event.get('max_payload_bytes', MAX_PAYLOAD_BYTES))
         )
+        max_invokes = int(event.get('max_invokes', MAX_INVOKES_PER_RUN))
+        dispatched, deferred = payloads[:max_invokes], payloads[max_invokes:]
         
-        processed_count = 0
+        with ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENT_INVOKES)) as executor:
+            report = list(executor.map(dispatch_payload, dispatched))
         
-        if 'Contents' in response:
-            print(f"Found {len(response['Contents'])} objects in bucket")
-            for obj in response['Contents']:
-                key = obj['Key']
-                print(f"Checking file: {key}")
-                
-                # Skip if not JSON
-                if not key.endswith('.json'):
-                    print(f"Skipping non-JSON file: {key}")
-                    continue
-                
-                # Check if already processed
-                parquet_key = key.replace('.json', '.parquet')
-                try:
-                    s3.head_object(Bucket=processed_bucket, Key=parquet_key)
-                    print(f"Already processed: {key}")
-                    continue  # Already processed
-                except Exception:
-                    print(f"Not processed yet: {key}")
-                    pass  # Not processed yet
-                
-                # Process this file
-                try:
-                    lambda_client.invoke(
-                        FunctionName='bt101-processing-alpha',
-                        InvocationType='Event',  # Async
-                        Payload=json.dumps({
-                            'Records': [{
-                                's3': {
-                                    'bucket': {'name': raw_bucket},
-                                    'object': {'key': key}
-                                }
-                            }]
-                        })
-                    )
-                    processed_count += 1
-                    print(f"Triggered processing for: {key}")
-                    
-                except Exception as e:
-                    print(f"Failed to process {key}: {e}")
+        processed_count = sum(entry['records'] for entry in report if entry['status'] == 'dispatched')
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': f'Batch processing complete. Processed {processed_count} files.',
-                'processed_count': processed_count
+                'processed_count': processed_count,
+                'unprocessed_by_partition': {prefix: len(keys) for prefix, keys in unprocessed_by_prefix.items()},
+                'invocations': report,
+                'failed_count': sum(entry['records'] for entry in report if entry['status'] == 'failed'),
+                'deferred_count': sum(len(json.loads(payload)['Records']) for payload in deferred)
             })
         }
-        
+    
     except Exception as e:
         print(f"Batch processing error: {e}")
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+def pack_payloads(bucket, keys, max_records, max_bytes):
+    """Pack keys into 'Records' payloads bounded by request count and serialized size
+
+    A key counts as the requests its object can hold; one over the budget on
+    its own still gets a payload, by itself.
+    """
+    payloads = []
+    records = []
+    count = 0
+    size = len(json.dumps({'Records': []}))
+    for key in keys:
+        record = {'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}}
+        record_size = len(json.dumps(record)) + 2
+        weight = raw_layout.records_in(key)
+        if records and (count + weight > max_records or size + record_size > max_bytes):
+            payloads.append(json.dumps({'Records': records}))
+            records = []
+            count = 0
+            size = len(json.dumps({'Records': []}))
+        records.append(record)
+        count += weight
+        size += record_size
+    if records:
+        payloads.append(json.dumps({'Records': records}))
+    return payloads
+
+def dispatch_payload(payload):
+    """Async-invoke processing with one multi-record payload and report the outcome"""
+    keys = [record['s3']['object']['key'] for record in json.loads(payload)['Records']]
+    try:
+        lambda_client.invoke(
+            FunctionName='bt101-processing-alpha',
+            InvocationType='Event',  # Async
+            Payload=payload
+        )
+        print(f"Triggered processing for {len(keys)} files starting at {keys[0]}")
+        return {'status': 'dispatched', 'records': len(keys), 'bytes': len(payload), 'first_key': keys[0]}
+    except Exception as e:
+        print(f"Failed to process {len(keys)} files starting at {keys[0]}: {e}")
+        return {'status': 'failed', 'records': len(keys), 'bytes': len(payload), 'first_key': keys[0], 'error': str(e)}
+
+def scan_partition(raw_bucket, prefix, processed):
+    """Unprocessed keys for one shard; a failed scan skips the shard rather than re-triggering it"""
+    if processed is None:
+        return []
+    try:
+        return find_unprocessed_keys(raw_bucket, prefix, *processed)
+    except Exception as e:
+        print(f"Failed to scan {prefix}: {e}")
+        return []
+
+def find_unprocessed_keys(raw_bucket, prefix, parquet_keys, covered=()):
+    """Raw JSON keys under a prefix with no Parquet output, computed as an in-memory set difference"""
+    return sorted(
+        key for key in s3_store.list_keys(raw_bucket, prefix)
+        if key.endswith('.json') and key not in covered and raw_layout.processed_key(key) not in parquet_keys
+    )
+
+def get_processed(processed_bucket, prefix):
+    """(Parquet keys, raw keys covered by manifests) for an unsharded partition, or None if unreadable"""
+    try:
+        parquet_keys = {key for key in s3_store.list_keys(processed_bucket, prefix) if key.endswith('.parquet')}
+    except Exception as e:
+        print(f"Failed to list processed files for {prefix}: {e}")
+        return None
+    covered = get_manifest_keys(processed_bucket, prefix)
+    return None if covered is None else (parquet_keys, covered)
+
+def get_manifest_keys(processed_bucket, prefix):
+    """Raw keys already covered by combined batch or compacted Parquet files, or None if unreadable"""
+    keys = set()
+    try:
+        for manifest_prefix in MANIFEST_PREFIXES:
+            for manifest_key in s3_store.list_keys(processed_bucket, f'{manifest_prefix}{prefix}'):
+                manifest = json.loads(s3.get_object(Bucket=processed_bucket, Key=manifest_key)['Body'].read())
+                keys.update(manifest.get('source_keys', []))
+    except Exception as e:
+        print(f"Failed to read manifests for {prefix}: {e}")
+        return None
+    return keys
\ No newline at end of file
@@ -0,0 +1,118 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, ReadTimeoutError
+
+from metrics import record
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CONCURRENCY = float(os.environ.get('BEDROCK_INITIAL_CONCURRENCY', '4'))
+MAX_CONCURRENCY = float(os.environ.get('BEDROCK_MAX_CONCURRENCY', '16'))
+DEADLINE_SECONDS = float(os.environ.get('BEDROCK_DEADLINE_SECONDS', '60'))
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_CAP_SECONDS = 8.0
+
+# Bedrock clients must not retry on their own: botocore's hidden backoff would
+# hide throttling from the limiter and run past DEADLINE_SECONDS
+CLIENT_CONFIG = Config(retries={'total_max_attempts': 1, 'mode': 'standard'})
+
+# Errors that mean "too much load right now" rather than "this request is wrong"
+RETRYABLE_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+    'InternalServerException',
+}
+
+
+class BedrockUnavailable(Exception):
+    """Bedrock could not answer within the deadline; callers must not treat this as a negative"""
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one per window of successes and halves on throttling"""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, maximum=MAX_CONCURRENCY, minimum=1.0, decrease=0.5):
+        self.limit = initial
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout):
+        """Wait for a slot; False if none frees up within timeout seconds"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # Calls already in flight when the limit dropped throttle too;
+                # halving once per second keeps one overload from collapsing the limit
+                if now - self._last_decrease >= 1.0:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+# One limiter per container, shared by every thread that calls Bedrock. It
+# does not coordinate containers: it bounds the calls one invocation makes at
+# once, which is where a batch's chunk prompts fan out. A single-request
+# invocation makes one call at a time and only gets the throttle retries.
+limiter = AIMDLimiter()
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectTimeoutError, ReadTimeoutError)):
+        return True
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in RETRYABLE_CODES
+
+
+def invoke_model(client, deadline_seconds=DEADLINE_SECONDS, **kwargs):
+    """client.invoke_model under the shared limiter, retrying throttles with full jitter until the deadline
+
+    Raises BedrockUnavailable when the deadline passes; other errors propagate.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not limiter.acquire(remaining):
+            record('bedrock_limiter', {'Error': 1})
+            raise BedrockUnavailable(f"No Bedrock answer within {deadline_seconds}s ({attempt} attempts)")
+
+        attempt += 1
+        try:
+            response = client.invoke_model(**kwargs)
+        except Exception as e:
+            retryable = is_retryable(e)
+            limiter.release(throttled=retryable)
+            if not retryable:
+                raise
+            logger.warning(f"Bedrock attempt {attempt} throttled ({e}); limit now {limiter.limit:.1f}")
+            record('bedrock_limiter', {'Retries': 1})
+            backoff = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+            time.sleep(max(0.0, min(backoff, deadline - time.monotonic())))
+            continue
+
+        limiter.release()
+        return response
@@ -0,0 +1,199 @@
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import frmf_schema
+import raw_layout
+import s3_store
+from aws_clients import lazy_client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+s3 = lazy_client('s3')
+
+PARQUET_BUCKET = 'bt101-parquet-data-alpha-012258635969'
+COMPACTION_MANIFEST_PREFIX = '_manifests/compaction/'
+BATCH_MANIFEST_PREFIX = '_manifests/batches/'
+COMPACTED_FILE_PREFIX = 'compacted-'
+
+ROW_GROUP_SIZE = int(os.environ.get('COMPACTION_ROW_GROUP_SIZE', '100000'))
+MAX_ROWS_PER_FILE = int(os.environ.get('COMPACTION_MAX_ROWS_PER_FILE', '1000000'))
+DELETE_SOURCES = os.environ.get('COMPACTION_DELETE_SOURCES', 'true').lower() == 'true'
+# Sub-partition compacted output by this column (PARQUET_PARTITION_COLUMN); empty writes one set of files per partition.
+# Cheaper for queries filtering on it, dearer for all others on small days; see frmf_schema.PARTITION_COLUMN
+PARTITION_COLUMN = frmf_schema.PARTITION_COLUMN
+
+
+def handler(event, context):
+    """Merge small Parquet files into a few large row-group files, for one partition or every partition of a day"""
+    event = event or {}
+    delete_sources = event.get('delete_sources', DELETE_SOURCES)
+    partition_column = event.get('partition_column', PARTITION_COLUMN)
+    if event.get('partition'):
+        result = compact_partition(event['partition'].rstrip('/'), delete_sources=delete_sources,
+                                   partition_column=partition_column)
+    else:
+        partitions = raw_layout.day_partitions(compaction_day(event.get('date')), sharded=False)
+        results = [
+            compact_partition(partition, delete_sources=delete_sources, partition_column=partition_column)
+            for partition in partitions
+        ]
+        result = {
+            'partitions': [result for result in results if result['source_files']],
+            'partitions_scanned': len(partitions)
+        }
+    logger.info(f"Compaction complete: {json.dumps(result)}")
+    return {'statusCode': 200, 'body': result}
+
+
+def compaction_day(date=None):
+    """UTC day for a YYYY-MM-DD date, defaulting to yesterday"""
+    day = datetime.strptime(date, '%Y-%m-%d') if date else datetime.utcnow() - timedelta(days=1)
+    return day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def compact_partition(partition, delete_sources=False, partition_column=''):
+    """Compact every not-yet-compacted Parquet file under a partition prefix
+
+    Output rows are sorted by frmf_schema.SORT_COLUMNS. With partition_column,
+    output goes to <partition>/<column>=<value>/ with one value per file, so
+    Athena skips whole files on a filter over that column.
+    """
+    # Direct children only: a day prefix of the hourly layout also lists its hour partitions
+    source_files = [
+        key for key in s3_store.list_keys(PARQUET_BUCKET, f'{partition}/')
+        if key.endswith('.parquet') and key.rsplit('/', 1)[0] == partition
+        and not key.rsplit('/', 1)[-1].startswith(COMPACTED_FILE_PREFIX)
+    ]
+    if len(source_files) < 2:
+        return {'partition': partition, 'source_files': len(source_files), 'output_files': []}
+
+    tables = []
+    for key in source_files:
+        body = s3.get_object(Bucket=PARQUET_BUCKET, Key=key)['Body'].read()
+        tables.append(pq.read_table(io.BytesIO(body)))
+
+    table = frmf_schema.sort_table(drop_duplicate_ids(concat_with_unified_schema(tables)))
+    if partition_column and partition_column in table.column_names:
+        groups = [(f'{partition}/{segment}', rows) for segment, rows in frmf_schema.split_by_column(table, partition_column)]
+    else:
+        groups = [(partition, table)]
+
+    compaction_id = str(uuid.uuid4())
+    output_files = []
+    part = 0
+    for prefix, rows in groups:
+        for offset in range(0, rows.num_rows, MAX_ROWS_PER_FILE):
+            output_key = f'{prefix}/{COMPACTED_FILE_PREFIX}{compaction_id}-{part:04d}.parquet'
+            buffer = io.BytesIO()
+            frmf_schema.write_table(rows.slice(offset, MAX_ROWS_PER_FILE), buffer, row_group_size=ROW_GROUP_SIZE)
+            s3.put_object(
+                Bucket=PARQUET_BUCKET,
+                Key=output_key,
+                Body=buffer.getvalue(),
+                ContentType='application/octet-stream'
+            )
+            output_files.append(output_key)
+            part += 1
+
+    # The manifest is written before anything is deleted, so the originals
+    # are only removed once the merged output is durable and traceable
+    manifest = {
+        'compaction_id': compaction_id,
+        'partition': partition,
+        'output_files': output_files,
+        'source_files': source_files,
+        'source_keys': sorted(raw_keys_for(partition, source_files)),
+        'row_count': table.num_rows,
+        'created_at': datetime.utcnow().isoformat()
+    }
+    s3.put_object(
+        Bucket=PARQUET_BUCKET,
+        Key=f'{COMPACTION_MANIFEST_PREFIX}{partition}/{COMPACTED_FILE_PREFIX}{compaction_id}.json',
+        Body=json.dumps(manifest),
+        ContentType='application/json'
+    )
+
+    if delete_sources:
+        s3_store.delete_keys(PARQUET_BUCKET, source_files)
+
+    return {
+        'partition': partition,
+        'source_files': len(source_files),
+        'output_files': output_files,
+        'row_count': table.num_rows,
+        'sources_deleted': bool(delete_sources)
+    }
+
+
+def concat_with_unified_schema(tables):
+    """Concatenate tables whose column sets and types drift between files"""
+    field_types = {}
+    for table in tables:
+        for field in table.schema:
+            field_types.setdefault(field.name, []).append(field.type)
+
+    schema = pa.schema([pa.field(name, unify_types(types)) for name, types in field_types.items()])
+
+    aligned = []
+    for table in tables:
+        columns = []
+        for field in schema:
+            if field.name in table.column_names:
+                columns.append(table.column(field.name).cast(field.type))
+            else:
+                columns.append(pa.nulls(table.num_rows, type=field.type))
+        aligned.append(pa.Table.from_arrays(columns, schema=schema))
+    return pa.concat_tables(aligned)
+
+
+def unify_types(types):
+    """Pick one Arrow type that every observed type of a column can be cast to"""
+    distinct = {t for t in types if not pa.types.is_null(t)}
+    if not distinct:
+        return pa.string()
+    if len(distinct) == 1:
+        return distinct.pop()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_boolean(t) for t in distinct):
+        return pa.float64()
+    return pa.string()
+
+
+def drop_duplicate_ids(table):
+    """Keep the first row for each request id (re-triggered records can be written twice)"""
+    if 'id' not in table.column_names:
+        return table
+    seen = set()
+    keep = []
+    for i, request_id in enumerate(table.column('id').to_pylist()):
+        if request_id is None or request_id not in seen:
+            keep.append(i)
+            seen.add(request_id)
+    if len(keep) == table.num_rows:
+        return table
+    return table.take(pa.array(keep, type=pa.int64()))
+
+
+def raw_keys_for(partition, source_files):
+    """Raw JSON keys covered by the merged files, so batch_processor still treats them as processed"""
+    raw_keys = set()
+    batch_files = set()
+    for key in source_files:
+        if key.rsplit('/', 1)[-1].startswith('batch-'):
+            batch_files.add(key)
+        else:
+            raw_keys.update(raw_layout.raw_keys_for_processed(key))
+
+    if batch_files:
+        for manifest_key in s3_store.list_keys(PARQUET_BUCKET, f'{BATCH_MANIFEST_PREFIX}{partition}/'):
+            manifest = json.loads(s3.get_object(Bucket=PARQUET_BUCKET, Key=manifest_key)['Body'].read())
+            if manifest.get('parquet_key') in batch_files:
+                raw_keys.update(manifest.get('source_keys', []))
+    return raw_keys
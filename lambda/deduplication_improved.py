@@ -1,51 +1,132 @@
 import json
-import boto3
+import logging
+import math
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
-s3 = boto3.client('s3')
-bedrock = boto3.client('bedrock-runtime', region_name='us-west-2')
+from botocore.config import Config
 
+import bedrock_limiter
+import duplicate_clusters
+import prompt_builder
+import raw_layout
+import request_catalog
+import similarity_index
+from aws_clients import lazy_client
+from metrics import instrumented, record, span
+from response_cache import cache_key, create_cache
+
+logger = logging.getLogger()
+# Per-request detail (every candidate, Claude's raw reply) is opt-in
+logger.setLevel(logging.DEBUG if os.environ.get('VERBOSE_LOGGING', 'false').lower() == 'true' else logging.INFO)
+
+# Candidate GETs fail fast: a slow candidate is dropped rather than waited on.
+# Dropping only cancels fetches still queued; a running one holds its pool
+# worker until the client gives up, so it gets one attempt whose connect and
+# read each time out with the batch's fetch budget.
+CANDIDATE_FETCH_WORKERS = int(os.environ.get('DEDUP_FETCH_WORKERS', '10'))
+CANDIDATE_FETCH_TIMEOUT = float(os.environ.get('DEDUP_FETCH_TIMEOUT_SECONDS', '2'))
+
+s3 = lazy_client('s3', config=Config(
+    connect_timeout=CANDIDATE_FETCH_TIMEOUT,
+    read_timeout=CANDIDATE_FETCH_TIMEOUT,
+    retries={'total_max_attempts': 1, 'mode': 'standard'}
+))
+bedrock = lazy_client('bedrock-runtime', region_name='us-west-2', config=bedrock_limiter.CLIENT_CONFIG)
+
+RAW_BUCKET = 'bt101-raw-data-alpha-012258635969'
+CANDIDATE_TOP_K = int(os.environ.get('DEDUP_CANDIDATE_TOP_K', '10'))
+# Index matches fetched per candidate slot before collapsing them to cluster representatives
+CLUSTER_OVERFETCH = int(os.environ.get('DEDUP_CLUSTER_OVERFETCH', '3'))
+
+# A candidate reaches Claude only if it passes either lexical threshold
+JACCARD_THRESHOLD = float(os.environ.get('DEDUP_JACCARD_THRESHOLD', '0.1'))
+COSINE_THRESHOLD = float(os.environ.get('DEDUP_COSINE_THRESHOLD', '0.25'))
+
+DEDUP_MODEL_ID = 'anthropic.claude-3-haiku-20240307-v1:0'
+# Bump whenever the prompt in prompt_builder changes so cached verdicts are not reused
+DEDUP_PROMPT_VERSION = 'dedup-strict-v2'
+FUSED_PROMPT_VERSION = 'fused-v1'
+
+# Survives across warm invocations
+response_cache = create_cache('deduplication')
+# Threads start on first use and are reused by later warm invocations
+fetch_pool = ThreadPoolExecutor(max_workers=CANDIDATE_FETCH_WORKERS)
+# A batch's chunk prompts go to Bedrock together; the pool is as large as the
+# limiter's ceiling, so the limiter alone decides how many run at once
+prompt_pool = ThreadPoolExecutor(max_workers=int(bedrock_limiter.MAX_CONCURRENCY))
+
+@instrumented('deduplication')
 def handler(event, context):
     """Improved deduplication with stricter criteria"""
     try:
         current_id = event.get('id', '')
+        raw_key = event.get('key', '')
         title = event.get('title', '')
         description = event.get('description', '')
         
-        print(f"DEBUG: Processing request ID: {current_id}")
-        print(f"DEBUG: Title: {title}")
+        logger.debug(f"Processing request ID: {current_id}")
+        logger.debug(f"Title: {title}")
+        
+        if event.get('mode') == 'fused':
+            return {
+                'statusCode': 200,
+                'body': handle_fused(event)
+            }
+        if event.get('mode') == 'batch':
+            return {
+                'statusCode': 200,
+                'body': {'verdicts': handle_batch(event.get('requests', []))}
+            }
         
         if not title or not description:
-            print("DEBUG: Missing title or description")
+            logger.debug("Missing title or description")
             return {
                 'statusCode': 200,
                 'body': {
                     'is_duplicate': False,
                     'confidence': 0,
-                    'similar_requests': []
+                    'similar_requests': [],
+                    'degraded': False
                 }
             }
         
-        existing_requests = get_existing_requests_excluding_current(current_id)
+        clusters = load_clusters()
+        existing_count, candidates, prefilter_scores = shortlist_candidates(current_id, raw_key, title, description, clusters)
         
-        print(f"DEBUG: Found {len(existing_requests)} existing requests to compare against")
-        for req in existing_requests:
-            print(f"DEBUG: Existing request - ID: {req['id']}, Title: {req['title'][:50]}...")
+        if not existing_count:
+            logger.debug("No existing requests found - marking as not duplicate")
+            return {
+                'statusCode': 200,
+                'body': {
+                    'is_duplicate': False,
+                    'confidence': 0,
+                    'similar_requests': [],
+                    'reason': 'No previous requests to compare against',
+                    'degraded': False
+                }
+            }
         
-        if not existing_requests:
-            print("DEBUG: No existing requests found - marking as not duplicate")
+        if not candidates:
+            logger.debug("No candidate passed the lexical pre-filter - skipping Claude")
             return {
                 'statusCode': 200,
                 'body': {
                     'is_duplicate': False,
                     'confidence': 0,
                     'similar_requests': [],
-                    'reason': 'No previous requests to compare against'
+                    'reason': 'No existing request passed the lexical pre-filter',
+                    'prefilter_scores': prefilter_scores,
+                    'degraded': False
                 }
             }
         
-        duplicate_result = find_duplicates_with_improved_prompt(title, description, existing_requests)
-        print(f"DEBUG: Claude result: {duplicate_result}")
+        duplicate_result = find_duplicates_with_improved_prompt(title, description, candidates)
+        duplicate_result['prefilter_scores'] = prefilter_scores
+        assign_cluster(current_id, duplicate_result, clusters)
+        logger.debug(f"Claude result: {duplicate_result}")
         
         return {
             'statusCode': 200,
@@ -53,131 +134,484 @@ def handler(event, context):
         }
         
     except Exception as e:
-        print(f"Deduplication error: {e}")
+        logger.error(f"Deduplication error: {e}")
         return {
             'statusCode': 200,
-            'body': {
+            'body': error_body(event.get('mode'))
+        }
+
+def shortlist_candidates(current_id, raw_key, title, description, clusters, stores=None):
+    """Retrieve, register and pre-filter; returns (existing_count, ranked candidates, prefilter_scores)
+
+    stores is a (catalog, index) pair from load_candidate_stores, shared by a batch.
+    """
+    signature = similarity_index.request_signature(title, description)
+    with span('candidate_retrieval') as stage:
+        existing_requests = get_existing_requests_excluding_current(current_id, signature, title, description, clusters,
+                                                                    stores)
+        stage['Rows'] = len(existing_requests)
+    with span('index_register'):
+        register_request(current_id, raw_key, signature)
+    
+    logger.debug(f"Found {len(existing_requests)} existing requests to compare against")
+    if logger.isEnabledFor(logging.DEBUG):
+        for req in existing_requests:
+            logger.debug(f"Existing request - ID: {req['id']}, Title: {req['title'][:50]}...")
+    
+    if not existing_requests:
+        return 0, [], []
+    
+    prefilter_scores = score_candidates(title, description, existing_requests)
+    passing_ids = {score['id'] for score in prefilter_scores if score['passed']}
+    # Most similar first, so the prompt budget drops the weakest candidates
+    rank = {score['id']: position for position, score in enumerate(prefilter_scores)}
+    candidates = sorted((req for req in existing_requests if req['id'] in passing_ids), key=lambda req: rank[req['id']])
+    return len(existing_requests), candidates, prefilter_scores
+
+def handle_fused(event):
+    """Classification, forecast and duplicate verdict from one Bedrock call"""
+    fields = {name: event.get(name, '') for name in ('title', 'description', 'priority', 'category')}
+    candidates, prefilter_scores = [], []
+    clusters = load_clusters()
+    # Classification is still wanted when there is nothing to compare against
+    if fields['title'] and fields['description']:
+        _, candidates, prefilter_scores = shortlist_candidates(
+            event.get('id', ''), event.get('key', ''), fields['title'], fields['description'], clusters
+        )
+    
+    analysis = analyze_fused(fields, candidates)
+    analysis['deduplication']['prefilter_scores'] = prefilter_scores
+    assign_cluster(event.get('id', ''), analysis['deduplication'], clusters)
+    return analysis
+
+def handle_batch(requests):
+    """Verdicts by id for many new requests, from as few Bedrock calls as the prompt budget allows"""
+    verdicts = {}
+    shortlisted = []
+    batch_ids = {req.get('id') for req in requests}
+    clusters = load_clusters()
+    # One catalog and index load for the whole batch; the batch's own requests are filtered out below anyway
+    stores = load_candidate_stores()
+    for req in requests:
+        if not req.get('title') or not req.get('description'):
+            verdicts[req.get('id', '')] = {'is_duplicate': False, 'confidence': 0, 'similar_requests': [], 'degraded': False}
+            continue
+        _, candidates, prefilter_scores = shortlist_candidates(
+            req.get('id', ''), req.get('key', ''), req['title'], req['description'], clusters, stores
+        )
+        # The catalog already lists the rest of the batch; those pairs are grouped below instead
+        candidates = [candidate for candidate in candidates if candidate['id'] not in batch_ids]
+        shortlisted.append((req, candidates, prefilter_scores))
+    
+    # Requests with no candidate and no look-alike in the batch never reach Claude
+    groups = group_batch_lookalikes([req for req, _, _ in shortlisted])
+    candidates_by_id = {req['id']: candidates for req, candidates, _ in shortlisted}
+    to_ask = []
+    for group in groups:
+        if len(group) == 1 and not candidates_by_id[group[0]['id']]:
+            verdicts[group[0]['id']] = {
                 'is_duplicate': False,
                 'confidence': 0,
-                'similar_requests': []
+                'similar_requests': [],
+                'reason': 'No existing request passed the lexical pre-filter',
+                'degraded': False
             }
-        }
+        else:
+            to_ask.append([(req, candidates_by_id[req['id']]) for req in group])
+    
+    for chunk_verdicts in prompt_pool.map(find_duplicates_batch, prompt_builder.build_batch_dedup_prompts(to_ask)):
+        verdicts.update(chunk_verdicts)
+    
+    for req, _, prefilter_scores in shortlisted:
+        verdicts[req['id']]['prefilter_scores'] = prefilter_scores
+        # Arrival order, so a within-batch link finds its earlier request already placed
+        assign_cluster(req['id'], verdicts[req['id']], clusters)
+    return verdicts
+
+def group_batch_lookalikes(requests):
+    """Group new requests that pass the lexical pre-filter against each other, in arrival order"""
+    group_of = {}
+    groups = []
+    for position, req in enumerate(requests):
+        earlier = requests[:position]
+        scores = score_candidates(req['title'], req['description'], earlier) if earlier else []
+        matches = [group_of[score['id']] for score in scores if score['passed'] and score['id'] in group_of]
+        if matches:
+            # Merge every group this request links, keeping the earliest
+            target = min(matches, key=groups.index)
+            for other in matches:
+                if other is not target and other in groups:
+                    target.extend(other)
+                    groups.remove(other)
+                    for member in other:
+                        group_of[member['id']] = target
+            target.append(req)
+            group_of[req['id']] = target
+        else:
+            groups.append([req])
+            group_of[req['id']] = groups[-1]
+    # Keep each group in arrival order so "earlier" in the prompt means earlier submitted
+    order = {req['id']: position for position, req in enumerate(requests)}
+    return [sorted(group, key=lambda req: order[req['id']]) for group in groups]
+
+def find_duplicates_batch(prompt):
+    """One Bedrock call for a chunk of new requests; a request without a usable verdict is degraded"""
+    try:
+        claude_response = invoke_claude(prompt)
+        logger.debug(f"Claude raw batch response: {claude_response}")
+        verdicts = prompt_builder.parse_batch_reply(claude_response, prompt)
+        reason = 'missing_verdict'
+    except bedrock_limiter.BedrockUnavailable as e:
+        logger.error(f"Claude batch deduplication unavailable: {e}")
+        verdicts, reason = {}, 'bedrock_unavailable'
+    except ValueError as e:
+        logger.warning(f"Claude batch reply rejected: {e}")
+        verdicts, reason = {}, 'unparseable_response'
+    except Exception as e:
+        logger.error(f"Claude batch deduplication error: {e}")
+        verdicts, reason = {}, 'error'
+    
+    for request_id in prompt.request_ids:
+        verdicts.setdefault(request_id, degraded_verdict(reason))
+    return verdicts
+
+def get_existing_requests_excluding_current(current_id, signature=None, title='', description='', clusters=None,
+                                            stores=None):
+    """Retrieve the nearest existing requests from the similarity index, excluding current request
+
+    With clusters, a match stands in for its whole duplicate cluster: only
+    cluster representatives are returned. stores is an already loaded
+    (catalog, index) pair; without it both are loaded here.
+    """
+    if signature is None:
+        return get_recent_requests_from_listing(current_id)
+    clusters = clusters or duplicate_clusters.DuplicateClusters()
+    catalog, index = stores or load_candidate_stores()
+    
+    if not len(index):
+        if catalog:
+            logger.debug("Similarity index is empty - ranking the request catalog instead")
+            return get_candidates_from_catalog(current_id, title, description, catalog, clusters)
+        logger.debug("Similarity index is empty - falling back to today's listing")
+        return get_recent_requests_from_listing(current_id)
+    
+    # Over-fetch: several matches may belong to the same cluster
+    matches = index.query(signature, k=CANDIDATE_TOP_K * CLUSTER_OVERFETCH, exclude_id=current_id)
+    logger.debug(f"Similarity index returned {len(matches)} of {len(index)} indexed requests")
+    matches = representative_matches(matches, clusters, index, current_id)
+    
+    # The catalog already holds title and description; only misses cost a GET
+    loaded = {}
+    misses = []
+    for request_id, key, _ in matches:
+        entry = catalog.get(request_id)
+        if entry and entry.get('title') and entry.get('description'):
+            loaded[request_id] = {'id': request_id, 'title': entry['title'], 'description': entry['description']}
+        else:
+            misses.append((key, request_id))
+    loaded.update(zip([request_id for _, request_id in misses], load_requests(misses)))
+    
+    requests = []
+    for request_id, _, score in matches:
+        request = loaded.get(request_id)
+        if request:
+            request['similarity'] = round(score, 4)
+            requests.append(request)
+    return requests
+
+def representative_matches(matches, clusters, index, current_id):
+    """Replace each match with its cluster representative, keeping the best score per cluster"""
+    representatives = []
+    seen = {current_id}
+    for request_id, key, score in matches:
+        representative = clusters.find(request_id)
+        if representative in seen:
+            continue
+        seen.add(representative)
+        if representative != request_id:
+            key = index.raw_key(representative) or key
+        representatives.append((representative, key, score))
+        if len(representatives) == CANDIDATE_TOP_K:
+            break
+    return representatives
+
+def load_clusters():
+    """Duplicate clusters, or an empty store if unavailable (every request its own representative)"""
+    try:
+        return duplicate_clusters.load_clusters()
+    except Exception as e:
+        logger.warning(f"Error loading duplicate clusters: {e}")
+        return duplicate_clusters.DuplicateClusters()
+
+def assign_cluster(request_id, verdict, clusters):
+    """Link a confirmed duplicate into its cluster and stamp the verdict with cluster id and size"""
+    if request_id and duplicate_clusters.is_confirmed(verdict):
+        try:
+            duplicate_clusters.link(request_id, verdict['most_similar_request_id'])
+            clusters.union(request_id, verdict['most_similar_request_id'])
+        except Exception as e:
+            logger.warning(f"Error linking {request_id} into its duplicate cluster: {e}")
+    verdict['cluster_id'] = clusters.find(request_id) if request_id else ''
+    verdict['cluster_size'] = clusters.size(request_id) if request_id else 1
+
+def load_candidate_stores():
+    """(request catalog, similarity index), each empty if unavailable"""
+    catalog = load_catalog()
+    try:
+        index = similarity_index.load_index()
+    except Exception as e:
+        logger.warning(f"Error loading similarity index: {e}")
+        index = similarity_index.SimilarityIndex()
+    return catalog, index
 
-def get_existing_requests_excluding_current(current_id):
-    """Read existing requests from raw JSON bucket, excluding current request"""
+def load_catalog():
+    """Request catalog kept in memory by warm containers, or {} if unavailable"""
     try:
-        bucket = 'bt101-raw-data-alpha-012258635969'
-        today = datetime.now()
-        prefix = f'year={today.year}/month={today.month:02d}/day={today.day:02d}/'
+        return request_catalog.load_catalog()
+    except Exception as e:
+        logger.warning(f"Error loading request catalog: {e}")
+        return {}
+
+def get_candidates_from_catalog(current_id, title, description, catalog, clusters):
+    """Top candidates from the rolling-window catalog by local lexical score, representatives only"""
+    existing_requests = [
+        {'id': request_id, 'title': entry['title'], 'description': entry['description']}
+        for request_id, entry in catalog.items()
+        if request_id != current_id and entry.get('title') and entry.get('description')
+        and clusters.is_representative(request_id)
+    ]
+    scores = score_candidates(title, description, existing_requests)[:CANDIDATE_TOP_K]
+    by_id = {req['id']: req for req in existing_requests}
+    return [by_id[score['id']] for score in scores]
+
+def load_request(key, fallback_id):
+    """Read a single feature request from the raw bucket"""
+    try:
+        json_obj = s3.get_object(Bucket=RAW_BUCKET, Key=key)
+        data = json.loads(json_obj['Body'].read())
         
-        response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=20)
+        # Bulk ingestion files hold many requests
+        if isinstance(data.get('records'), list):
+            data = next((record for record in data['records'] if record.get('id') == fallback_id), {})
         
-        if 'Contents' not in response:
+        feature_req = data.get('feature_request', {})
+        if feature_req.get('title') and feature_req.get('description'):
+            return {
+                'id': data.get('id', fallback_id),
+                'title': feature_req.get('title', ''),
+                'description': feature_req.get('description', '')
+            }
+    except Exception as e:
+        logger.warning(f"Error reading {key}: {e}")
+    return None
+
+def load_requests(keys_and_ids):
+    """Load candidates concurrently; a fetch that fails or outlives the timeout yields None"""
+    if not keys_and_ids:
+        return []
+    
+    with span('candidate_fetch', Rows=len(keys_and_ids)) as stage:
+        futures = [fetch_pool.submit(load_request, key, request_id) for key, request_id in keys_and_ids]
+        # Fetches run side by side, so the whole batch gets one fetch's budget
+        done, not_done = wait(futures, timeout=CANDIDATE_FETCH_TIMEOUT)
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning(f"Dropped {len(not_done)} of {len(futures)} candidate fetches after {CANDIDATE_FETCH_TIMEOUT}s")
+        stage['Error'] = len(not_done)
+    
+    return [future.result() if future in done else None for future in futures]
+
+def register_request(current_id, raw_key, signature):
+    """Make the current request retrievable by later deduplication calls"""
+    if not current_id or not raw_key:
+        return
+    try:
+        similarity_index.record_pending(current_id, raw_key, signature)
+    except Exception as e:
+        logger.warning(f"Error registering {current_id} in similarity index: {e}")
+
+def get_recent_requests_from_listing(current_id):
+    """Read today's most recent requests from raw JSON bucket, excluding current request"""
+    try:
+        # Every shard of the recent partitions, listed in parallel, newest objects first
+        listings = fetch_pool.map(
+            lambda prefix: s3.list_objects_v2(Bucket=RAW_BUCKET, Prefix=prefix, MaxKeys=20).get('Contents', []),
+            raw_layout.recent_prefixes()
+        )
+        objects = [obj for contents in listings for obj in contents]
+        if not objects:
             return []
+        objects.sort(key=lambda obj: obj.get('LastModified') or datetime.min, reverse=True)
         
-        requests = []
-        for obj in response['Contents'][-10:]:
+        keys_and_ids = []
+        for obj in objects[:10]:
             if obj['Key'].endswith('.json'):
                 file_id = obj['Key'].split('/')[-1].replace('.json', '')
                 
                 if file_id == current_id:
-                    print(f"DEBUG: Skipping current request: {file_id}")
-                    continue
-                    
-                try:
-                    json_obj = s3.get_object(Bucket=bucket, Key=obj['Key'])
-                    data = json.loads(json_obj['Body'].read())
-                    
-                    feature_req = data.get('feature_request', {})
-                    if feature_req.get('title') and feature_req.get('description'):
-                        requests.append({
-                            'id': data.get('id', file_id),
-                            'title': feature_req.get('title', ''),
-                            'description': feature_req.get('description', '')
-                        })
-                except Exception as e:
-                    print(f"Error reading {obj['Key']}: {e}")
+                    logger.debug(f"Skipping current request: {file_id}")
                     continue
+                
+                keys_and_ids.append((obj['Key'], file_id))
         
-        return requests
+        return [request for request in load_requests(keys_and_ids) if request]
         
     except Exception as e:
-        print(f"Error getting existing requests: {e}")
+        logger.warning(f"Error getting existing requests: {e}")
         return []
 
+def score_candidates(title, description, existing_requests):
+    """Score each candidate locally with shingle Jaccard and token cosine similarity"""
+    new_text = f"{title} {description}"
+    new_shingles = similarity_index.shingles(new_text)
+    new_counts = Counter(similarity_index.tokenize(new_text))
+    
+    scores = []
+    for req in existing_requests:
+        text = f"{req['title']} {req['description']}"
+        jaccard = jaccard_similarity(new_shingles, similarity_index.shingles(text))
+        cosine = cosine_similarity(new_counts, Counter(similarity_index.tokenize(text)))
+        scores.append({
+            'id': req['id'],
+            'jaccard': round(jaccard, 4),
+            'cosine': round(cosine, 4),
+            'passed': jaccard >= JACCARD_THRESHOLD or cosine >= COSINE_THRESHOLD
+        })
+    
+    scores.sort(key=lambda score: max(score['jaccard'], score['cosine']), reverse=True)
+    return scores
+
+def jaccard_similarity(a, b):
+    """Jaccard similarity of two sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def cosine_similarity(a, b):
+    """Cosine similarity of two token count vectors"""
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[token] for token, count in a.items() if token in b)
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
 def find_duplicates_with_improved_prompt(title, description, existing_requests):
     """Use Claude with improved, stricter prompt"""
     try:
-        existing_text = "\n".join([
-            f"ID: {req['id']}\nTitle: {req['title']}\nDescription: {req['description']}\n---"
-            for req in existing_requests
-        ])
-        
-        prompt = f"""You are a precise duplicate detector for feature requests. Compare the NEW REQUEST against EXISTING REQUESTS.
-
-NEW REQUEST:
-Title: {title}
-Description: {description}
-
-EXISTING REQUESTS:
-{existing_text}
-
-STRICT DUPLICATE CRITERIA - Mark as duplicate ONLY if:
-1. Same specific technology/service (e.g., both about Lambda, both about S3, both about IoT)
-2. Same primary function (e.g., both for data storage, both for notifications, both for analytics)
-3. Same target use case (e.g., both for mobile apps, both for web dashboards, both for supply chain)
-
-DO NOT mark as duplicate if:
-- Only sharing generic terms like "platform", "system", "monitoring", "analytics"
-- Different technologies (IoT vs Analytics, Blockchain vs Mobile, etc.)
-- Different primary purposes (device management vs data visualization)
-- Different domains (supply chain vs business intelligence)
-
-Respond with JSON:
-{{
-    "is_duplicate": true/false,
-    "confidence": 0.0-1.0,
-    "most_similar_request_id": "id or null",
-    "reasoning": "specific explanation citing exact similarities or differences"
-}}
-
-Be conservative - when in doubt, mark as NOT duplicate."""
-
-        print("DEBUG: Calling Claude for duplicate analysis")
-        
-        response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-haiku-20240307-v1:0',
-            body=json.dumps({
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 1000,
-                'messages': [{'role': 'user', 'content': prompt}]
-            })
+        prompt = prompt_builder.build_dedup_prompt(title, description, existing_requests)
+        if prompt.dropped_ids:
+            logger.debug(f"Prompt budget dropped {len(prompt.dropped_ids)} lower-ranked candidates")
+        
+        # The verdict depends on the candidates Claude actually sees, so they are part of the key
+        key = cache_key(
+            DEDUP_MODEL_ID, DEDUP_PROMPT_VERSION,
+            {'title': title, 'description': description},
+            dependencies=prompt.included_ids
         )
+        if response_cache:
+            cached = response_cache.get(key)
+            logger.debug(f"Dedup cache {'hit' if cached else 'miss'} - stats: {response_cache.stats}")
+            record('verdict_cache', {'CacheHit': 1 if cached else 0})
+            if cached:
+                cached['cache_hit'] = True
+                cached.setdefault('degraded', False)
+                return cached
         
-        result = json.loads(response['body'].read())
-        claude_response = result['content'][0]['text']
-        print(f"DEBUG: Claude raw response: {claude_response}")
+        logger.debug("Calling Claude for duplicate analysis")
+        claude_response = invoke_claude(prompt)
+        logger.debug(f"Claude raw response: {claude_response}")
         
         try:
             duplicate_result = json.loads(claude_response)
-            return {
+            verdict = {
                 'is_duplicate': duplicate_result.get('is_duplicate', False),
                 'confidence': duplicate_result.get('confidence', 0),
                 'most_similar_request_id': duplicate_result.get('most_similar_request_id', ''),
                 'similar_requests': [duplicate_result.get('most_similar_request_id')] if duplicate_result.get('most_similar_request_id') else [],
-                'reasoning': duplicate_result.get('reasoning', '')
+                'reasoning': duplicate_result.get('reasoning', ''),
+                'degraded': False
             }
+            if response_cache:
+                response_cache.put(key, verdict)
+            return verdict
         except:
-            return {
-                'is_duplicate': False,
-                'confidence': 0,
-                'similar_requests': []
-            }
+            return degraded_verdict('unparseable_response')
             
+    except bedrock_limiter.BedrockUnavailable as e:
+        logger.error(f"Claude deduplication unavailable: {e}")
+        return degraded_verdict('bedrock_unavailable')
     except Exception as e:
-        print(f"Claude deduplication error: {e}")
-        return {
-            'is_duplicate': False,
-            'confidence': 0,
-            'similar_requests': []
-        }
\ No newline at end of file
+        logger.error(f"Claude deduplication error: {e}")
+        return degraded_verdict('error')
+
+def analyze_fused(fields, candidates):
+    """One prompt for classification and duplicate verdict; a failed call degrades both"""
+    prompt = prompt_builder.build_fused_prompt(fields, candidates)
+    key = cache_key(DEDUP_MODEL_ID, FUSED_PROMPT_VERSION, fields, dependencies=prompt.included_ids)
+    if response_cache:
+        cached = response_cache.get(key)
+        record('verdict_cache', {'CacheHit': 1 if cached else 0})
+        if cached:
+            cached['deduplication']['cache_hit'] = True
+            return cached
+    
+    try:
+        claude_response = invoke_claude(prompt)
+        logger.debug(f"Claude raw response: {claude_response}")
+        analysis = prompt_builder.parse_fused_reply(claude_response, prompt.included_ids)
+    except bedrock_limiter.BedrockUnavailable as e:
+        logger.error(f"Claude fused analysis unavailable: {e}")
+        return degraded_analysis('bedrock_unavailable')
+    except ValueError as e:
+        logger.warning(f"Claude fused analysis rejected: {e}")
+        return degraded_analysis('unparseable_response')
+    except Exception as e:
+        logger.error(f"Claude fused analysis error: {e}")
+        return degraded_analysis('error')
+    
+    analysis['analysis_mode'] = 'fused'
+    if response_cache:
+        response_cache.put(key, analysis)
+    return analysis
+
+def invoke_claude(prompt):
+    """Send a built prompt through the shared limiter and return the reply text"""
+    with span('bedrock_invoke') as stage:
+        body = json.dumps({
+            'anthropic_version': 'bedrock-2023-05-31',
+            'max_tokens': prompt.max_tokens,
+            'messages': [{'role': 'user', 'content': prompt.text}]
+        })
+        # Shared AIMD limiter; throttles are retried until the deadline
+        response = bedrock_limiter.invoke_model(bedrock, modelId=DEDUP_MODEL_ID, body=body)
+        result = json.loads(response['body'].read())
+        usage = result.get('usage', {})
+        stage.update(
+            Bytes=len(body), PromptTokens=prompt.input_tokens,
+            InputTokens=usage.get('input_tokens'), OutputTokens=usage.get('output_tokens')
+        )
+    return result['content'][0]['text']
+
+def error_body(mode):
+    """Handler error response shaped for the calling mode"""
+    if mode == 'fused':
+        return degraded_analysis('error')
+    if mode == 'batch':
+        # No verdicts: the caller falls back to one dedup call per request
+        return {'verdicts': {}}
+    return degraded_verdict('error')
+
+def degraded_analysis(reason):
+    """Fused result when Claude did not answer: no classification and a degraded verdict"""
+    return {'analysis_mode': 'fused', 'classification': None, 'deduplication': degraded_verdict(reason)}
+
+def degraded_verdict(reason):
+    """Not-duplicate result that only means the check did not run, never a real negative"""
+    return {
+        'is_duplicate': False,
+        'confidence': 0,
+        'similar_requests': [],
+        'degraded': True,
+        'degraded_reason': reason
+    }
\ No newline at end of file
@@ -0,0 +1,158 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+
+import s3_store
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_BUCKET = os.environ.get('CLUSTER_BUCKET', 'bt101-parquet-data-alpha-012258635969')
+CLUSTERS_KEY = '_index/clusters/clusters.json.gz'
+PENDING_PREFIX = '_index/clusters/pending/'
+# Only verdicts at least this confident link two requests for good
+LINK_MIN_CONFIDENCE = float(os.environ.get('CLUSTER_LINK_MIN_CONFIDENCE', '0.8'))
+
+# Warm containers keep the base store between invocations
+_store = s3_store.PendingStore(
+    CLUSTER_BUCKET, CLUSTERS_KEY, PENDING_PREFIX,
+    parse_base=lambda body: json.loads(gzip.decompress(body))
+)
+
+
+class DuplicateClusters:
+    """Union-find over confirmed duplicate links
+
+    A cluster's id is its root request. Merging two clusters keeps the larger
+    one's root, so the id of a big cluster stays stable. Requests never
+    linked are singleton clusters and are not stored.
+    """
+
+    def __init__(self):
+        self._parent = {}
+        self._size = {}
+        self._linked_at = {}
+
+    def __len__(self):
+        return len(self._size)
+
+    def find(self, request_id):
+        """Cluster id (root request) of a request"""
+        root = request_id
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+        # Path compression: later lookups are one hop
+        while request_id != root:
+            self._parent[request_id], request_id = root, self._parent[request_id]
+        return root
+
+    def size(self, request_id):
+        return self._size.get(self.find(request_id), 1)
+
+    def is_representative(self, request_id):
+        return self.find(request_id) == request_id
+
+    def union(self, request_id, duplicate_of, linked_at=None):
+        """Link two requests; returns the merged cluster's id"""
+        a, b = self.find(request_id), self.find(duplicate_of)
+        if a == b:
+            return a
+        # Union by size; on a tie the existing request's cluster wins
+        if self._size.get(a, 1) > self._size.get(b, 1):
+            a, b = b, a
+        self._parent[a] = b
+        self._size[b] = self._size.get(b, 1) + self._size.pop(a, 1)
+        self._linked_at[b] = max(linked_at or '', self._linked_at.pop(a, ''), self._linked_at.get(b, ''))
+        return b
+
+    def top(self, n=20):
+        """Largest clusters as (cluster_id, size), biggest first"""
+        return sorted(self._size.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    def to_dict(self):
+        return {
+            'parent': {request_id: self.find(request_id) for request_id in list(self._parent)},
+            'size': self._size,
+            'linked_at': self._linked_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        clusters = cls()
+        clusters._parent = dict(data.get('parent', {}))
+        clusters._size = dict(data.get('size', {}))
+        clusters._linked_at = dict(data.get('linked_at', {}))
+        return clusters
+
+
+def pending_key(request_id, duplicate_of):
+    """Encode a link entirely in its object key so a LIST returns it without a GET"""
+    encoded = [s3_store.b64encode(text.encode('utf-8')) for text in (request_id, duplicate_of)]
+    return f"{PENDING_PREFIX}{encoded[0]}/{encoded[1]}"
+
+
+def parse_pending_key(key):
+    """Inverse of pending_key: returns (request_id, duplicate_of)"""
+    request_id, duplicate_of = (s3_store.b64decode(text).decode('utf-8') for text in key[len(PENDING_PREFIX):].split('/'))
+    return request_id, duplicate_of
+
+
+def link(request_id, duplicate_of):
+    """Record a confirmed duplicate; visible to readers immediately and folded into the base later"""
+    if request_id and duplicate_of and request_id != duplicate_of:
+        s3_store.write(CLUSTER_BUCKET, pending_key(request_id, duplicate_of), b'')
+
+
+def is_confirmed(verdict):
+    """Whether a dedup verdict is strong enough to link its request into a cluster"""
+    return (
+        bool(verdict.get('is_duplicate'))
+        and not verdict.get('degraded')
+        and bool(verdict.get('most_similar_request_id'))
+        and float(verdict.get('confidence') or 0) >= LINK_MIN_CONFIDENCE
+    )
+
+
+def _apply_pending(clusters, pending):
+    for entry in pending:
+        try:
+            clusters.union(*parse_pending_key(entry.key), linked_at=entry.last_modified)
+        except ValueError as e:
+            logger.warning(f"Skipping malformed pending cluster link {entry.key}: {e}")
+
+
+def load_clusters():
+    """Return the base store plus pending links, re-downloading the base only when its ETag changes"""
+    base, pending = _store.load()
+    # Pending links mutate the store, so each call works on its own copy of the base
+    clusters = DuplicateClusters.from_dict(base or {})
+    _apply_pending(clusters, pending)
+    return clusters
+
+
+def fold_pending():
+    """Merge pending links into the base store and delete the folded pending objects"""
+    clusters = DuplicateClusters.from_dict(_store.read_base() or {})
+    pending = _store.list_pending()
+    _apply_pending(clusters, pending)
+
+    if pending:
+        _store.write_base(
+            gzip.compress(json.dumps(dict(clusters.to_dict(), generated_at=datetime.utcnow().isoformat())).encode('utf-8')),
+            'application/gzip'
+        )
+        _store.delete_pending(pending)
+    return {'clusters': len(clusters), 'folded': len(pending)}
+
+
+def handler(event, context):
+    """Scheduled fold of pending links, or {"action": "top", "n": 20} for the most requested ideas"""
+    event = event or {}
+    if event.get('action') == 'top':
+        clusters = load_clusters()
+        result = {'top': [{'cluster_id': cluster_id, 'size': size} for cluster_id, size in clusters.top(int(event.get('n', 20)))]}
+    else:
+        result = fold_pending()
+        logger.info(f"Duplicate cluster fold complete: {result}")
+    return {'statusCode': 200, 'body': result}
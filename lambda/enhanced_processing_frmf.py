@@ -1,81 +1,320 @@
 import json
-import boto3
-import pandas as pd
 from datetime import datetime
 import uuid
-import io
+import os
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import partial
+
+import prompt_builder
+import raw_layout
+import request_catalog
+import rollups
+from aws_clients import lazy_client
+from metrics import instrumented, record, span
+from response_cache import cache_key, create_cache
+from stage_executor import Stage, run_stages
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3 = boto3.client('s3')
-lambda_client = boto3.client('lambda')
+s3 = lazy_client('s3')
+lambda_client = lazy_client('lambda')
+
+MAX_RECORD_WORKERS = int(os.environ.get('FRMF_MAX_RECORD_WORKERS', '4'))
+PARQUET_BUCKET = 'bt101-parquet-data-alpha-012258635969'
+BATCH_MANIFEST_PREFIX = '_manifests/batches/'
+STAGE_TIMEOUT_SECONDS = float(os.environ.get('FRMF_STAGE_TIMEOUT_SECONDS', '120'))
+# A batch starts no record with less than START_RESERVE left in the invocation
+# and stops waiting on running ones at WRITE_RESERVE, leaving time to write
+# what finished. Unfinished records' files stay unprocessed for the next batch
+# run; their cached classifications make the retry cheaper.
+START_RESERVE_SECONDS = float(os.environ.get('FRMF_START_RESERVE_SECONDS', '60'))
+WRITE_RESERVE_SECONDS = float(os.environ.get('FRMF_WRITE_RESERVE_SECONDS', '20'))
+
+# Identify what the classification Lambda answers with, for response caching
+CLASSIFICATION_MODEL_ID = os.environ.get('CLASSIFICATION_MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0')
+CLASSIFICATION_PROMPT_VERSION = os.environ.get('CLASSIFICATION_PROMPT_VERSION', 'frmf-v1')
+
+# One dedup-function call returns classification, forecast and duplicate verdict
+# from a single Bedrock prompt instead of two Lambda hops and two prompts
+FUSED_ANALYSIS = os.environ.get('FRMF_FUSED_ANALYSIS', 'false').lower() == 'true'
+# Batches with at least this many requests get their duplicate verdicts from
+# batched dedup calls, up to DEDUP_BATCH_SIZE requests per call
+DEDUP_BATCH_MIN_REQUESTS = int(os.environ.get('FRMF_DEDUP_BATCH_MIN_REQUESTS', '4'))
+DEDUP_BATCH_SIZE = int(os.environ.get('FRMF_DEDUP_BATCH_SIZE', '50'))
 
+# Survives across warm invocations
+classification_cache = create_cache('classification')
+
+@instrumented('processing')
 def handler(event, context):
     """Enhanced processing with FRMF extensions"""
     try:
-        # Get S3 event details
-        bucket = event['Records'][0]['s3']['bucket']['name']
-        key = event['Records'][0]['s3']['object']['key']
+        # Get S3 event details for every record in the event
+        locations = [
+            (record['s3']['bucket']['name'], record['s3']['object']['key'])
+            for record in event['Records']
+        ]
         
-        logger.info(f"Processing file: s3://{bucket}/{key}")
+        logger.info(f"Processing {len(locations)} file(s)")
         
-        # Read JSON file from S3
-        response = s3.get_object(Bucket=bucket, Key=key)
-        json_data = json.loads(response['Body'].read())
+        if len(locations) == 1:
+            bucket, key = locations[0]
+            requests = read_requests(bucket, key)
+            
+            if len(requests) == 1:
+                parquet_key = convert_to_parquet_with_frmf(process_request(requests[0], key), key)
+                
+                logger.info(f"FRMF enhanced processing complete: {parquet_key}")
+                
+                return {
+                    'statusCode': 200,
+                    'body': {
+                        'message': 'FRMF enhanced processing successful',
+                        'parquet_file': parquet_key,
+                        'frmf_enhanced': True
+                    }
+                }
+            
+            # A bulk object is already read and parsed; process_batch must not read it again
+            return process_batch(locations, {key: requests}, context)
         
-        # Step 1: Claude Classification with FRMF forecast
-        classification_result = invoke_claude_classification_frmf(json_data)
-        
-        # Step 2: Claude Deduplication
-        dedup_result = invoke_claude_deduplication(classification_result)
+        return process_batch(locations, context=context)
         
+    except Exception as e:
+        logger.error(f"FRMF processing error: {str(e)}")
+        raise
+
+def read_requests(bucket, key):
+    """Read a raw JSON file; bulk ingestion files expand into all of their requests"""
+    logger.info(f"Processing file: s3://{bucket}/{key}")
+    
+    # Read JSON file from S3
+    with span('s3_read') as stage:
+        response = s3.get_object(Bucket=bucket, Key=key)
+        body = response['Body'].read()
+        stage['Bytes'] = len(body)
+    json_data = json.loads(body)
+    
+    requests = json_data['records'] if isinstance(json_data.get('records'), list) else [json_data]
+    
+    # Make the requests visible to deduplication's catalog before the pipeline runs
+    try:
+        request_catalog.append([request_catalog.catalog_entry(request, key) for request in requests])
+    except Exception as e:
+        logger.warning(f"Request catalog append failed for {key}: {e}")
+    
+    return requests
+
+def process_request(json_data, key, dedup_batch=None):
+    """Run the FRMF pipeline for a single feature request
+
+    dedup_batch is a future of batched duplicate verdicts by request id.
+    """
+    # Steps 1-3: classification, deduplication and workaround only need the
+    # raw request, so they run concurrently
+    stages = frmf_stages(dedup_batch)
+    values, outcomes = run_stages(stages, {'data': json_data, 'key': key})
+    logger.info(f"FRMF stage outcomes for {json_data.get('id')} ({key}): {outcomes}")
+    for name, outcome in outcomes.items():
+        record(name, {'Duration': outcome['duration_ms'], 'Error': 0 if outcome['status'] == 'success' else 1})
+    
+    return merge_stage_results(json_data, [values[stage.name] for stage in stages])
+
+def frmf_stages(dedup_batch=None):
+    """Pipeline stages with their inputs; each falls back to the unmodified data"""
+    def keep_data(data, *_):
+        return data
+    
+    if FUSED_ANALYSIS:
+        return [
+            # Steps 1-2 in one call: classification, forecast and duplicate verdict
+            Stage('analysis', invoke_fused_analysis, inputs=('data', 'key'),
+                  timeout=STAGE_TIMEOUT_SECONDS, fallback=keep_data),
+            Stage('workaround', invoke_claude_workaround, inputs=('data',),
+                  timeout=STAGE_TIMEOUT_SECONDS, fallback=keep_data),
+        ]
+    
+    return [
+        # Step 1: Claude Classification with FRMF forecast
+        Stage('classification', invoke_claude_classification_frmf, inputs=('data',),
+              timeout=STAGE_TIMEOUT_SECONDS, fallback=keep_data),
+        # Step 2: Claude Deduplication, from the batch's shared verdicts when there are any
+        Stage('deduplication', partial(batched_deduplication, dedup_batch) if dedup_batch else invoke_claude_deduplication,
+              inputs=('data', 'key'), timeout=STAGE_TIMEOUT_SECONDS, fallback=keep_data),
         # Step 3: Generate workaround if available
-        workaround_result = invoke_claude_workaround(dedup_result)
+        Stage('workaround', invoke_claude_workaround, inputs=('data',),
+              timeout=STAGE_TIMEOUT_SECONDS, fallback=keep_data),
+    ]
+
+def merge_stage_results(data, stage_results):
+    """Combine the fields each stage added to its copy of the original data"""
+    merged = data.copy()
+    for result in stage_results:
+        merged.update({field: value for field, value in result.items() if field not in data})
+    return merged
+
+def process_batch(locations, preloaded=None, context=None):
+    """Process many records on a bounded worker pool and write one Parquet file per partition
+
+    preloaded maps raw keys the caller already read to their parsed requests.
+    With a Lambda context, records still unfinished near the timeout are
+    deferred to a later run instead of losing the whole batch.
+    """
+    preloaded = preloaded or {}
+    results = []
+    requests = [(key, json_data) for key, key_requests in preloaded.items() for json_data in key_requests]
+    enhanced_records = []
+    
+    # Shut down without waiting: a record still running at the deadline must not hold up the write
+    executor = ThreadPoolExecutor(max_workers=MAX_RECORD_WORKERS)
+    try:
+        read_futures = {
+            executor.submit(read_requests, bucket, key): key
+            for bucket, key in locations if key not in preloaded
+        }
+        for future in as_completed(read_futures):
+            key = read_futures[future]
+            try:
+                requests.extend((key, json_data) for json_data in future.result())
+            except Exception as e:
+                logger.error(f"FRMF processing failed for {key}: {str(e)}")
+                results.append({'key': key, 'status': 'failed', 'error': str(e)})
         
-        # Step 4: Convert to Parquet with FRMF enhancements
-        parquet_key = convert_to_parquet_with_frmf(workaround_result, key)
+        # Submitted ahead of the records so it holds a worker before any record waits on it
+        dedup_batch = None
+        if not FUSED_ANALYSIS and len(requests) >= DEDUP_BATCH_MIN_REQUESTS:
+            dedup_batch = executor.submit(invoke_claude_deduplication_batch, [json_data for _, json_data in requests],
+                                          [key for key, _ in requests])
         
-        logger.info(f"FRMF enhanced processing complete: {parquet_key}")
+        # Records are submitted as workers free up, so none starts too close to the timeout
+        queued = iter(requests)
+        running = {}
+        while True:
+            while len(running) < MAX_RECORD_WORKERS and remaining_seconds(context) > START_RESERVE_SECONDS:
+                item = next(queued, None)
+                if item is None:
+                    break
+                running[executor.submit(process_request, item[1], item[0], dedup_batch)] = item
+            if not running:
+                break
+            timeout = None if context is None else max(0, remaining_seconds(context) - WRITE_RESERVE_SECONDS)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                key, json_data = running.pop(future)
+                try:
+                    enhanced_records.append((key, future.result()))
+                    results.append({'key': key, 'id': json_data.get('id'), 'status': 'success'})
+                except Exception as e:
+                    logger.error(f"FRMF processing failed for {json_data.get('id')} ({key}): {str(e)}")
+                    results.append({'key': key, 'id': json_data.get('id'), 'status': 'failed', 'error': str(e)})
         
-        return {
-            'statusCode': 200,
-            'body': {
-                'message': 'FRMF enhanced processing successful',
-                'parquet_file': parquet_key,
-                'frmf_enhanced': True
-            }
-        }
+        for key, json_data in list(running.values()) + list(queued):
+            results.append({'key': key, 'id': json_data.get('id'), 'status': 'deferred'})
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    # A raw file is written all-or-nothing so a partially failed or deferred bulk file is retried as a whole
+    failed_keys = {result['key'] for result in results if result['status'] == 'failed'}
+    deferred_keys = {result['key'] for result in results if result['status'] == 'deferred'} - failed_keys
+    enhanced_records = [
+        (key, enhanced_data) for key, enhanced_data in enhanced_records
+        if key not in failed_keys and key not in deferred_keys
+    ]
+    for result in results:
+        if result['status'] == 'success' and result['key'] in failed_keys:
+            result.update({'status': 'failed', 'error': 'Another request in the same file failed'})
+        elif result['status'] == 'success' and result['key'] in deferred_keys:
+            result['status'] = 'deferred'
+    
+    deferred_count = sum(1 for result in results if result['status'] == 'deferred')
+    if deferred_count:
+        logger.warning(f"Deferred {deferred_count} records in {len(deferred_keys)} file(s) near the invocation timeout")
+    if not enhanced_records and not deferred_count:
+        raise RuntimeError(f"All {len(results)} records in the batch failed")
+    
+    # Step 4: A single (bulk) file keeps its own Parquet key; otherwise one
+    # combined Parquet file per partition
+    parquet_files = {}
+    if len(locations) == 1 and enhanced_records:
+        key = locations[0][1]
+        parquet_key = raw_layout.processed_key(key)
+        write_parquet_frmf([flatten_frmf_record(enhanced_data) for _, enhanced_data in enhanced_records], parquet_key)
+        parquet_files[key] = parquet_key
+    else:
+        partitions = {}
+        for key, enhanced_data in enhanced_records:
+            # Parquet partitions are not sharded, so one file covers every shard of a day
+            partitions.setdefault(raw_layout.unsharded(key).rsplit('/', 1)[0], []).append((key, enhanced_data))
         
-    except Exception as e:
-        logger.error(f"FRMF processing error: {str(e)}")
-        raise
+        for partition, records in partitions.items():
+            parquet_key = convert_batch_to_parquet_with_frmf(records, partition)
+            for key, _ in records:
+                parquet_files[key] = parquet_key
+    
+    for result in results:
+        if result['key'] in parquet_files:
+            result['parquet_file'] = parquet_files[result['key']]
+    
+    failed_count = sum(1 for result in results if result['status'] == 'failed')
+    logger.info(f"FRMF batch processing complete: {len(enhanced_records)} succeeded, {failed_count} failed, "
+                f"{deferred_count} deferred")
+    
+    return {
+        'statusCode': 200,
+        'body': {
+            'message': 'FRMF enhanced batch processing complete',
+            'parquet_files': sorted(set(parquet_files.values())),
+            'records': results,
+            'failed_count': failed_count,
+            'deferred_count': deferred_count,
+            'frmf_enhanced': True
+        }
+    }
+
+def remaining_seconds(context):
+    """Seconds left in the invocation; unbounded without a Lambda context"""
+    return context.get_remaining_time_in_millis() / 1000 if context else float('inf')
 
 def invoke_claude_classification_frmf(data):
     """Enhanced Claude classification with FRMF forecast prediction"""
     try:
         feature_req = data.get('feature_request', {})
-        claude_payload = {
-            'title': feature_req.get('title', ''),
-            'description': feature_req.get('description', ''),
-            'priority': feature_req.get('priority', ''),
-            'category': feature_req.get('category', ''),
-            'frmf_mode': True  # Enable FRMF forecast prediction
-        }
-        
-        response = lambda_client.invoke(
-            FunctionName='bt101-claude-classification-alpha',
-            InvocationType='RequestResponse',
-            Payload=json.dumps(claude_payload)
-        )
+        # Pasted logs and specs are cut to the classification prompt budget before they reach Claude
+        fields, _ = prompt_builder.fit_classification_fields({
+            name: feature_req.get(name, '') for name in ('title', 'description', 'priority', 'category')
+        })
+        claude_payload = dict(fields, frmf_mode=True)  # Enable FRMF forecast prediction
         
-        result = json.loads(response['Payload'].read())
+        key = cache_key(CLASSIFICATION_MODEL_ID, CLASSIFICATION_PROMPT_VERSION, claude_payload)
+        classification = classification_cache.get(key) if classification_cache else None
+        record('classification_cache', {'CacheHit': 0 if classification is None else 1})
         
-        if 'body' in result and isinstance(result['body'], str):
-            classification = json.loads(result['body'])
+        if classification is None:
+            with span('classification_invoke') as stage:
+                response = lambda_client.invoke(
+                    FunctionName='bt101-claude-classification-alpha',
+                    InvocationType='RequestResponse',
+                    Payload=json.dumps(claude_payload)
+                )
+                payload = response['Payload'].read()
+                stage['Bytes'] = len(payload)
+            
+            result = json.loads(payload)
+            
+            if 'body' in result and isinstance(result['body'], str):
+                classification = json.loads(result['body'])
+            else:
+                classification = result.get('body', result)
+            
+            # Only cache real answers, never error payloads
+            if classification_cache and result.get('statusCode', 200) == 200 and classification and 'error' not in classification:
+                classification_cache.put(key, classification)
         else:
-            classification = result.get('body', result)
+            logger.info(f"Classification cache hit - stats: {classification_cache.stats}")
         
         # Add FRMF classification to original data
         enhanced_data = data.copy()
@@ -86,23 +325,27 @@ def invoke_claude_classification_frmf(data):
         logger.warning(f"FRMF classification failed: {e}")
         return data
 
-def invoke_claude_deduplication(data):
+def invoke_claude_deduplication(data, raw_key=''):
     """Invoke Claude deduplication Lambda"""
     try:
         feature_req = data.get('feature_request', {})
         claude_payload = {
             'id': data.get('id', ''),  # Pass the request ID
+            'key': raw_key,  # Lets dedup register the request in its similarity index
             'title': feature_req.get('title', ''),
             'description': feature_req.get('description', '')
         }
         
-        response = lambda_client.invoke(
-            FunctionName='bt101-claude-deduplication-alpha',
-            InvocationType='RequestResponse',
-            Payload=json.dumps(claude_payload)
-        )
+        with span('deduplication_invoke') as stage:
+            response = lambda_client.invoke(
+                FunctionName='bt101-claude-deduplication-alpha',
+                InvocationType='RequestResponse',
+                Payload=json.dumps(claude_payload)
+            )
+            payload = response['Payload'].read()
+            stage['Bytes'] = len(payload)
         
-        result = json.loads(response['Payload'].read())
+        result = json.loads(payload)
         
         if 'body' in result and isinstance(result['body'], str):
             dedup_result = json.loads(result['body'])
@@ -117,6 +360,86 @@ def invoke_claude_deduplication(data):
         logger.warning(f"Deduplication failed: {e}")
         return data
 
+def invoke_claude_deduplication_batch(records, raw_keys):
+    """Invoke the deduplication Lambda in batch mode; returns verdicts by request id"""
+    verdicts = {}
+    for offset in range(0, len(records), DEDUP_BATCH_SIZE):
+        claude_payload = {
+            'mode': 'batch',
+            'requests': [
+                {
+                    'id': data.get('id', ''),
+                    'key': raw_key,
+                    'title': data.get('feature_request', {}).get('title', ''),
+                    'description': data.get('feature_request', {}).get('description', '')
+                }
+                for data, raw_key in zip(records[offset:offset + DEDUP_BATCH_SIZE], raw_keys[offset:offset + DEDUP_BATCH_SIZE])
+            ]
+        }
+        
+        with span('deduplication_batch_invoke', Rows=len(claude_payload['requests'])) as stage:
+            response = lambda_client.invoke(
+                FunctionName='bt101-claude-deduplication-alpha',
+                InvocationType='RequestResponse',
+                Payload=json.dumps(claude_payload)
+            )
+            payload = response['Payload'].read()
+            stage['Bytes'] = len(payload)
+        
+        result = json.loads(payload)
+        body = json.loads(result['body']) if isinstance(result.get('body'), str) else result.get('body', result)
+        verdicts.update(body.get('verdicts', {}))
+    return verdicts
+
+def batched_deduplication(dedup_batch, data, raw_key=''):
+    """Deduplication stage that reads this request's verdict from the batch"""
+    try:
+        verdict = dedup_batch.result().get(data.get('id', ''))
+    except Exception as e:
+        logger.warning(f"Batched deduplication failed: {e}")
+        verdict = None
+    if verdict is None:
+        # Not covered by the batch (or the batch failed): ask for this request alone
+        return invoke_claude_deduplication(data, raw_key)
+    
+    enhanced_data = data.copy()
+    enhanced_data['deduplication_result'] = verdict
+    return enhanced_data
+
+def invoke_fused_analysis(data, raw_key=''):
+    """Invoke the deduplication Lambda in fused mode for classification and verdict together"""
+    try:
+        feature_req = data.get('feature_request', {})
+        claude_payload = {
+            'mode': 'fused',
+            'id': data.get('id', ''),
+            'key': raw_key,
+            'title': feature_req.get('title', ''),
+            'description': feature_req.get('description', ''),
+            'priority': feature_req.get('priority', ''),
+            'category': feature_req.get('category', '')
+        }
+        
+        with span('analysis_invoke') as stage:
+            response = lambda_client.invoke(
+                FunctionName='bt101-claude-deduplication-alpha',
+                InvocationType='RequestResponse',
+                Payload=json.dumps(claude_payload)
+            )
+            payload = response['Payload'].read()
+            stage['Bytes'] = len(payload)
+        
+        result = json.loads(payload)
+        analysis = json.loads(result['body']) if isinstance(result.get('body'), str) else result.get('body', result)
+        
+        enhanced_data = data.copy()
+        enhanced_data['fused_analysis'] = analysis
+        return enhanced_data
+        
+    except Exception as e:
+        logger.warning(f"Fused analysis failed: {e}")
+        return data
+
 def invoke_claude_workaround(data):
     """Generate workaround suggestions using Claude"""
     try:
@@ -144,8 +467,42 @@ def invoke_claude_workaround(data):
         logger.warning(f"Workaround generation failed: {e}")
         return data
 
-def convert_to_parquet_with_frmf(enhanced_data, original_key):
-    """Convert enhanced data to Parquet format with FRMF fields"""
+def convert_to_parquet_with_frmf(enhanced_data, original_key, analysis=None):
+    """Convert enhanced data to Parquet format with FRMF fields
+
+    analysis is a fused analysis object (classification plus deduplication)
+    used in place of the separate stage results.
+    """
+    if analysis is not None:
+        enhanced_data = dict(enhanced_data, fused_analysis=analysis)
+    # Generate parquet file key
+    parquet_key = raw_layout.processed_key(original_key)
+    write_parquet_frmf([flatten_frmf_record(enhanced_data)], parquet_key)
+    return parquet_key
+
+def convert_batch_to_parquet_with_frmf(records, partition):
+    """Write a batch of (raw_key, enhanced_data) records as one Parquet file plus a manifest"""
+    batch_id = str(uuid.uuid4())
+    parquet_key = f"{partition}/batch-{batch_id}.parquet"
+    write_parquet_frmf([flatten_frmf_record(enhanced_data) for _, enhanced_data in records], parquet_key)
+    
+    # Record which raw files the batch covers so batch_processor does not re-trigger them
+    s3.put_object(
+        Bucket=PARQUET_BUCKET,
+        Key=f"{BATCH_MANIFEST_PREFIX}{partition}/batch-{batch_id}.json",
+        Body=json.dumps({
+            'batch_id': batch_id,
+            'parquet_key': parquet_key,
+            'source_keys': sorted({key for key, _ in records}),
+            'record_ids': [enhanced_data.get('id') for _, enhanced_data in records],
+            'created_at': datetime.utcnow().isoformat()
+        }),
+        ContentType='application/json'
+    )
+    return parquet_key
+
+def flatten_frmf_record(enhanced_data):
+    """Flatten enhanced data into a single Parquet row with FRMF fields"""
     # Base data structure
     flattened_data = {
         'id': enhanced_data.get('id'),
@@ -164,8 +521,11 @@ def convert_to_parquet_with_frmf(enhanced_data, original_key):
             'category': feature_req.get('category', ''),
         })
     
+    # A fused analysis carries both results in one object
+    analysis = enhanced_data.get('fused_analysis') or {}
+    
     # Add FRMF classification results
-    frmf_classification = enhanced_data.get('frmf_classification', {})
+    frmf_classification = analysis.get('classification') or enhanced_data.get('frmf_classification', {})
     if frmf_classification:
         flattened_data.update({
             'ai_category': frmf_classification.get('category', ''),
@@ -183,12 +543,16 @@ def convert_to_parquet_with_frmf(enhanced_data, original_key):
         })
     
     # Add deduplication results
-    dedup = enhanced_data.get('deduplication_result', {})
+    dedup = analysis.get('deduplication') or enhanced_data.get('deduplication_result', {})
     if dedup:
         flattened_data.update({
             'is_duplicate': dedup.get('is_duplicate', False),
             'duplicate_confidence': dedup.get('confidence', 0),
             'similar_request_id': dedup.get('most_similar_request_id', ''),
+            'duplicate_check_degraded': dedup.get('degraded', False),
+            # A request never linked to another is a cluster of one
+            'cluster_id': dedup.get('cluster_id') or enhanced_data.get('id'),
+            'cluster_size': dedup.get('cluster_size') or 1,
         })
     
     # Add workaround results
@@ -200,24 +564,30 @@ def convert_to_parquet_with_frmf(enhanced_data, original_key):
             'workaround_confidence': workaround.get('workaround_confidence', 0),
         })
     
-    # Create DataFrame and convert to Parquet
-    df = pd.DataFrame([flattened_data])
-    
-    parquet_buffer = io.BytesIO()
-    df.to_parquet(parquet_buffer, index=False, engine='pyarrow')
-    parquet_buffer.seek(0)
+    return flattened_data
+
+def write_parquet_frmf(rows, parquet_key):
+    """Write flattened rows to the parquet bucket"""
+    # pyarrow is only needed here, so it stays out of the cold start
+    import frmf_schema
     
-    # Generate parquet file key
-    parquet_key = original_key.replace('.json', '.parquet')
-    parquet_bucket = 'bt101-parquet-data-alpha-012258635969'
+    with span('parquet_write', Rows=len(rows)) as stage:
+        # Build one record batch with the fixed, versioned FRMF schema
+        parquet_bytes = frmf_schema.to_parquet_bytes(rows)
+        stage['Bytes'] = len(parquet_bytes)
+        
+        # Upload to parquet bucket
+        s3.put_object(
+            Bucket=PARQUET_BUCKET,
+            Key=parquet_key,
+            Body=parquet_bytes,
+            ContentType='application/octet-stream'
+        )
     
-    # Upload to parquet bucket
-    s3.put_object(
-        Bucket=parquet_bucket,
-        Key=parquet_key,
-        Body=parquet_buffer.getvalue(),
-        ContentType='application/octet-stream'
-    )
+    logger.info(f"FRMF-enhanced Parquet file created: s3://{PARQUET_BUCKET}/{parquet_key} ({len(rows)} rows)")
     
-    logger.info(f"FRMF-enhanced Parquet file created: s3://{parquet_bucket}/{parquet_key}")
-    return parquet_key
\ No newline at end of file
+    # The rows are final once their Parquet file exists; count them into the dashboard rollups
+    try:
+        rollups.append(rows)
+    except Exception as e:
+        logger.warning(f"Rollup append failed for {parquet_key}: {e}")
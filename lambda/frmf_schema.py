@@ -0,0 +1,236 @@
+import io
+import os
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bump when a column is added, removed or changes type; files carry the
+# version as a column and in the Parquet key-value metadata
+SCHEMA_VERSION = 3
+
+FRMF_SCHEMA = pa.schema([
+    pa.field('schema_version', pa.int32()),
+    pa.field('id', pa.string()),
+    pa.field('timestamp', pa.string()),
+    pa.field('ingestion_source', pa.string()),
+    pa.field('feature_request_raw', pa.string()),
+    pa.field('title', pa.string()),
+    pa.field('description', pa.string()),
+    pa.field('priority', pa.string()),
+    pa.field('category', pa.string()),
+    # Classification and forecast; null when classification failed
+    pa.field('ai_category', pa.string()),
+    pa.field('ai_priority', pa.string()),
+    pa.field('ai_complexity', pa.string()),
+    pa.field('ai_effort', pa.string()),
+    pa.field('ai_tags', pa.string()),
+    pa.field('forecast_status', pa.string()),
+    pa.field('forecast_timeline', pa.string()),
+    pa.field('forecast_confidence', pa.float64()),
+    pa.field('service_team', pa.string()),
+    pa.field('customer_visible', pa.bool_()),
+    pa.field('legal_disclaimer_accepted', pa.bool_()),
+    # Deduplication; null when deduplication failed
+    pa.field('is_duplicate', pa.bool_()),
+    pa.field('duplicate_confidence', pa.float64()),
+    pa.field('similar_request_id', pa.string()),
+    # True when is_duplicate=False only because Bedrock could not answer (v2)
+    pa.field('duplicate_check_degraded', pa.bool_()),
+    # Duplicate cluster the request belongs to and its size when processed (v3)
+    pa.field('cluster_id', pa.string()),
+    pa.field('cluster_size', pa.int32()),
+    # Workaround
+    pa.field('workaround_available', pa.bool_()),
+    pa.field('workaround_text', pa.string()),
+    pa.field('workaround_confidence', pa.float64()),
+], metadata={'frmf_schema_version': str(SCHEMA_VERSION)})
+
+# Low-cardinality columns worth dictionary encoding; free text and ids are not
+DICTIONARY_COLUMNS = [
+    'ingestion_source', 'priority', 'category', 'ai_category', 'ai_priority', 'ai_complexity',
+    'ai_effort', 'forecast_status', 'forecast_timeline', 'service_team',
+]
+COMPRESSION = os.environ.get('PARQUET_COMPRESSION', 'zstd')
+
+# Dashboard filter columns, most selective first. Sorting clusters equal
+# values, so row-group and page min/max statistics rule out most of a file
+SORT_COLUMNS = [
+    name for name in os.environ.get(
+        'PARQUET_SORT_COLUMNS', 'service_team,forecast_status,ai_category,is_duplicate'
+    ).split(',') if name
+]
+# Point lookups by id: min/max over random ids never excludes a row group,
+# a bloom filter usually does. Only worth its bytes on multi-row files
+BLOOM_FILTER_COLUMNS = ['id', 'similar_request_id', 'cluster_id']
+BLOOM_FILTER_MIN_ROWS = int(os.environ.get('PARQUET_BLOOM_FILTER_MIN_ROWS', '1000'))
+BLOOM_FILTER_FPP = float(os.environ.get('PARQUET_BLOOM_FILTER_FPP', '0.05'))
+# Optional Hive-style sub-partition below the day partition, e.g.
+# service_team, so each compacted file holds a single value of it. Only
+# queries filtering on that column gain: every other query reads a footer
+# and a small row group per value instead of a few full row groups. With
+# 20k-row row groups (benchmarks/parquet_layout.py), a 20k-row day split by
+# service_team reads 389% of the unpartitioned bytes for "duplicate rate by
+# category" and 262% for a full scan; at 200k rows a day, 55% and 115%.
+# Leave it empty unless days are large and most queries filter on it
+PARTITION_COLUMN = os.environ.get('PARQUET_PARTITION_COLUMN', '')
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+# Writer options the Lambda layer's pyarrow may predate; write_table drops
+# whichever ones its ParquetWriter rejects rather than failing the write
+OPTIONAL_WRITER_OPTIONS = ('write_page_index', 'sorting_columns', 'bloom_filter_options')
+
+# Optional options this process's pyarrow rejected, so later writes skip them
+_rejected_options = set()
+
+
+def to_float(value):
+    if value is None or value == '' or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_bool(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1')
+    return bool(value)
+
+
+def to_str(value):
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def to_int(value):
+    return None if value is None else int(value)
+
+
+_CONVERTERS = {
+    pa.string(): to_str,
+    pa.float64(): to_float,
+    pa.bool_(): to_bool,
+    pa.int32(): to_int,
+}
+
+
+class RecordBatchBuilder:
+    """Accumulates flattened FRMF rows column by column into FRMF_SCHEMA record batches
+
+    Keys missing from a row become nulls and unknown keys are dropped, so
+    every file has the same columns and types whichever stages succeeded.
+    """
+
+    def __init__(self, schema=FRMF_SCHEMA):
+        self.schema = schema
+        self._converters = [(field.name, _CONVERTERS[field.type]) for field in schema]
+        self._columns = {field.name: [] for field in schema}
+        self.num_rows = 0
+
+    def append(self, row):
+        row = dict(row, schema_version=SCHEMA_VERSION)
+        for name, convert in self._converters:
+            self._columns[name].append(convert(row.get(name)))
+        self.num_rows += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def to_batch(self):
+        return pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+
+
+def sort_columns(schema):
+    return [name for name in SORT_COLUMNS if name in schema.names]
+
+
+def sort_table(table):
+    """Order rows by SORT_COLUMNS (nulls last) so statistics stay narrow"""
+    columns = sort_columns(table.schema)
+    if not columns or table.num_rows < 2:
+        return table
+    return table.sort_by([(name, 'ascending') for name in columns])
+
+
+def write_options(schema=FRMF_SCHEMA, num_rows=0):
+    """Parquet writer options shared by every FRMF writer
+
+    Pass the schema actually written (compaction's unified schema can differ
+    from FRMF_SCHEMA) and the rows per row group, which sizes the bloom filters.
+    """
+    options = {
+        'compression': COMPRESSION,
+        'use_dictionary': [name for name in DICTIONARY_COLUMNS if name in schema.names],
+        'write_statistics': True,
+        'write_page_index': True,
+    }
+    # SortingColumn arrived with the sorting_columns option (pyarrow 13)
+    if hasattr(pq, 'SortingColumn'):
+        options['sorting_columns'] = [pq.SortingColumn(schema.get_field_index(name)) for name in sort_columns(schema)]
+    if num_rows >= BLOOM_FILTER_MIN_ROWS:
+        options['bloom_filter_options'] = {
+            name: {'ndv': num_rows, 'fpp': BLOOM_FILTER_FPP}
+            for name in BLOOM_FILTER_COLUMNS
+            if name in schema.names and pa.types.is_string(schema.field(name).type)
+        }
+    return options
+
+
+def write_table(table, sink, row_group_size=None):
+    """Write an already sorted table with the shared options"""
+    rows_per_group = min(table.num_rows, row_group_size or table.num_rows)
+    with open_writer(sink, table.schema, write_options(table.schema, rows_per_group)) as writer:
+        writer.write_table(table, row_group_size=row_group_size)
+
+
+def open_writer(sink, schema, options):
+    """ParquetWriter with options, minus the optional ones this pyarrow does not accept"""
+    while True:
+        try:
+            return pq.ParquetWriter(
+                sink, schema, **{name: value for name, value in options.items() if name not in _rejected_options}
+            )
+        except TypeError as e:
+            # "unexpected keyword argument 'bloom_filter_options'" and the like
+            rejected = [name for name in OPTIONAL_WRITER_OPTIONS
+                        if name in options and name not in _rejected_options and f"'{name}'" in str(e)]
+            if not rejected:
+                raise
+            _rejected_options.update(rejected)
+
+
+def partition_segment(column, value):
+    """Hive-style path segment for one value of the sub-partition column"""
+    if value is None or value == '':
+        text = NULL_PARTITION
+    elif isinstance(value, bool):
+        text = str(value).lower()
+    else:
+        text = quote(str(value), safe='')
+    return f'{column}={text}'
+
+
+def split_by_column(table, column):
+    """(path segment, rows) for each value of column, preserving row order"""
+    rows_by_value = {}
+    for i, value in enumerate(table.column(column).to_pylist()):
+        rows_by_value.setdefault(value, []).append(i)
+    return [
+        (partition_segment(column, value), table.take(pa.array(rows, type=pa.int64())))
+        for value, rows in rows_by_value.items()
+    ]
+
+
+def to_parquet_bytes(rows):
+    """Serialize flattened rows to Parquet with the fixed schema, sorted by SORT_COLUMNS"""
+    builder = RecordBatchBuilder()
+    builder.extend(rows)
+
+    buffer = io.BytesIO()
+    write_table(sort_table(pa.Table.from_batches([builder.to_batch()])), buffer)
+    return buffer.getvalue()
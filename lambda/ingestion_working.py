@@ -1,14 +1,22 @@
 import json
-import boto3
+import os
 import uuid
 from datetime import datetime
 import logging
 
+import raw_layout
+from aws_clients import lazy_client
+from metrics import instrumented, span
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3 = boto3.client('s3')
+s3 = lazy_client('s3')
+
+RAW_BUCKET = 'bt101-raw-data-alpha-012258635969'
+BULK_MAX_RECORDS = int(os.environ.get('BULK_MAX_RECORDS', '5000'))
 
+@instrumented('ingestion')
 def handler(event, context):
     """Streamlined ingestion - stores to S3 and triggers processing via S3 events"""
     cors_headers = {
@@ -26,28 +34,38 @@ def handler(event, context):
                 'body': ''
             }
         
-        # Parse incoming data
-        body = json.loads(event.get('body', '{}'))
+        # Parse incoming data; a JSON array or NDJSON body is a bulk submission
+        raw_body = event.get('body') or '{}'
+        headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+        if is_bulk_request(raw_body, headers):
+            return ingest_bulk(raw_body, cors_headers)
+        
+        body = json.loads(raw_body)
+        
+        # One UTC capture, so the timestamp and the partition always agree
+        now = datetime.utcnow()
         
         # Add metadata
         record = {
             'id': str(uuid.uuid4()),
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': now.isoformat(),
             'ingestion_source': 'api_gateway',
             'feature_request': body
         }
         
         # Store in raw bucket (S3 event will trigger processing)
-        key = f"year={datetime.now().year}/month={datetime.now().month:02d}/day={datetime.now().day:02d}/{record['id']}.json"
+        key = raw_layout.raw_key(record['id'], now)
         
-        s3.put_object(
-            Bucket='bt101-raw-data-alpha-012258635969',
-            Key=key,
-            Body=json.dumps(record),
-            ContentType='application/json'
-        )
+        body = json.dumps(record)
+        with span('s3_write', Bytes=len(body), Rows=1):
+            s3.put_object(
+                Bucket=RAW_BUCKET,
+                Key=key,
+                Body=body,
+                ContentType='application/json'
+            )
         
-        logger.info(f"Ingested: {record['id']} -> s3://bt101-raw-data-alpha-012258635969/{key}")
+        logger.info(f"Ingested: {record['id']} -> s3://{RAW_BUCKET}/{key}")
         
         return {
             'statusCode': 200,
@@ -65,4 +83,105 @@ def handler(event, context):
             'statusCode': 500,
             'headers': cors_headers,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+def is_bulk_request(raw_body, headers):
+    """Bulk submissions are NDJSON (by content type) or a top-level JSON array"""
+    if 'ndjson' in headers.get('content-type', ''):
+        return True
+    return raw_body.lstrip().startswith('[')
+
+def parse_bulk_body(raw_body):
+    """Return (index, value, error) for each submitted record, from a JSON array or NDJSON"""
+    stripped = raw_body.lstrip()
+    if stripped.startswith('['):
+        try:
+            return [(index, value, None) for index, value in enumerate(json.loads(stripped))]
+        except json.JSONDecodeError as e:
+            return [(0, None, f'Invalid JSON array: {e}')]
+    
+    entries = []
+    for index, line in enumerate(line for line in raw_body.splitlines() if line.strip()):
+        try:
+            entries.append((index, json.loads(line), None))
+        except json.JSONDecodeError as e:
+            entries.append((index, None, f'Invalid JSON: {e}'))
+    return entries
+
+def validate_feature_request(value):
+    """Return an error message, or None if the record can be ingested"""
+    if not isinstance(value, dict):
+        return 'Record must be a JSON object'
+    for field in ('title', 'description'):
+        if not isinstance(value.get(field), str) or not value[field].strip():
+            return f'Missing or empty {field}'
+    return None
+
+def ingest_bulk(raw_body, cors_headers):
+    """Validate and assign IDs to every record in one pass, then store them as a few batched objects"""
+    entries = parse_bulk_body(raw_body)
+    if len(entries) > BULK_MAX_RECORDS:
+        return {
+            'statusCode': 413,
+            'headers': cors_headers,
+            'body': json.dumps({'error': f'Bulk submissions are limited to {BULK_MAX_RECORDS} records'})
+        }
+    
+    now = datetime.utcnow()
+    timestamp = now.isoformat()
+    results = []
+    records = []
+    for index, value, error in entries:
+        error = error or validate_feature_request(value)
+        if error:
+            results.append({'index': index, 'status': 'rejected', 'error': error})
+            continue
+        
+        record = {
+            'id': str(uuid.uuid4()),
+            'timestamp': timestamp,
+            'ingestion_source': 'api_gateway_bulk',
+            'feature_request': value
+        }
+        records.append(record)
+        results.append({'index': index, 'status': 'accepted', 'id': record['id']})
+    
+    # Store in raw bucket as a few bulk objects (S3 event will trigger processing per object)
+    objects = []
+    for start in range(0, len(records), raw_layout.BULK_RECORDS_PER_OBJECT):
+        chunk = records[start:start + raw_layout.BULK_RECORDS_PER_OBJECT]
+        batch_id = str(uuid.uuid4())
+        key = raw_layout.raw_key(f"{raw_layout.BULK_PREFIX}{batch_id}", now)
+        body = json.dumps({
+            'batch_id': batch_id,
+            'timestamp': timestamp,
+            'ingestion_source': 'api_gateway_bulk',
+            'records': chunk
+        })
+        with span('s3_write', Bytes=len(body), Rows=len(chunk)):
+            s3.put_object(
+                Bucket=RAW_BUCKET,
+                Key=key,
+                Body=body,
+                ContentType='application/json'
+            )
+        objects.append(key)
+        logger.info(f"Ingested {len(chunk)} records -> s3://{RAW_BUCKET}/{key}")
+        # Per-record lines only when debugging; at INFO a large bulk would log thousands
+        if logger.isEnabledFor(logging.DEBUG):
+            for record in chunk:
+                logger.debug(f"Ingested: {record['id']} -> s3://{RAW_BUCKET}/{key}")
+    
+    accepted = len(records)
+    return {
+        'statusCode': 200 if accepted else 400,
+        'headers': cors_headers,
+        'body': json.dumps({
+            'message': f'Bulk ingestion accepted {accepted} of {len(entries)} records',
+            'accepted_count': accepted,
+            'rejected_count': len(entries) - accepted,
+            'results': results,
+            'objects': objects,
+            'processing': 'triggered_via_s3_event'
+        })
+    }
\ No newline at end of file
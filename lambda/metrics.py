@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'FRMF/Pipeline')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# CloudWatch accepts at most 100 values per metric in one EMF document
+MAX_VALUES_PER_DOCUMENT = 100
+
+UNITS = {
+    'Duration': 'Milliseconds',
+    'Bytes': 'Bytes',
+    'Rows': 'Count',
+    'PromptTokens': 'Count',
+    'InputTokens': 'Count',
+    'OutputTokens': 'Count',
+    'CacheHit': 'Count',
+    'Error': 'Count',
+    'Retries': 'Count',
+}
+
+_lock = threading.Lock()
+# A container serves one invocation at a time, so spans from every worker
+# thread of that invocation accumulate here until the handler returns
+_state = {'service': None, 'depth': 0, 'values': {}}
+
+
+@contextmanager
+def span(stage, **values):
+    """Time a block as one stage; the yielded dict takes extra values such as Bytes or InputTokens"""
+    values = dict(values)
+    start = time.perf_counter()
+    try:
+        yield values
+    except Exception:
+        values['Error'] = 1
+        raise
+    finally:
+        values['Duration'] = (time.perf_counter() - start) * 1000
+        record(stage, values)
+
+
+def record(stage, values):
+    """Add metric values for a stage to the current invocation"""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        stage_values = _state['values'].setdefault(stage, {})
+        for name, value in values.items():
+            if name in UNITS and value is not None:
+                stage_values.setdefault(name, []).append(float(value))
+
+
+def instrumented(service):
+    """Handler decorator that emits the invocation's spans as EMF when it returns or raises"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            with _lock:
+                if _state['depth'] == 0:
+                    _state['service'] = service
+                _state['depth'] += 1
+            try:
+                return handler(event, context)
+            finally:
+                with _lock:
+                    _state['depth'] -= 1
+                    flush_now = _state['depth'] == 0
+                if flush_now:
+                    flush()
+        return wrapper
+    return decorator
+
+
+def flush(emit=print):
+    """Write one EMF document per stage (and per 100 values) to the log"""
+    with _lock:
+        service, stages = _state['service'] or 'unknown', _state['values']
+        _state['values'] = {}
+    if not METRICS_ENABLED:
+        return
+
+    for stage, metrics in stages.items():
+        for document in emf_documents(service, stage, metrics):
+            emit(json.dumps(document))
+
+
+def emf_documents(service, stage, metrics):
+    longest = max((len(values) for values in metrics.values()), default=0)
+    for offset in range(0, longest, MAX_VALUES_PER_DOCUMENT):
+        chunk = {
+            name: values[offset:offset + MAX_VALUES_PER_DOCUMENT]
+            for name, values in metrics.items()
+            if values[offset:offset + MAX_VALUES_PER_DOCUMENT]
+        }
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    'Dimensions': [['Service', 'Stage']],
+                    'Metrics': [{'Name': name, 'Unit': UNITS[name]} for name in chunk]
+                }]
+            },
+            'Service': service,
+            'Stage': stage,
+            'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', ''),
+        }
+        document.update(chunk)
+        yield document
@@ -0,0 +1,420 @@
+import json
+import math
+import os
+import re
+
+# Claude's tokenizer is not available in Lambda; ~3.5 characters per token
+# over-counts English slightly, which keeps budgets on the safe side
+CHARS_PER_TOKEN = float(os.environ.get('PROMPT_CHARS_PER_TOKEN', '3.5'))
+
+DEDUP_INPUT_TOKEN_BUDGET = int(os.environ.get('DEDUP_INPUT_TOKEN_BUDGET', '2000'))
+CLASSIFICATION_INPUT_TOKEN_BUDGET = int(os.environ.get('CLASSIFICATION_INPUT_TOKEN_BUDGET', '1200'))
+# Caps per description; the new request gets more room than each candidate
+NEW_DESCRIPTION_TOKENS = int(os.environ.get('PROMPT_NEW_DESCRIPTION_TOKENS', '400'))
+CANDIDATE_DESCRIPTION_TOKENS = int(os.environ.get('PROMPT_CANDIDATE_DESCRIPTION_TOKENS', '150'))
+TITLE_TOKENS = 40
+# Room for each free-text "reasoning" field of a reply, which the prompt caps at 40 words
+REASONING_TOKENS = 80
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+DEDUP_RESPONSE_SCHEMA = {
+    'is_duplicate': True,
+    'confidence': 0.95,
+    'most_similar_request_id': 'id-of-the-most-similar-existing-request',
+    'reasoning': '',
+}
+
+DUPLICATE_CRITERIA = """STRICT DUPLICATE CRITERIA - Mark as duplicate ONLY if:
+1. Same specific technology/service (e.g., both about Lambda, both about S3, both about IoT)
+2. Same primary function (e.g., both for data storage, both for notifications, both for analytics)
+3. Same target use case (e.g., both for mobile apps, both for web dashboards, both for supply chain)
+
+DO NOT mark as duplicate if:
+- Only sharing generic terms like "platform", "system", "monitoring", "analytics"
+- Different technologies (IoT vs Analytics, Blockchain vs Mobile, etc.)
+- Different primary purposes (device management vs data visualization)
+- Different domains (supply chain vs business intelligence)"""
+
+DEDUP_INSTRUCTIONS = f"""{DUPLICATE_CRITERIA}
+
+Respond with JSON only:
+{{
+    "is_duplicate": true/false,
+    "confidence": 0.0-1.0,
+    "most_similar_request_id": "id or null",
+    "reasoning": "one sentence, at most 40 words, citing exact similarities or differences"
+}}
+
+Be conservative - when in doubt, mark as NOT duplicate."""
+
+CLASSIFICATION_RESPONSE_SCHEMA = {
+    'category': 'infrastructure',
+    'priority': 'medium',
+    'complexity': 'medium',
+    'estimated_effort': 'weeks',
+    'tags': ['tag-one', 'tag-two', 'tag-three', 'tag-four', 'tag-five'],
+    'forecast_status': 'under_review',
+    'forecast_timeline': 'next_quarter',
+    'forecast_confidence': 0.75,
+    'service_team': 'team-name',
+    'customer_visible': True,
+    'reasoning': '',
+}
+
+CLASSIFICATION_KEYS = """{
+    "category": "short category name",
+    "priority": "low/medium/high/critical",
+    "complexity": "low/medium/high",
+    "estimated_effort": "days/weeks/months",
+    "tags": ["up to 5 short tags"],
+    "forecast_status": "under_review/planned/in_progress/not_planned",
+    "forecast_timeline": "short timeline such as next_quarter",
+    "forecast_confidence": 0.0-1.0,
+    "service_team": "owning team",
+    "customer_visible": true/false,
+    "reasoning": "one sentence, at most 40 words"
+}"""
+
+CLASSIFICATION_INSTRUCTIONS = f"""Classify the feature request and forecast its roadmap outcome.
+
+Respond with JSON only, using these keys:
+{CLASSIFICATION_KEYS}"""
+
+
+class Prompt:
+    """A built prompt with its estimated size and the reply budget to request"""
+
+    def __init__(self, text, max_tokens, included_ids=(), dropped_ids=(), truncated=0, request_ids=()):
+        self.text = text
+        self.max_tokens = max_tokens
+        self.input_tokens = estimate_tokens(text)
+        self.included_ids = list(included_ids)
+        self.dropped_ids = list(dropped_ids)
+        self.truncated = truncated
+        # New requests a batch prompt asks about
+        self.request_ids = list(request_ids)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def truncate(text, max_tokens):
+    """Shorten text to about max_tokens, keeping whole leading sentences where possible
+
+    Returns (text, was_truncated).
+    """
+    text = _WHITESPACE_RE.sub(' ', str(text or '')).strip()
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text, False
+
+    kept = ''
+    for sentence in _SENTENCE_RE.split(text):
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        kept = candidate
+    # A first sentence longer than the budget is cut at a word boundary
+    if not kept:
+        kept = text[:max_chars].rsplit(' ', 1)[0]
+    return f"{kept} [...]", True
+
+
+def response_max_tokens(schema):
+    """max_tokens for a JSON reply shaped like schema, plus room for each reasoning text"""
+    skeleton = json.dumps(schema, indent=4)
+    free_text = REASONING_TOKENS * skeleton.count('"reasoning"')
+    # 25% headroom for longer ids and values than the example carries
+    return math.ceil(estimate_tokens(skeleton) * 1.25) + free_text
+
+
+def build_dedup_prompt(title, description, ranked_candidates, budget=DEDUP_INPUT_TOKEN_BUDGET):
+    """Dedup prompt within budget input tokens
+
+    ranked_candidates must be most similar first: candidate descriptions are
+    capped, then candidates are added in order until the budget is used up.
+    """
+    title, title_cut = truncate(title, TITLE_TOKENS)
+    description, description_cut = truncate(description, NEW_DESCRIPTION_TOKENS)
+    truncated = title_cut + description_cut
+
+    head = ("You are a precise duplicate detector for feature requests. "
+            "Compare the NEW REQUEST against EXISTING REQUESTS.\n\n"
+            f"NEW REQUEST:\nTitle: {title}\nDescription: {description}\n\n"
+            "EXISTING REQUESTS:\n")
+    tail = f"\n\n{DEDUP_INSTRUCTIONS}"
+    used = estimate_tokens(head) + estimate_tokens(tail)
+
+    blocks, included, dropped, candidates_cut = candidate_blocks(ranked_candidates, budget - used)
+    text = head + "\n".join(blocks) + tail
+    return Prompt(text, response_max_tokens(DEDUP_RESPONSE_SCHEMA), included, dropped, truncated + candidates_cut)
+
+
+def candidate_blocks(ranked_candidates, budget):
+    """Capped candidate blocks, most similar first, until budget tokens are used
+
+    Returns (blocks, included_ids, dropped_ids, truncated_count).
+    """
+    blocks, included, dropped = [], [], []
+    used = truncated = 0
+    for req in ranked_candidates:
+        candidate_title, title_cut = truncate(req.get('title', ''), TITLE_TOKENS)
+        candidate_description, description_cut = truncate(req.get('description', ''), CANDIDATE_DESCRIPTION_TOKENS)
+        block = f"ID: {req['id']}\nTitle: {candidate_title}\nDescription: {candidate_description}\n---"
+        cost = estimate_tokens(block) + 1
+        # The best candidate is always included, however tight the budget
+        if included and used + cost > budget:
+            dropped.append(req['id'])
+            continue
+        blocks.append(block)
+        included.append(req['id'])
+        used += cost
+        truncated += title_cut + description_cut
+    return blocks, included, dropped, truncated
+
+
+def fit_classification_fields(fields, budget=CLASSIFICATION_INPUT_TOKEN_BUDGET):
+    """Request fields cut so the classification prompt stays within budget input tokens
+
+    The classification function builds its own prompt from these fields;
+    CLASSIFICATION_INSTRUCTIONS stands in for its fixed part when sizing the
+    room left for the description. Returns (fields, number of fields cut).
+    """
+    title, title_cut = truncate(fields.get('title', ''), TITLE_TOKENS)
+    head = (f"{CLASSIFICATION_INSTRUCTIONS}\n\nFEATURE REQUEST:\nTitle: {title}\n"
+            f"Priority: {fields.get('priority', '')}\nCategory: {fields.get('category', '')}\nDescription: ")
+    room = max(0, min(NEW_DESCRIPTION_TOKENS, budget - estimate_tokens(head)))
+    description, description_cut = truncate(fields.get('description', ''), room)
+    return dict(fields, title=title, description=description), title_cut + description_cut
+
+
+FUSED_INPUT_TOKEN_BUDGET = int(os.environ.get('FUSED_INPUT_TOKEN_BUDGET', '2400'))
+DEDUP_BATCH_INPUT_TOKEN_BUDGET = int(os.environ.get('DEDUP_BATCH_INPUT_TOKEN_BUDGET', '6000'))
+# Each verdict costs reply tokens, so a chunk also caps how many requests it asks about
+DEDUP_BATCH_MAX_REQUESTS = int(os.environ.get('DEDUP_BATCH_MAX_REQUESTS', '10'))
+BATCH_DESCRIPTION_TOKENS = int(os.environ.get('PROMPT_BATCH_DESCRIPTION_TOKENS', '200'))
+
+FUSED_RESPONSE_SCHEMA = {
+    'classification': CLASSIFICATION_RESPONSE_SCHEMA,
+    'duplicate': DEDUP_RESPONSE_SCHEMA,
+}
+
+FUSED_INSTRUCTIONS = f"""Do two things for the NEW REQUEST in one answer.
+
+1. Classify it and forecast its roadmap outcome.
+2. Decide whether it duplicates one of the EXISTING REQUESTS.
+
+{DUPLICATE_CRITERIA}
+
+Be conservative - when in doubt, mark as NOT duplicate. With no existing
+requests listed, is_duplicate is false.
+
+Respond with JSON only:
+{{
+    "classification": {CLASSIFICATION_KEYS.replace(chr(10), chr(10) + '    ')},
+    "duplicate": {{
+        "is_duplicate": true/false,
+        "confidence": 0.0-1.0,
+        "most_similar_request_id": "id or null",
+        "reasoning": "one sentence, at most 40 words, citing exact similarities or differences"
+    }}
+}}"""
+
+CLASSIFICATION_TEXT_FIELDS = ('category', 'priority', 'complexity', 'estimated_effort',
+                              'forecast_status', 'forecast_timeline', 'service_team')
+REQUIRED_CLASSIFICATION_FIELDS = ('category', 'priority', 'forecast_status')
+MAX_TAGS = 5
+
+
+def build_fused_prompt(fields, ranked_candidates, budget=FUSED_INPUT_TOKEN_BUDGET):
+    """One prompt asking for classification, forecast and duplicate verdict together"""
+    title, title_cut = truncate(fields.get('title', ''), TITLE_TOKENS)
+    description, description_cut = truncate(fields.get('description', ''), NEW_DESCRIPTION_TOKENS)
+
+    head = ("You analyze customer feature requests.\n\n"
+            f"NEW REQUEST:\nTitle: {title}\nPriority: {fields.get('priority', '')}\n"
+            f"Category: {fields.get('category', '')}\nDescription: {description}\n\n"
+            "EXISTING REQUESTS:\n")
+    tail = f"\n\n{FUSED_INSTRUCTIONS}"
+    used = estimate_tokens(head) + estimate_tokens(tail)
+
+    blocks, included, dropped, candidates_cut = candidate_blocks(ranked_candidates, budget - used)
+    text = head + ("\n".join(blocks) or "(none)") + tail
+    return Prompt(text, response_max_tokens(FUSED_RESPONSE_SCHEMA), included, dropped,
+                  title_cut + description_cut + candidates_cut)
+
+
+def parse_fused_reply(text, candidate_ids):
+    """Validate and normalize a fused reply; raises ValueError when it cannot be trusted
+
+    Returns {'classification': {...}, 'deduplication': {...}} with the keys
+    flatten_frmf_record reads from the separate classification and dedup stages.
+    """
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError("Reply has no JSON object")
+    reply = json.loads(text[start:end + 1])
+    if not isinstance(reply, dict):
+        raise ValueError("Reply is not a JSON object")
+    classification = reply.get('classification')
+    duplicate = reply.get('duplicate')
+    if not isinstance(classification, dict) or not isinstance(duplicate, dict):
+        raise ValueError("Reply is missing the classification or duplicate section")
+
+    missing = [name for name in REQUIRED_CLASSIFICATION_FIELDS if not classification.get(name)]
+    if missing:
+        raise ValueError(f"Classification is missing {missing}")
+    tags = classification.get('tags') or []
+    normalized_classification = {name: str(classification.get(name) or '') for name in CLASSIFICATION_TEXT_FIELDS}
+    normalized_classification.update({
+        'tags': [str(tag) for tag in tags][:MAX_TAGS] if isinstance(tags, list) else [],
+        'forecast_confidence': _confidence(classification.get('forecast_confidence')),
+        'customer_visible': classification.get('customer_visible') is not False,
+    })
+
+    is_duplicate = duplicate.get('is_duplicate')
+    if not isinstance(is_duplicate, bool):
+        raise ValueError("is_duplicate is not a boolean")
+    similar_id = duplicate.get('most_similar_request_id') or None
+    if similar_id not in candidate_ids:
+        # An id that was not in the prompt cannot back a duplicate verdict
+        if is_duplicate:
+            raise ValueError(f"Duplicate verdict names unknown request {similar_id!r}")
+        similar_id = None
+
+    return {
+        'classification': normalized_classification,
+        'deduplication': {
+            'is_duplicate': is_duplicate,
+            'confidence': _confidence(duplicate.get('confidence')),
+            'most_similar_request_id': similar_id or '',
+            'similar_requests': [similar_id] if similar_id else [],
+            'reasoning': str(duplicate.get('reasoning') or ''),
+            'degraded': False,
+        },
+    }
+
+
+def _confidence(value):
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+BATCH_VERDICT_SCHEMA = dict(DEDUP_RESPONSE_SCHEMA, request_id='id-of-the-new-request')
+
+BATCH_INSTRUCTIONS = f"""For EACH new request, decide whether it duplicates one of the EXISTING
+REQUESTS or an EARLIER new request in this list.
+
+{DUPLICATE_CRITERIA}
+
+Be conservative - when in doubt, mark as NOT duplicate.
+
+Respond with JSON only, one verdict per new request in the order given:
+{{
+    "verdicts": [
+        {{
+            "request_id": "id of the new request",
+            "is_duplicate": true/false,
+            "confidence": 0.0-1.0,
+            "most_similar_request_id": "existing or earlier new request id, or null",
+            "reasoning": "one sentence, at most 40 words, citing exact similarities or differences"
+        }}
+    ]
+}}"""
+
+
+def build_batch_dedup_prompts(groups, max_requests=DEDUP_BATCH_MAX_REQUESTS, budget=DEDUP_BATCH_INPUT_TOKEN_BUDGET):
+    """Chunked dedup prompts for many new requests against their shared candidates
+
+    groups is a list of groups of (request, ranked_candidates); a group holds
+    new requests that look alike, and stays in one chunk so the model can flag
+    duplicates within the batch. Each chunk lists the union of its requests'
+    candidates once, interleaved by rank so every request keeps its best ones.
+    """
+    # A group too large for one chunk is split; its later pieces lose sight of the earlier ones
+    pieces = [group[i:i + max_requests] for group in groups for i in range(0, len(group), max_requests)]
+
+    prompts = []
+    chunk, chunk_tokens = [], 0
+    for group in pieces:
+        blocks = [(req, ranked, _batch_request_block(req)) for req, ranked in group]
+        group_tokens = sum(estimate_tokens(block) + 1 for _, _, block in blocks)
+        full = chunk and (len(chunk) + len(blocks) > max_requests or chunk_tokens + group_tokens > budget // 2)
+        if full:
+            prompts.append(_batch_prompt(chunk, budget))
+            chunk, chunk_tokens = [], 0
+        chunk.extend(blocks)
+        chunk_tokens += group_tokens
+    if chunk:
+        prompts.append(_batch_prompt(chunk, budget))
+    return prompts
+
+
+def _batch_request_block(req):
+    title, _ = truncate(req.get('title', ''), TITLE_TOKENS)
+    description, _ = truncate(req.get('description', ''), BATCH_DESCRIPTION_TOKENS)
+    return f"ID: {req['id']}\nTitle: {title}\nDescription: {description}\n---"
+
+
+def _batch_prompt(chunk, budget):
+    request_ids = [req['id'] for req, _, _ in chunk]
+    head = ("You are a precise duplicate detector for feature requests.\n\n"
+            "NEW REQUESTS:\n" + "\n".join(block for _, _, block in chunk) + "\n\nEXISTING REQUESTS:\n")
+    tail = f"\n\n{BATCH_INSTRUCTIONS}"
+    used = estimate_tokens(head) + estimate_tokens(tail)
+
+    # Round-robin by rank: every request's best candidate before anyone's second
+    shared, seen = [], set(request_ids)
+    longest = max((len(ranked) for _, ranked, _ in chunk), default=0)
+    for position in range(longest):
+        for _, ranked, _ in chunk:
+            if position < len(ranked) and ranked[position]['id'] not in seen:
+                seen.add(ranked[position]['id'])
+                shared.append(ranked[position])
+
+    blocks, included, dropped, truncated = candidate_blocks(shared, budget - used)
+    text = head + ("\n".join(blocks) or "(none)") + tail
+    max_tokens = response_max_tokens({'verdicts': [BATCH_VERDICT_SCHEMA] * len(request_ids)})
+    return Prompt(text, max_tokens, included, dropped, truncated, request_ids=request_ids)
+
+
+def parse_batch_reply(text, prompt):
+    """Validated verdicts by new request id; requests without a usable verdict are left out"""
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError("Reply has no JSON object")
+    reply = json.loads(text[start:end + 1])
+    if not isinstance(reply, dict) or not isinstance(reply.get('verdicts'), list):
+        raise ValueError("Reply has no verdicts list")
+
+    verdicts = {}
+    for item in reply['verdicts']:
+        if not isinstance(item, dict) or item.get('request_id') not in prompt.request_ids:
+            continue
+        request_id = item['request_id']
+        is_duplicate = item.get('is_duplicate')
+        if not isinstance(is_duplicate, bool):
+            continue
+        similar_id = item.get('most_similar_request_id') or None
+        # Only earlier requests in the chunk, so a pair is flagged once, on its later member
+        earlier = prompt.request_ids[:prompt.request_ids.index(request_id)]
+        within_batch = similar_id in earlier
+        if similar_id not in prompt.included_ids and not within_batch:
+            if is_duplicate:
+                continue
+            similar_id = None
+        verdicts[request_id] = {
+            'is_duplicate': is_duplicate,
+            'confidence': _confidence(item.get('confidence')),
+            'most_similar_request_id': similar_id or '',
+            'similar_requests': [similar_id] if similar_id else [],
+            'within_batch': bool(is_duplicate and within_batch),
+            'reasoning': str(item.get('reasoning') or ''),
+            'degraded': False,
+        }
+    return verdicts
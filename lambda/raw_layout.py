@@ -0,0 +1,99 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+# Raw bucket: shard=<hex>/year=YYYY/month=MM/day=DD[/hour=HH]/<name>.json
+# A hash shard in front spreads a burst over 16**SHARD_DIGITS prefixes, each
+# with its own S3 request-rate allowance. SHARD_DIGITS=0 and HOURLY=false is
+# the original year=/month=/day= layout. cdk/lib/rawKeyLayout.ts sets the
+# same values on every function and in the Athena partition projection.
+#
+# Parquet bucket: the same path without the shard, so a multi-record batch
+# still writes one file (and one manifest) per day or hour partition.
+SHARD_DIGITS = int(os.environ.get('RAW_KEY_SHARD_DIGITS', '1'))
+HOURLY = os.environ.get('RAW_KEY_HOURLY', 'false').lower() == 'true'
+
+
+def shard_for(name, digits=SHARD_DIGITS):
+    """Stable hex shard of an object name"""
+    return hashlib.md5(name.encode('utf-8')).hexdigest()[:digits]
+
+
+def shards(digits=SHARD_DIGITS):
+    return [f'{value:0{digits}x}' for value in range(16 ** digits)] if digits else ['']
+
+
+def partition(moment, shard='', hourly=HOURLY):
+    """Partition path (no trailing slash) for a UTC datetime"""
+    path = f'year={moment.year}/month={moment.month:02d}/day={moment.day:02d}'
+    if hourly:
+        path += f'/hour={moment.hour:02d}'
+    return f'shard={shard}/{path}' if shard else path
+
+
+# Bulk ingestion packs up to BULK_RECORDS_PER_OBJECT requests into one raw
+# object named bulk-<batch id>.json; everything else holds one request.
+BULK_PREFIX = 'bulk-'
+BULK_RECORDS_PER_OBJECT = int(os.environ.get('BULK_RECORDS_PER_OBJECT', '100'))
+
+
+def raw_key(name, moment):
+    """Key for a raw object; name is the record or batch id, moment the single UTC time captured at ingestion"""
+    return f'{partition(moment, shard_for(name) if SHARD_DIGITS else "")}/{name}.json'
+
+
+def records_in(key):
+    """Most requests a raw object can hold, from its name alone"""
+    return BULK_RECORDS_PER_OBJECT if key.rsplit('/', 1)[-1].startswith(BULK_PREFIX) else 1
+
+
+def unsharded(path):
+    """A raw key or prefix without its leading shard=<hex>/ segment"""
+    return path.split('/', 1)[1] if path.startswith('shard=') else path
+
+
+def processed_key(raw_key):
+    """Parquet key of a raw object processed on its own"""
+    return unsharded(raw_key)[:-len('.json')] + '.parquet'
+
+
+def raw_keys_for_processed(parquet_key):
+    """Raw keys a per-object Parquet key can come from: the sharded key and the legacy unsharded one"""
+    path, name = parquet_key.rsplit('/', 1)
+    stem = name[:-len('.parquet')]
+    keys = [f'{path}/{stem}.json']
+    if SHARD_DIGITS:
+        keys.insert(0, f'shard={shard_for(stem)}/{path}/{stem}.json')
+    return keys
+
+
+def day_partitions(day, include_legacy=True, sharded=True):
+    """Every partition path holding objects written on a UTC day
+
+    include_legacy adds the plain year=/month=/day= partition, where objects
+    written before the sharded or hourly layout was switched on still live.
+    sharded=False gives the Parquet bucket's partitions.
+    """
+    moments = [day.replace(hour=hour) for hour in range(24)] if HOURLY else [day]
+    paths = [partition(moment, shard) for shard in (shards() if sharded else ['']) for moment in moments]
+    legacy = partition(day, hourly=False)
+    if include_legacy and legacy not in paths:
+        paths.append(legacy)
+    return paths
+
+
+def partition_prefixes(end, lookback_days):
+    """Partition prefixes (trailing slash) from end back over the lookback window, newest day first"""
+    prefixes = []
+    for offset in range(max(1, lookback_days)):
+        prefixes.extend(f'{path}/' for path in day_partitions(end - timedelta(days=offset)))
+    return prefixes
+
+
+def recent_prefixes(now=None, hours=2):
+    """Prefixes most likely to hold the newest objects: today's, or the last few hours' when hourly"""
+    now = now or datetime.utcnow()
+    if not HOURLY:
+        return [f'{path}/' for path in day_partitions(now)]
+    moments = [now - timedelta(hours=offset) for offset in range(max(1, hours))]
+    return [f'{partition(moment, shard)}/' for shard in shards() for moment in moments]
@@ -0,0 +1,87 @@
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import s3_store
+
+logger = logging.getLogger(__name__)
+
+CATALOG_BUCKET = os.environ.get('CATALOG_BUCKET', 'bt101-parquet-data-alpha-012258635969')
+SNAPSHOT_KEY = '_catalog/snapshot.json.gz'
+DELTA_PREFIX = '_catalog/deltas/'
+WINDOW_DAYS = int(os.environ.get('CATALOG_WINDOW_DAYS', '90'))
+
+# Warm containers keep the snapshot and every delta already read; deltas are immutable
+_store = s3_store.PendingStore(
+    CATALOG_BUCKET, SNAPSHOT_KEY, DELTA_PREFIX,
+    parse_base=lambda body: {entry['id']: entry for entry in json.loads(gzip.decompress(body)).get('entries', [])},
+    parse_pending=json.loads
+)
+
+
+def catalog_entry(data, raw_key):
+    """Compact catalog entry for a raw feature request record"""
+    feature_req = data.get('feature_request', {}) or {}
+    return {
+        'id': data.get('id'),
+        'title': feature_req.get('title', ''),
+        'description': feature_req.get('description', ''),
+        'timestamp': data.get('timestamp'),
+        'key': raw_key
+    }
+
+
+def append(entries):
+    """Append entries as one immutable delta object; folded into the snapshot later"""
+    entries = [entry for entry in entries if entry.get('id')]
+    if not entries:
+        return None
+    key = f"{DELTA_PREFIX}{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4()}.json"
+    s3_store.write(CATALOG_BUCKET, key, json.dumps(entries), 'application/json')
+    return key
+
+
+def load_catalog():
+    """Return {id: entry}, re-downloading the snapshot only when its ETag changes"""
+    snapshot_entries, deltas = _store.load()
+    catalog = dict(snapshot_entries or {})
+    for delta in deltas:
+        for entry in delta.body:
+            catalog[entry['id']] = entry
+    return catalog
+
+
+def snapshot(window_days=WINDOW_DAYS):
+    """Fold deltas into a new snapshot covering the rolling window, then delete them"""
+    entries = dict(_store.read_base() or {})
+    deltas = _store.read_pending(_store.list_pending())
+    for delta in deltas:
+        for entry in delta.body:
+            entries[entry['id']] = entry
+
+    cutoff = (datetime.utcnow() - timedelta(days=window_days)).isoformat()
+    kept = [entry for entry in entries.values() if (entry.get('timestamp') or cutoff) >= cutoff]
+    kept.sort(key=lambda entry: entry.get('timestamp') or '')
+
+    # An unchanged snapshot keeps its ETag, so warm readers keep their copy
+    if deltas or len(kept) < len(entries):
+        _store.write_base(
+            gzip.compress(json.dumps({
+                'generated_at': datetime.utcnow().isoformat(),
+                'window_days': window_days,
+                'entries': kept
+            }).encode('utf-8')),
+            'application/gzip'
+        )
+        _store.delete_pending(deltas)
+    return {'entries': len(kept), 'expired': len(entries) - len(kept), 'folded_deltas': len(deltas)}
+
+
+def handler(event, context):
+    """Scheduled snapshot of the request catalog"""
+    result = snapshot(int((event or {}).get('window_days', WINDOW_DAYS)))
+    logger.info(f"Request catalog snapshot complete: {result}")
+    return {'statusCode': 200, 'body': result}
@@ -0,0 +1,165 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+from aws_clients import lazy_client
+
+logger = logging.getLogger(__name__)
+
+CACHE_BUCKET = os.environ.get('RESPONSE_CACHE_BUCKET', 'bt101-parquet-data-alpha-012258635969')
+CACHE_PREFIX = '_cache/claude/'
+# When set, a local directory replaces S3 as the persistent tier
+CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', '')
+CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Case- and whitespace-insensitive form of a text field"""
+    return _WHITESPACE_RE.sub(' ', str(text or '')).strip().lower()
+
+
+def cache_key(model_id, prompt_version, fields, dependencies=()):
+    """Content hash of the normalized request fields, model, prompt version and dependencies
+
+    dependencies identify anything else the response depends on (for dedup,
+    the candidate set), so a change there produces a different key.
+    """
+    material = {
+        'model_id': model_id,
+        'prompt_version': prompt_version,
+        'fields': {name: normalize(value) for name, value in sorted(fields.items())},
+        'dependencies': sorted(dependencies),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class S3CacheStore:
+    """Persistent tier backed by an S3 prefix"""
+
+    def __init__(self, bucket, prefix):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3 = lazy_client('s3')
+
+    def read(self, namespace, key):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{namespace}/{key}.json")
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def write(self, namespace, key, entry):
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{namespace}/{key}.json",
+            Body=json.dumps(entry),
+            ContentType='application/json'
+        )
+
+
+class FileCacheStore:
+    """Persistent tier backed by a local directory, for local runs"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def read(self, namespace, key):
+        try:
+            with open(os.path.join(self.directory, namespace, f"{key}.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write(self, namespace, key, entry):
+        os.makedirs(os.path.join(self.directory, namespace), exist_ok=True)
+        with open(os.path.join(self.directory, namespace, f"{key}.json"), 'w') as f:
+            json.dump(entry, f)
+
+
+class ResponseCache:
+    """Two-tier cache of model responses: in-process LRU over a persistent store with TTL"""
+
+    def __init__(self, namespace, store=None, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.namespace = namespace
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {'memory_hits': 0, 'store_hits': 0, 'misses': 0, 'errors': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached response or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['expires_at'] > now:
+                self._entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return copy.deepcopy(entry['value'])
+
+        if self.store is not None:
+            try:
+                entry = self.store.read(self.namespace, key)
+            except Exception as e:
+                logger.warning(f"Response cache read failed for {self.namespace}/{key}: {e}")
+                entry = None
+                with self._lock:
+                    self.stats['errors'] += 1
+            if entry and entry.get('expires_at', 0) > now:
+                with self._lock:
+                    self._remember(key, entry)
+                    self.stats['store_hits'] += 1
+                return copy.deepcopy(entry['value'])
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key, value):
+        """Cache a response in both tiers"""
+        entry = {'value': copy.deepcopy(value), 'expires_at': time.time() + self.ttl_seconds}
+        with self._lock:
+            self._remember(key, entry)
+
+        if self.store is not None:
+            try:
+                self.store.write(self.namespace, key, entry)
+            except Exception as e:
+                logger.warning(f"Response cache write failed for {self.namespace}/{key}: {e}")
+                with self._lock:
+                    self.stats['errors'] += 1
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def default_store():
+    """Persistent tier from the environment: local directory if configured, else S3"""
+    if CACHE_DIR:
+        return FileCacheStore(CACHE_DIR)
+    return S3CacheStore(CACHE_BUCKET, CACHE_PREFIX)
+
+
+def create_cache(namespace):
+    """Cache for one kind of response, or None when caching is disabled"""
+    if not CACHE_ENABLED:
+        return None
+    return ResponseCache(namespace, store=default_store())
@@ -0,0 +1,239 @@
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import s3_store
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BUCKET = os.environ.get('ROLLUP_BUCKET', 'bt101-parquet-data-alpha-012258635969')
+SNAPSHOT_KEY = '_rollups/snapshot.json.gz'
+DELTA_PREFIX = '_rollups/deltas/'
+# Days kept at day grain; older days collapse into day-less totals
+WINDOW_DAYS = int(os.environ.get('ROLLUP_WINDOW_DAYS', '400'))
+READ_WORKERS = int(os.environ.get('ROLLUP_READ_WORKERS', '16'))
+
+DIMENSIONS = ('day', 'category', 'service_team', 'forecast_status')
+MEASURES = ('requests', 'duplicates', 'degraded_checks', 'workarounds', 'forecast_confidence_sum',
+            'forecast_confidence_count')
+UNKNOWN = 'unknown'
+# Day value of the cells that expired out of the window
+BEFORE_WINDOW = 'before'
+
+# Warm containers keep the snapshot and every delta already read between invocations
+_store = s3_store.PendingStore(
+    ROLLUP_BUCKET, SNAPSHOT_KEY, DELTA_PREFIX,
+    parse_base=lambda body: json.loads(gzip.decompress(body)),
+    parse_pending=lambda body: Rollup.from_dict(json.loads(body)),
+    read_workers=READ_WORKERS
+)
+
+
+class Rollup:
+    """Counts and sums by day x category x service_team x forecast_status
+
+    Partial rollups merge by adding their cells, so each invocation's delta,
+    the snapshot and any mix of the two combine in any order.
+    """
+
+    def __init__(self, cells=None):
+        self.cells = cells or {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, row):
+        """Count one flattened FRMF row"""
+        # pyarrow comes with frmf_schema; the processing path has it loaded by now, so it stays out of cold starts
+        from frmf_schema import to_float
+
+        day = (row.get('timestamp') or datetime.utcnow().isoformat())[:10]
+        cell = self._cell((
+            day,
+            row.get('ai_category') or row.get('category') or UNKNOWN,
+            row.get('service_team') or UNKNOWN,
+            row.get('forecast_status') or UNKNOWN,
+        ))
+        cell[0] += 1
+        cell[1] += 1 if row.get('is_duplicate') else 0
+        cell[2] += 1 if row.get('duplicate_check_degraded') else 0
+        cell[3] += 1 if row.get('workaround_available') else 0
+        # Same coercion as the Parquet column: a non-numeric model answer counts as missing
+        confidence = to_float(row.get('forecast_confidence'))
+        if confidence is not None:
+            cell[4] += confidence
+            cell[5] += 1
+
+    def merge(self, other):
+        for dimensions, values in other.cells.items():
+            cell = self._cell(dimensions)
+            for i, value in enumerate(values):
+                cell[i] += value
+        return self
+
+    def expire(self, cutoff_day):
+        """Collapse days before cutoff_day (YYYY-MM-DD) into BEFORE_WINDOW cells; returns the days collapsed"""
+        expired = {dimensions for dimensions in self.cells if dimensions[0] != BEFORE_WINDOW and dimensions[0] < cutoff_day}
+        for dimensions in expired:
+            values = self.cells.pop(dimensions)
+            cell = self._cell((BEFORE_WINDOW,) + dimensions[1:])
+            for i, value in enumerate(values):
+                cell[i] += value
+        return len({dimensions[0] for dimensions in expired})
+
+    def query(self, group_by=(), since=None, until=None, **filters):
+        """Measures summed per group_by combination, over days in [since, until] and matching filters
+
+        since/until exclude the collapsed BEFORE_WINDOW cells; without them
+        the totals are all-time.
+        """
+        unknown = sorted((set(group_by) | set(filters)) - set(DIMENSIONS))
+        if unknown:
+            raise ValueError(f"Unknown rollup dimensions {unknown}; expected some of {list(DIMENSIONS)}")
+        indexes = [DIMENSIONS.index(name) for name in group_by]
+        filter_indexes = [(DIMENSIONS.index(name), value) for name, value in filters.items()]
+        groups = {}
+        for dimensions, values in self.cells.items():
+            if (since or until) and dimensions[0] == BEFORE_WINDOW:
+                continue
+            if (since and dimensions[0] < since) or (until and dimensions[0] > until):
+                continue
+            if any(dimensions[i] != value for i, value in filter_indexes):
+                continue
+            group = groups.setdefault(tuple(dimensions[i] for i in indexes), [0] * len(MEASURES))
+            for i, value in enumerate(values):
+                group[i] += value
+        return [summary(dict(zip(group_by, key)), values) for key, values in sorted(groups.items())]
+
+    def to_dict(self):
+        return {
+            'dimensions': list(DIMENSIONS),
+            'measures': list(MEASURES),
+            'cells': [list(dimensions) + values for dimensions, values in sorted(self.cells.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        width = len(DIMENSIONS)
+        return cls({tuple(cell[:width]): list(cell[width:]) for cell in data.get('cells', [])})
+
+    def _cell(self, dimensions):
+        cell = self.cells.get(dimensions)
+        if cell is None:
+            cell = self.cells[dimensions] = [0] * len(MEASURES)
+        return cell
+
+
+def summary(group, values):
+    """A query result row: the group's dimensions, its measures and the derived rates"""
+    measures = dict(zip(MEASURES, values))
+    requests = measures['requests']
+    return dict(
+        group,
+        **measures,
+        duplicate_rate=round(measures['duplicates'] / requests, 4) if requests else None,
+        avg_forecast_confidence=(
+            round(measures['forecast_confidence_sum'] / measures['forecast_confidence_count'], 4)
+            if measures['forecast_confidence_count'] else None
+        ),
+    )
+
+
+def append(rows):
+    """Write the rollup of finalized rows as one immutable delta; folded into the snapshot later"""
+    rollup = Rollup()
+    for row in rows:
+        rollup.add(row)
+    if not rollup:
+        return None
+    key = f"{DELTA_PREFIX}{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4()}.json"
+    s3_store.write(ROLLUP_BUCKET, key, json.dumps(rollup.to_dict()), 'application/json')
+    return key
+
+
+def load_rollup(include_deltas=False):
+    """The snapshot (one GET, skipped while its ETag is unchanged), plus unfolded deltas if asked"""
+    if include_deltas:
+        data, deltas = _store.load()
+    else:
+        data, deltas = _store.base(), []
+    data = data or {}
+    # Deltas add up, so one listed just before the fold that wrote this
+    # snapshot must not be counted again
+    folded = set(data.get('folded_delta_keys', ()))
+    # Deltas mutate the rollup, so each call works on its own copy of the snapshot
+    rollup = Rollup.from_dict(data)
+    for delta in deltas:
+        if delta.key not in folded:
+            rollup.merge(delta.body)
+    return rollup
+
+
+def snapshot(window_days=WINDOW_DAYS):
+    """Fold deltas into a new snapshot, collapse days older than the window, then delete the deltas"""
+    rollup = Rollup.from_dict(_store.read_base() or {})
+    deltas = _store.read_pending(_store.list_pending())
+    for delta in deltas:
+        rollup.merge(delta.body)
+    expired_days = rollup.expire((datetime.utcnow() - timedelta(days=window_days)).strftime('%Y-%m-%d'))
+
+    # An unchanged snapshot keeps its ETag, so warm readers keep their copy
+    if deltas or expired_days:
+        _store.write_base(
+            gzip.compress(json.dumps(dict(
+                rollup.to_dict(),
+                generated_at=datetime.utcnow().isoformat(),
+                window_days=window_days,
+                folded_delta_keys=[delta.key for delta in deltas]
+            )).encode('utf-8')),
+            'application/gzip'
+        )
+        _store.delete_pending(deltas)
+    return {'cells': len(rollup), 'expired_days': expired_days, 'folded_deltas': len(deltas)}
+
+
+def query(event):
+    """Rows for a summary query event; see handler"""
+    rollup = load_rollup(include_deltas=bool(event.get('include_deltas')))
+    return rollup.query(
+        tuple(event.get('group_by', ())),
+        since=event.get('since'),
+        until=event.get('until'),
+        **event.get('filters', {})
+    )
+
+
+def api_summary(event):
+    """GET /summary?group_by=service_team,forecast_status&since=2026-10-12&category=analytics"""
+    params = event.get('queryStringParameters') or {}
+    headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+    try:
+        rows = query({
+            'group_by': [name for name in (params.get('group_by') or '').split(',') if name],
+            'since': params.get('since'),
+            'until': params.get('until'),
+            'filters': {name: value for name, value in params.items() if name in DIMENSIONS},
+        })
+    except ValueError as e:
+        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+    return {'statusCode': 200, 'headers': headers, 'body': json.dumps({'rows': rows})}
+
+
+def handler(event, context):
+    """Scheduled snapshot of the rollups, the portal's GET /summary, or a summary query:
+
+    {"action": "query", "group_by": ["service_team", "forecast_status"], "since": "2026-10-12",
+     "filters": {"category": "analytics"}, "include_deltas": false}
+    """
+    event = event or {}
+    if event.get('httpMethod'):
+        return api_summary(event)
+    if event.get('action') == 'query':
+        result = {'rows': query(event)}
+    else:
+        result = snapshot(int(event.get('window_days', WINDOW_DAYS)))
+        logger.info(f"Rollup snapshot complete: {result}")
+    return {'statusCode': 200, 'body': result}
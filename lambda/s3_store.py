@@ -0,0 +1,175 @@
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from aws_clients import lazy_client
+
+logger = logging.getLogger(__name__)
+
+s3 = lazy_client('s3')
+
+# The similarity index, request catalog, duplicate clusters and rollups each
+# keep a base object plus small immutable pending objects under a prefix.
+# The hot path writes pending objects; a scheduled fold merges them into a
+# new base, writes it, and only then deletes them.
+#
+# Readers LIST pending objects before they GET the base. A fold in between
+# moves listed entries into a base at least as new as the one read, so the
+# reader applies them twice but never misses one; merging an entry twice
+# must therefore be harmless. A pending body deleted between the LIST and
+# its GET was folded into a base newer than the one already read, so the
+# reader GETs the base again before building its result.
+
+MISSING = ('NoSuchKey', '404')
+NOT_MODIFIED = ('304', 'NotModified')
+DELETE_BATCH = 1000
+
+
+def error_code(error):
+    return error.response.get('Error', {}).get('Code')
+
+
+def b64encode(data):
+    """Key-safe unpadded base64 of bytes"""
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def list_objects(bucket, prefix):
+    """Every object under a prefix, following continuation tokens past 1,000 keys"""
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+
+def list_keys(bucket, prefix):
+    for obj in list_objects(bucket, prefix):
+        yield obj['Key']
+
+
+def delete_keys(bucket, keys):
+    keys = list(keys)
+    for start in range(0, len(keys), DELETE_BATCH):
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in keys[start:start + DELETE_BATCH]], 'Quiet': True}
+        )
+
+
+def read(bucket, key):
+    """Object body, or None when it does not exist"""
+    try:
+        return s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    except ClientError as e:
+        if error_code(e) in MISSING:
+            return None
+        raise
+
+
+def write(bucket, key, body, content_type='application/octet-stream'):
+    return s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+
+
+class Pending:
+    """A listed pending object; body is its parsed content once read"""
+
+    __slots__ = ('key', 'last_modified', 'body')
+
+    def __init__(self, key, last_modified=None, body=None):
+        self.key = key
+        self.last_modified = last_modified
+        self.body = body
+
+
+class PendingStore:
+    """A base object and its pending objects, as one warm container sees them
+
+    parse_base turns the base's bytes into whatever the store keeps in
+    memory; it runs only when the base's ETag changes. With parse_pending,
+    pending bodies are read too (once each: pending objects are immutable);
+    without it, a pending entry lives entirely in its key.
+    """
+
+    def __init__(self, bucket, base_key, pending_prefix, parse_base, parse_pending=None, read_workers=16):
+        self.bucket = bucket
+        self.base_key = base_key
+        self.pending_prefix = pending_prefix
+        self.parse_base = parse_base
+        self.parse_pending = parse_pending
+        self.read_workers = read_workers
+        self._etag = None
+        self._base = None
+        self._bodies = {}
+
+    def list_pending(self):
+        return [
+            Pending(obj['Key'], obj['LastModified'].isoformat() if obj.get('LastModified') else None)
+            for obj in list_objects(self.bucket, self.pending_prefix)
+        ]
+
+    def base(self):
+        """The parsed base, or None if there is none; one GET, skipped while the ETag is unchanged"""
+        try:
+            kwargs = {'Bucket': self.bucket, 'Key': self.base_key}
+            if self._etag and self._base is not None:
+                kwargs['IfNoneMatch'] = self._etag
+            response = s3.get_object(**kwargs)
+            self._base = self.parse_base(response['Body'].read())
+            self._etag = response['ETag']
+        except ClientError as e:
+            code = error_code(e)
+            if code in MISSING:
+                self._etag, self._base = None, None
+            elif code not in NOT_MODIFIED:
+                raise
+        return self._base
+
+    def load(self):
+        """(parsed base or None, [Pending]) in the order that loses no pending entry"""
+        pending = self.list_pending()
+        base = self.base()
+        if self.parse_pending is None:
+            return base, pending
+
+        unread = [entry.key for entry in pending if entry.key not in self._bodies]
+        self._bodies.update(self._read_parsed(unread))
+        # Bodies of folded, deleted objects need not stay cached
+        listed = {entry.key for entry in pending}
+        for key in set(self._bodies) - listed:
+            del self._bodies[key]
+        if any(key not in self._bodies for key in unread):
+            base = self.base()
+        for entry in pending:
+            entry.body = self._bodies.get(entry.key)
+        return base, [entry for entry in pending if entry.body is not None]
+
+    def read_base(self):
+        """The parsed current base without the cache, for a fold; None if there is none"""
+        body = read(self.bucket, self.base_key)
+        return None if body is None else self.parse_base(body)
+
+    def read_pending(self, pending):
+        """Parsed bodies of listed pending objects for a fold, dropping any already gone"""
+        bodies = self._read_parsed([entry.key for entry in pending])
+        for entry in pending:
+            entry.body = bodies.get(entry.key)
+        return [entry for entry in pending if entry.body is not None]
+
+    def write_base(self, body, content_type='application/octet-stream'):
+        write(self.bucket, self.base_key, body, content_type)
+
+    def delete_pending(self, pending):
+        delete_keys(self.bucket, [entry.key for entry in pending])
+
+    def _read_parsed(self, keys):
+        """{key: parsed body} for the keys still there; objects deleted since the LIST are skipped"""
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.read_workers, len(keys)))) as executor:
+            bodies = list(executor.map(lambda key: read(self.bucket, key), keys))
+        return {key: self.parse_pending(body) for key, body in zip(keys, bodies) if body is not None}
@@ -0,0 +1,517 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import struct
+import time
+import uuid
+import zlib
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from operator import eq
+
+import s3_store
+from aws_clients import lazy_client
+
+logger = logging.getLogger(__name__)
+
+s3 = lazy_client('s3')
+
+RAW_BUCKET = os.environ.get('RAW_BUCKET', 'bt101-raw-data-alpha-012258635969')
+INDEX_BUCKET = os.environ.get('INDEX_BUCKET', 'bt101-parquet-data-alpha-012258635969')
+# The manifest lists the immutable segments that make up the base index
+MANIFEST_KEY = '_index/dedup/manifest.json'
+SEGMENT_PREFIX = '_index/dedup/segments/'
+PENDING_PREFIX = '_index/dedup/pending/'
+# Single-file index of format version 1; the first fold turns it into a segment
+LEGACY_INDEX_KEY = '_index/dedup/minhash.idx'
+REBUILD_STATE_KEY = '_index/dedup/rebuild/state.json'
+REBUILD_PARTIAL_KEY = '_index/dedup/rebuild/partial.idx'
+# A rebuild runs in slices that stop taking new listing pages after this
+# long; the 5-minute schedule resumes it, so slices never overlap
+REBUILD_SLICE_SECONDS = float(os.environ.get('INDEX_REBUILD_SLICE_SECONDS', '240'))
+REBUILD_FETCH_WORKERS = int(os.environ.get('INDEX_REBUILD_FETCH_WORKERS', '16'))
+# Each fold adds one small segment; MERGE_FANOUT segments of the same size
+# tier merge into one of the next tier. An entry is rewritten about
+# log(n, MERGE_FANOUT) times overall, and the large segments warm dedup
+# containers hold change rarely
+MERGE_FANOUT = max(2, int(os.environ.get('INDEX_MERGE_FANOUT', '8')))
+SEGMENT_READ_WORKERS = int(os.environ.get('INDEX_SEGMENT_READ_WORKERS', '8'))
+
+# 64 permutations split into 32 bands of 2 rows: pairs with a Jaccard
+# similarity around 0.3 collide in at least one band ~95% of the time
+NUM_PERM = 64
+BANDS = 32
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+_FORMAT_MAGIC = b'FRMH'
+# Version 2 adds per-band sorted bucket hashes, entry positions and an id order after the signatures
+_FORMAT_VERSION = 2
+_HEADER = struct.Struct('<4sHHI')
+# ROWS_PER_BAND is 2: two odd multipliers mix a band into one 32-bit bucket
+# hash. A collision only adds a candidate, which then scores low
+_BAND_MIX = (0x9E3779B1, 0x85EBCA77)
+
+# Fixed seed so every container derives the same permutations
+_rng = random.Random(20240307)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by can for from has have in into is it its of on or so '
+    'that the their this to we with would should could will our us i my need want'.split()
+)
+
+# Warm containers keep the manifest, and every segment read (segments never change)
+_store = s3_store.PendingStore(INDEX_BUCKET, MANIFEST_KEY, PENDING_PREFIX, parse_base=json.loads)
+_segments = {}
+
+
+def tokenize(text):
+    """Lowercased word tokens with stopwords and single characters removed"""
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def shingles(text):
+    """Lowercased word unigrams and bigrams with stopwords removed"""
+    tokens = tokenize(text)
+    result = set(tokens)
+    result.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return result
+
+
+def minhash_signature(shingle_set):
+    """Compute a NUM_PERM-value MinHash signature for a set of shingles"""
+    signature = array('I', [_MAX_HASH] * NUM_PERM)
+    for shingle in shingle_set:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        for i, (a, b) in enumerate(_PERMUTATIONS):
+            hashed = ((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH
+            if hashed < signature[i]:
+                signature[i] = hashed
+    return signature
+
+
+def request_signature(title, description):
+    """MinHash signature of a feature request's title and description"""
+    return minhash_signature(shingles(f"{title} {description}"))
+
+
+class Segment:
+    """Immutable part of the index, stored and loaded as flat arrays
+
+    Next to the signatures, each band keeps its bucket hashes sorted, with
+    the entry each came from, so a lookup is a binary search and loading is
+    a few buffer copies: nothing is built per entry.
+    """
+
+    def __init__(self, ids, keys, signatures, band_hashes, band_positions, id_order):
+        self.ids = ids
+        self.keys = keys
+        self.signatures = signatures
+        self.band_hashes = band_hashes
+        self.band_positions = band_positions
+        self.id_order = id_order
+        count = len(ids)
+        hashes, positions = memoryview(band_hashes), memoryview(band_positions)
+        self._bands = [
+            (hashes[band * count:(band + 1) * count], positions[band * count:(band + 1) * count])
+            for band in range(BANDS)
+        ]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, request_id):
+        """Position of a request in this segment, or None"""
+        i = bisect_left(self.id_order, request_id, key=self.ids.__getitem__)
+        if i < len(self.id_order) and self.ids[self.id_order[i]] == request_id:
+            return self.id_order[i]
+        return None
+
+    def candidates(self, band_hashes):
+        """Positions sharing at least one band bucket with a signature's band hashes"""
+        found = set()
+        for (hashes, positions), value in zip(self._bands, band_hashes):
+            i = bisect_left(hashes, value)
+            while i < len(hashes) and hashes[i] == value:
+                found.add(positions[i])
+                i += 1
+        return found
+
+    def similarity(self, position, signature):
+        """Estimated Jaccard similarity: the share of equal MinHash values"""
+        offset = position * NUM_PERM
+        return sum(map(eq, self.signatures[offset:offset + NUM_PERM], signature)) / NUM_PERM
+
+    def to_bytes(self):
+        """Serialize to the compact on-disk format"""
+        entries = zlib.compress(json.dumps(list(zip(self.ids, self.keys))).encode('utf-8'))
+        header = _HEADER.pack(_FORMAT_MAGIC, _FORMAT_VERSION, NUM_PERM, len(self.ids))
+        return b''.join([
+            header, self.signatures.tobytes(), self.band_hashes.tobytes(), self.band_positions.tobytes(),
+            self.id_order.tobytes(), entries
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load a segment written by to_bytes, or a version 1 single-file index"""
+        magic, version, num_perm, count = _HEADER.unpack_from(data)
+        if magic != _FORMAT_MAGIC or version not in (1, _FORMAT_VERSION) or num_perm != NUM_PERM:
+            raise ValueError(f"Unsupported similarity index format: {magic!r} v{version} ({num_perm} perms)")
+
+        view = memoryview(data)
+        offset = _HEADER.size
+        tables = []
+        for length in ([count * NUM_PERM] + ([count * BANDS, count * BANDS, count] if version > 1 else [])):
+            table = array('I')
+            table.frombytes(view[offset:offset + length * table.itemsize])
+            offset += length * table.itemsize
+            tables.append(table)
+        entries = json.loads(zlib.decompress(view[offset:]))
+        ids = [request_id for request_id, _ in entries]
+        keys = [raw_key for _, raw_key in entries]
+        if version == 1:
+            # Version 1 stored signatures only; the band tables are derived once
+            builder = SegmentBuilder()
+            builder.ids, builder.keys, builder.signatures = ids, keys, tables[0]
+            return builder.build()
+        return cls(ids, keys, *tables)
+
+
+class SegmentBuilder:
+    """Collects entries for a new segment; an id already added is ignored"""
+
+    def __init__(self):
+        self.ids = []
+        self.keys = []
+        self.signatures = array('I')
+        self._seen = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, request_id, raw_key, signature):
+        if request_id in self._seen:
+            return False
+        self._seen.add(request_id)
+        self.ids.append(request_id)
+        self.keys.append(raw_key)
+        self.signatures.extend(signature)
+        return True
+
+    def extend(self, segment):
+        """Add every entry of a segment not already added"""
+        for position, request_id in enumerate(segment.ids):
+            offset = position * NUM_PERM
+            self.add(request_id, segment.keys[position], segment.signatures[offset:offset + NUM_PERM])
+
+    def build(self):
+        count = len(self.ids)
+        band_hashes, band_positions = array('I'), array('I')
+        for band in range(BANDS):
+            hashes = _band_hashes(self.signatures, band)
+            order = sorted(range(count), key=hashes.__getitem__)
+            band_hashes.extend([hashes[position] for position in order])
+            band_positions.extend(order)
+        id_order = array('I', sorted(range(count), key=self.ids.__getitem__))
+        return Segment(list(self.ids), list(self.keys), array('I', self.signatures), band_hashes, band_positions, id_order)
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of ingested feature requests over a list of segments"""
+
+    def __init__(self, segments=()):
+        self.segments = list(segments)
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def __contains__(self, request_id):
+        return any(segment.position(request_id) is not None for segment in self.segments)
+
+    def raw_key(self, request_id):
+        """Raw object key of an indexed request, or None"""
+        for segment in reversed(self.segments):
+            position = segment.position(request_id)
+            if position is not None:
+                return segment.keys[position]
+        return None
+
+    def query(self, signature, k=10, exclude_id=None):
+        """Return up to k (id, raw_key, estimated_jaccard) tuples, most similar first"""
+        band_hashes = [_band_hash(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]) for band in range(BANDS)]
+        # A request can sit in two segments until they merge; it counts once
+        best = {}
+        for segment in self.segments:
+            for position in segment.candidates(band_hashes):
+                request_id = segment.ids[position]
+                if request_id == exclude_id or request_id in best:
+                    continue
+                best[request_id] = (segment.similarity(position, signature), segment.keys[position])
+
+        ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)
+        return [(request_id, raw_key, score) for request_id, (score, raw_key) in ranked[:k]]
+
+
+def _band_hash(values):
+    return (values[0] * _BAND_MIX[0] + values[1] * _BAND_MIX[1]) & _MAX_HASH
+
+
+def _band_hashes(signatures, band):
+    """One band's bucket hash for every signature in a flat signature array"""
+    first, second = (signatures[band * ROWS_PER_BAND + row::NUM_PERM] for row in range(ROWS_PER_BAND))
+    mix_first, mix_second = _BAND_MIX
+    return [(a * mix_first + b * mix_second) & _MAX_HASH for a, b in zip(first, second)]
+
+
+def pending_key(request_id, raw_key, signature):
+    """Encode a pending entry entirely in its object key so a LIST returns it without a GET"""
+    return f"{PENDING_PREFIX}{request_id}/{s3_store.b64encode(signature.tobytes())}/{s3_store.b64encode(raw_key.encode('utf-8'))}"
+
+
+def parse_pending_key(key):
+    """Inverse of pending_key: returns (request_id, raw_key, signature)"""
+    request_id, encoded_signature, encoded_raw_key = key[len(PENDING_PREFIX):].split('/')
+    signature = array('I')
+    signature.frombytes(s3_store.b64decode(encoded_signature))
+    return request_id, s3_store.b64decode(encoded_raw_key).decode('utf-8'), signature
+
+
+def record_pending(request_id, raw_key, signature):
+    """Register a newly ingested request; it is searchable immediately and folded into the base later"""
+    s3_store.write(INDEX_BUCKET, pending_key(request_id, raw_key, signature), b'')
+
+
+def _add_pending(builder, pending):
+    for entry in pending:
+        try:
+            builder.add(*parse_pending_key(entry.key))
+        except ValueError as e:
+            logger.warning(f"Skipping malformed pending index entry {entry.key}: {e}")
+
+
+def load_index():
+    """Return the base segments plus pending entries, downloading only segments this container has not read"""
+    manifest, pending = _store.load()
+    segments = _load_segments(manifest)
+    if pending:
+        builder = SegmentBuilder()
+        _add_pending(builder, pending)
+        segments.append(builder.build())
+    return SimilarityIndex(segments)
+
+
+def _load_segments(manifest):
+    keys = [entry['key'] for entry in (manifest or {}).get('segments', [])]
+    unread = [key for key in keys if key not in _segments]
+    if unread:
+        with ThreadPoolExecutor(max_workers=min(SEGMENT_READ_WORKERS, len(unread))) as executor:
+            for key, body in zip(unread, executor.map(lambda key: s3_store.read(INDEX_BUCKET, key), unread)):
+                if body is None:
+                    logger.warning(f"Similarity index segment {key} is missing")
+                else:
+                    _segments[key] = Segment.from_bytes(body)
+    for key in set(_segments) - set(keys):
+        _segments.pop(key, None)
+    return [_segments[key] for key in keys if key in _segments]
+
+
+def fold_pending():
+    """Write pending entries as one new segment, merge any full size tier, then delete what was replaced"""
+    manifest, migrated = _read_manifest()
+    pending = _store.list_pending()
+    segments = list(manifest['segments'])
+    retired = []
+
+    if pending:
+        builder = SegmentBuilder()
+        _add_pending(builder, pending)
+        if len(builder):
+            segments.append(_write_segment(builder.build()))
+        segments, retired = _merge_tiers(segments)
+    if pending or migrated:
+        _save_manifest(segments, retired, manifest)
+        _store.delete_pending(pending)
+    return {
+        'indexed': sum(entry['count'] for entry in segments),
+        'segments': len(segments),
+        'folded': len(pending),
+        'merged': len(retired),
+    }
+
+
+def _read_manifest():
+    """(manifest, whether it was just created from a version 1 single-file index)"""
+    manifest = _store.read_base()
+    if manifest is not None:
+        return manifest, False
+    manifest = {'segments': [], 'retired': []}
+    legacy = s3_store.read(INDEX_BUCKET, LEGACY_INDEX_KEY)
+    if legacy is None:
+        return manifest, False
+    manifest['segments'].append(_write_segment(Segment.from_bytes(legacy)))
+    manifest['retired'].append(LEGACY_INDEX_KEY)
+    return manifest, True
+
+
+def _tier(count):
+    """Size tier of a segment: the power of MERGE_FANOUT its entry count has reached"""
+    tier = 0
+    while count >= MERGE_FANOUT:
+        count //= MERGE_FANOUT
+        tier += 1
+    return tier
+
+
+def _merge_tiers(segments):
+    """Merge segments while MERGE_FANOUT of them share a tier; returns (segments, keys retired)"""
+    retired = []
+    while True:
+        tiers = {}
+        for entry in segments:
+            tiers.setdefault(_tier(entry['count']), []).append(entry)
+        group = next((tiers[tier] for tier in sorted(tiers) if len(tiers[tier]) >= MERGE_FANOUT), None)
+        if group is None:
+            return segments, retired
+
+        # Oldest first, so an id found in two segments keeps its first entry
+        builder = SegmentBuilder()
+        for entry in group:
+            builder.extend(Segment.from_bytes(s3_store.read(INDEX_BUCKET, entry['key'])))
+        merged = _write_segment(builder.build())
+        group_keys = {entry['key'] for entry in group}
+        segments = [
+            merged if entry is group[0] else entry
+            for entry in segments
+            if entry is group[0] or entry['key'] not in group_keys
+        ]
+        retired.extend(group_keys)
+
+
+def _write_segment(segment):
+    key = f"{SEGMENT_PREFIX}{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4()}.idx"
+    s3_store.write(INDEX_BUCKET, key, segment.to_bytes())
+    return {'key': key, 'count': len(segment)}
+
+
+def _save_manifest(segments, retired, previous):
+    """Point readers at the new segment list, then delete what the previous manifest retired
+
+    Segments retired now are deleted by the next write instead: a reader
+    that got the previous manifest may still be downloading them.
+    """
+    _store.write_base(json.dumps({
+        'generated_at': datetime.utcnow().isoformat(),
+        'segments': segments,
+        'retired': retired,
+    }), 'application/json')
+    s3_store.delete_keys(INDEX_BUCKET, previous.get('retired', []))
+
+
+def rebuild_from_raw(resume=False, slice_seconds=REBUILD_SLICE_SECONDS):
+    """Rebuild the base index from every request in the raw bucket, one time-boxed slice per call
+
+    A fresh call starts a new scan. With resume, the scan continues after the
+    last raw key of the saved partial index. The slice that reaches the end
+    of the listing replaces the base index and clears the rebuild state.
+    """
+    started = time.monotonic()
+    state = _load_rebuild_state() if resume else None
+    if state is None:
+        state = {
+            'started_at': datetime.utcnow().isoformat(),
+            'start_after': '',
+            'objects': 0,
+            'slices': 0,
+            # Pending entries registered before the scan are covered by it
+            'stale_pending': [entry.key for entry in _store.list_pending()],
+        }
+        builder = SegmentBuilder()
+    else:
+        builder = SegmentBuilder()
+        builder.extend(Segment.from_bytes(s3_store.read(INDEX_BUCKET, REBUILD_PARTIAL_KEY)))
+    state['slices'] += 1
+
+    paginator = s3.get_paginator('list_objects_v2')
+    kwargs = {'Bucket': RAW_BUCKET}
+    if state['start_after']:
+        kwargs['StartAfter'] = state['start_after']
+    # GETs overlap on a pool; signing stays on this thread
+    with ThreadPoolExecutor(max_workers=REBUILD_FETCH_WORKERS) as executor:
+        for page in paginator.paginate(**kwargs):
+            keys = [obj['Key'] for obj in page.get('Contents', [])]
+            json_keys = [key for key in keys if key.endswith('.json')]
+            for key, records in zip(json_keys, executor.map(_read_raw_records, json_keys)):
+                for record in records:
+                    feature_req = record.get('feature_request', {})
+                    request_id = record.get('id') or key.split('/')[-1].replace('.json', '')
+                    builder.add(request_id, key, request_signature(
+                        feature_req.get('title', ''), feature_req.get('description', '')
+                    ))
+            state['objects'] += len(json_keys)
+            if keys:
+                state['start_after'] = keys[-1]
+            if page.get('IsTruncated') and time.monotonic() - started > slice_seconds:
+                _save_rebuild_state(state, builder.build())
+                logger.info(f"Similarity index rebuild paused after {state['start_after']}; resumes on the next run")
+                return {'indexed': len(builder), 'objects': state['objects'], 'slices': state['slices'], 'done': False}
+
+    # Every current segment is replaced by the one rebuilt segment
+    manifest = _store.read_base() or {'segments': []}
+    _save_manifest(
+        [_write_segment(builder.build())],
+        [entry['key'] for entry in manifest['segments']] + [LEGACY_INDEX_KEY],
+        manifest
+    )
+    s3_store.delete_keys(INDEX_BUCKET, state['stale_pending'] + [REBUILD_STATE_KEY, REBUILD_PARTIAL_KEY])
+    return {'indexed': len(builder), 'objects': state['objects'], 'slices': state['slices'], 'done': True}
+
+
+def _read_raw_records(key):
+    """Requests in one raw object; bulk ingestion files hold many"""
+    try:
+        data = json.loads(s3.get_object(Bucket=RAW_BUCKET, Key=key)['Body'].read())
+    except Exception as e:
+        logger.warning(f"Error reading {key}: {e}")
+        return []
+    return data['records'] if isinstance(data.get('records'), list) else [data]
+
+
+def _load_rebuild_state():
+    """State of an unfinished rebuild, or None"""
+    body = s3_store.read(INDEX_BUCKET, REBUILD_STATE_KEY)
+    return None if body is None else json.loads(body)
+
+
+def _save_rebuild_state(state, partial):
+    # The partial segment goes first, so a saved state always has the entries it describes
+    s3_store.write(INDEX_BUCKET, REBUILD_PARTIAL_KEY, partial.to_bytes())
+    s3_store.write(INDEX_BUCKET, REBUILD_STATE_KEY, json.dumps(state), 'application/json')
+
+
+def handler(event, context):
+    """Scheduled maintenance: fold pending entries, or rebuild with {"action": "rebuild"}
+
+    While a rebuild is unfinished, scheduled runs continue it instead of
+    folding: a fold would write pending entries into segments that the
+    rebuild is about to replace. Readers still see them as pending entries.
+    """
+    event = event or {}
+    if event.get('action') == 'rebuild':
+        result = rebuild_from_raw(slice_seconds=float(event.get('slice_seconds', REBUILD_SLICE_SECONDS)))
+    elif _load_rebuild_state() is not None:
+        result = rebuild_from_raw(resume=True)
+    else:
+        result = fold_pending()
+    logger.info(f"Similarity index maintenance complete: {result}")
+    return {'statusCode': 200, 'body': result}
@@ -0,0 +1,86 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A pipeline stage: fn is called with the values named in inputs"""
+
+    def __init__(self, name, fn, inputs=(), timeout=None, fallback=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.timeout = timeout
+        # Called with the same inputs when fn raises or times out
+        self.fallback = fallback
+
+
+class StageError(Exception):
+    """A stage failed or timed out and has no fallback"""
+
+
+def run_stages(stages, inputs, max_workers=None):
+    """Run each stage as soon as its inputs are available, independent stages in parallel
+
+    Returns (values, outcomes): values maps input and stage names to their
+    values, outcomes maps stage names to status and duration.
+    """
+    values = dict(inputs)
+    outcomes = {}
+    waiting = {stage.name: stage for stage in stages}
+    running = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(waiting) or 1)
+    try:
+        while waiting or running:
+            for name, stage in list(waiting.items()):
+                if all(i in values for i in stage.inputs):
+                    del waiting[name]
+                    started = time.monotonic()
+                    deadline = started + stage.timeout if stage.timeout else None
+                    future = executor.submit(stage.fn, *[values[i] for i in stage.inputs])
+                    running[future] = (stage, started, deadline)
+
+            if not running:
+                raise StageError(f"Stages with unsatisfiable inputs: {sorted(waiting)}")
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline]
+            timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            for future in list(running):
+                stage, started, deadline = running[future]
+                if future in done:
+                    try:
+                        values[stage.name] = future.result()
+                        status = 'success'
+                    except Exception as e:
+                        logger.warning(f"Stage {stage.name} failed: {e}")
+                        values[stage.name] = _fall_back(stage, values, e)
+                        status = 'failed'
+                elif deadline and now >= deadline:
+                    logger.warning(f"Stage {stage.name} timed out after {stage.timeout}s")
+                    values[stage.name] = _fall_back(stage, values, TimeoutError(stage.name))
+                    status = 'timeout'
+                else:
+                    continue
+
+                del running[future]
+                outcomes[stage.name] = {
+                    'status': status,
+                    'duration_ms': round((now - started) * 1000, 1)
+                }
+    finally:
+        # Timed-out stages keep running in the background; don't block on them
+        executor.shutdown(wait=False)
+
+    return values, outcomes
+
+
+def _fall_back(stage, values, error):
+    if stage.fallback is None:
+        raise StageError(f"Stage {stage.name} failed: {error}") from error
+    return stage.fallback(*[values[i] for i in stage.inputs])